@@ -8,10 +8,23 @@ import os
 from datetime import datetime
 import hashlib
 from win10toast import ToastNotifier  # Import win10toast
+from pg_staging import CREATE_STAGING_QUERY, COPY_STAGING_QUERY, UPSERT_CTE, frame_to_csv, stage_attendance
 
 # Initialize the Windows Toast Notifier
 toaster = ToastNotifier()
 
+# ON CONFLICT needs a unique key; older tables were created without one
+UNIQUE_KEY_QUERY = """
+CREATE UNIQUE INDEX IF NOT EXISTS unique_employee_record
+ON biometric_attendance (Punch_Date, Employee_ID);
+"""
+
+# Upsert the staged file and report (inserted, updated, distinct keys)
+UPSERT_QUERY = "WITH" + UPSERT_CTE + """
+SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted), (SELECT COUNT(*) FROM merged)
+FROM upserted;
+"""
+
 class DatabaseManager:
     def __init__(self, db_connection_string):
         self.db_engine = create_engine(db_connection_string, connect_args={'sslmode': 'require'})
@@ -39,6 +52,16 @@ class DatabaseManager:
             conn.execute(text(create_table_query))
             conn.commit()
         print("Successfully connected to Aiven PostgreSQL and table created if needed")
+
+        try:
+            with self.db_engine.connect() as conn:
+                conn.execute(text(UNIQUE_KEY_QUERY))
+                conn.commit()
+            self.upsert_enabled = True
+        except Exception as e:
+            # Existing duplicate rows block the index; keep the row-by-row insert until they are cleaned up
+            self.upsert_enabled = False
+            print(f"Bulk upsert disabled, could not add unique key on (Punch_Date, Employee_ID): {str(e)}")
     
     def check_file_processed(self, file_hash):
         query = "SELECT EXISTS(SELECT 1 FROM biometric_attendance WHERE file_hash = :file_hash);"
@@ -60,6 +83,44 @@ class DatabaseManager:
             return None
     
     def insert_attendance_data(self, df, file_hash):
+        if self.upsert_enabled:
+            self.upsert_attendance_data(df, file_hash)
+        else:
+            self.insert_attendance_rows(df, file_hash)
+
+    def hours_worked_value(self, value):
+        """Hours_Worked for the NUMERIC column; a value that isn't a time rejects the row"""
+        hours = self.convert_time_to_hours(value)
+        if hours is None and pd.notna(value):
+            raise ValueError(value)
+        return hours
+
+    def upsert_attendance_data(self, df, file_hash):
+        """COPY the file into a staging table and merge it with one INSERT ... ON CONFLICT"""
+        # Cells COPY would refuse are rejected here, so one bad row can't roll back the file
+        staged, rejected = stage_attendance(df, file_hash, self.hours_worked_value)
+        for position, row in rejected.iterrows():
+            print(f"Row {position + 3} rejected: {row['reason']}")
+        inserted = updated = keys = 0
+        if not staged.empty:
+            raw_conn = self.db_engine.raw_connection()
+            try:
+                cursor = raw_conn.cursor()
+                cursor.execute(CREATE_STAGING_QUERY)
+                cursor.copy_expert(COPY_STAGING_QUERY, frame_to_csv(staged))
+                cursor.execute(UPSERT_QUERY)
+                inserted, updated, keys = cursor.fetchone()
+                raw_conn.commit()
+            except Exception:
+                raw_conn.rollback()
+                raise
+            finally:
+                raw_conn.close()
+        print(f"Processed {len(df)} records. Inserted {inserted} records. Updated {updated} records. "
+              f"Unchanged {keys - inserted - updated} records. Merged {len(staged) - keys} duplicate records. "
+              f"Rejected {len(rejected)} invalid records.")
+
+    def insert_attendance_rows(self, df, file_hash):
         insert_query = """
         INSERT INTO biometric_attendance (
             Punch_Date, Employee_ID, Employee_Name, Shift_In, 
@@ -89,6 +150,7 @@ class DatabaseManager:
                 conn.execute(text(insert_query), values)
             conn.commit()
 
+
 class ExcelHandler(FileSystemEventHandler):
     def __init__(self, db_manager):
         self.db_manager = db_manager
@@ -113,7 +175,7 @@ class ExcelHandler(FileSystemEventHandler):
             
             df = pd.read_excel(file_path, header=1)
             print("Processing data with columns:", df.columns.tolist())
-            df['Punch_Date'] = pd.to_datetime(df['Punch_Date']).dt.date
+            df['Punch_Date'] = pd.to_datetime(df['Punch_Date'], errors='coerce').dt.date
             
             time_columns = ['Shift_In', 'Punch_In_Time', 'Punch_Out_Time', 'Shift_Out', 'Late_By']
             for col in time_columns:
@@ -10,6 +10,8 @@ import hashlib
 from winotify import Notification, audio  
 import traceback
 import subprocess
+from pg_staging import ATTENDANCE_COLUMNS, CREATE_STAGING_QUERY, COPY_STAGING_QUERY, UPSERT_CTE, \
+    frame_to_csv, stage_attendance, text_value
 
 # Initialize notification settings
 app_name = "Attendance Monitor"
@@ -19,6 +21,34 @@ monitor_folder = r"E:\monitor\monitor1\data"
 # Indian Standard Time (IST) Offset
 IST = timezone(timedelta(hours=5, minutes=30))
 
+NO_CHANGE_REASON = "Record exists but no changes to punch times were needed"
+
+DUPLICATE_LOG_QUERY = """
+INSERT INTO duplicate_records_log 
+(Punch_Date, Employee_ID, Employee_Name, file_name, reason, logged_at) 
+VALUES (:punch_date, :employee_id, :employee_name, :file_name, :reason, :logged_at AT TIME ZONE 'Asia/Kolkata');
+"""
+
+LOG_EVENT_QUERY = """
+INSERT INTO logs (event_type, event_description, file_name, timestamp) 
+VALUES (:event_type, :event_description, :file_name, :timestamp AT TIME ZONE 'Asia/Kolkata');
+"""
+
+# Upsert the staged file, log the keys that needed no change, and report
+# (inserted, updated, distinct keys) so duplicates and unchanged records are counted apart
+UPSERT_QUERY = "WITH" + UPSERT_CTE + """, unchanged AS (
+    INSERT INTO duplicate_records_log (Punch_Date, Employee_ID, Employee_Name, file_name, reason, logged_at)
+    SELECT m.Punch_Date, m.Employee_ID, m.Employee_Name, %(file_name)s, %(reason)s,
+           %(logged_at)s AT TIME ZONE 'Asia/Kolkata'
+    FROM merged m
+    WHERE NOT EXISTS (
+        SELECT 1 FROM upserted u WHERE u.Punch_Date = m.Punch_Date AND u.Employee_ID = m.Employee_ID
+    )
+)
+SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted), (SELECT COUNT(*) FROM merged)
+FROM upserted;
+"""
+
 def open_folder():
     subprocess.Popen(f'explorer "{monitor_folder}"')
 
@@ -71,13 +101,8 @@ class DatabaseManager:
         print("Successfully connected to Aiven PostgreSQL and tables created if needed")
     
     def log_duplicate_record(self, row, file_name, reason):
-        log_query = """
-        INSERT INTO duplicate_records_log 
-        (Punch_Date, Employee_ID, Employee_Name, file_name, reason, logged_at) 
-        VALUES (:punch_date, :employee_id, :employee_name, :file_name, :reason, :logged_at AT TIME ZONE 'Asia/Kolkata');
-        """
         with self.db_engine.connect() as conn:
-            conn.execute(text(log_query), {
+            conn.execute(text(DUPLICATE_LOG_QUERY), {
                 'punch_date': row['Punch_Date'],
                 'employee_id': str(row['Employee_ID']).strip(),
                 'employee_name': row['Employee_Name'],
@@ -88,12 +113,8 @@ class DatabaseManager:
             conn.commit()
 
     def log_event(self, event_type, event_description, file_name):
-        log_query = """
-        INSERT INTO logs (event_type, event_description, file_name, timestamp) 
-        VALUES (:event_type, :event_description, :file_name, :timestamp AT TIME ZONE 'Asia/Kolkata');
-        """
         with self.db_engine.connect() as conn:
-            conn.execute(text(log_query), {
+            conn.execute(text(LOG_EVENT_QUERY), {
                 'event_type': event_type,
                 'event_description': event_description,
                 'file_name': file_name,
@@ -129,72 +150,66 @@ class DatabaseManager:
             }).fetchone()
             return result
 
+    def log_invalid_records(self, invalid, file_name):
+        """Log rows rejected before loading, one batched statement per table"""
+        if invalid.empty:
+            return
+        logged_at = datetime.now(IST)
+        duplicates, events = [], []
+        for _, row in invalid.iterrows():
+            duplicates.append({
+                'punch_date': row['Punch_Date'],
+                'employee_id': row['Employee_ID'],
+                'employee_name': row['Employee_Name'],
+                'file_name': file_name,
+                'reason': row['reason'],
+                'logged_at': logged_at
+            })
+            events.append({'event_type': 'Warning', 'event_description': row['reason'], 'file_name': file_name, 'timestamp': logged_at})
+        with self.db_engine.connect() as conn:
+            conn.execute(text(DUPLICATE_LOG_QUERY), duplicates)
+            conn.execute(text(LOG_EVENT_QUERY), events)
+            conn.commit()
+
     def insert_attendance_data(self, df, file_hash, file_name):
-        insert_query = """
-        INSERT INTO biometric_attendance (
-            Punch_Date, Employee_ID, Employee_Name, Shift_In, 
-            Punch_In_Time, Punch_Out_Time, Shift_Out, Hours_Worked, 
-            Status, Late_By, file_hash
-        ) VALUES (
-            :Punch_Date, :Employee_ID, :Employee_Name, :Shift_In, :Punch_In_Time, :Punch_Out_Time, 
-            :Shift_Out, :Hours_Worked, :Status, :Late_By, :file_hash
-        );
-        """
-        
-        successful_inserts = 0
+        """COPY the file into a staging table and merge it with one INSERT ... ON CONFLICT"""
         total_records = len(df)
-        
-        with self.db_engine.connect() as conn:
-            for _, row in df.iterrows():
-                try:
-                    if pd.notna(row['Employee_ID']) and len(str(row['Employee_ID']).strip()) == 8:
-                        employee_id = str(row['Employee_ID']).strip()
-                        punch_date = row['Punch_Date']
-                        
-                        # Check for existing record
-                        if self.check_duplicate_record(punch_date, employee_id):
-                            reason = f"Duplicate record found for date {punch_date} and employee {employee_id}"
-                            self.log_duplicate_record(row, file_name, reason)
-                            continue
-                        
-                        try:
-                            values = {
-                                'Punch_Date': punch_date,
-                                'Employee_ID': employee_id,
-                                'Employee_Name': row['Employee_Name'],
-                                'Shift_In': row['Shift_In'] if pd.notna(row['Shift_In']) else None,
-                                'Punch_In_Time': row['Punch_In_Time'] if pd.notna(row['Punch_In_Time']) else None,
-                                'Punch_Out_Time': row['Punch_Out_Time'] if pd.notna(row['Punch_Out_Time']) else None,
-                                'Shift_Out': row['Shift_Out'] if pd.notna(row['Shift_Out']) else None,
-                                'Hours_Worked': row['Hours_Worked'],
-                                'Status': row['Status'],
-                                'Late_By': row['Late_By'] if pd.notna(row['Late_By']) else None,
-                                'file_hash': file_hash
-                            }
-                            conn.execute(text(insert_query), values)
-                            successful_inserts += 1
-                            conn.commit()  # Commit after each successful insert
-                            
-                        except Exception as e:
-                            error_msg = f"Error inserting record for Employee {employee_id}: {str(e)[:200]}"  # Truncate error message
-                            self.log_event("Error", error_msg, file_name)
-                            self.log_duplicate_record(row, file_name, error_msg)
-                            continue  # Continue with next record
-                            
-                    else:
-                        reason = f"Invalid Employee ID format: {str(row['Employee_ID'])}"
-                        self.log_duplicate_record(row, file_name, reason)
-                        self.log_event("Warning", reason, file_name)
-                        
-                except Exception as e:
-                    error_msg = f"Error processing row: {str(e)[:200]}"  # Truncate error message
-                    self.log_event("Error", error_msg, file_name)
-                    continue  # Continue with next record
-            
-            # Log final summary
-            summary_msg = f"Processed {total_records} records. Successfully inserted {successful_inserts} records. Find {total_records - successful_inserts} duplicated records."
-            self.log_event("Summary", summary_msg, file_name)
-            print(summary_msg)
+        # Cells COPY would refuse are rejected here, so one bad row can't roll back the file
+        staged, rejected = stage_attendance(df, file_hash, text_value(8))
+        bad_id = staged['Employee_ID'].str.len().ne(8)
+        if bad_id.any():
+            rejected = pd.concat([rejected, staged.loc[bad_id, ATTENDANCE_COLUMNS].assign(
+                reason="Invalid Employee ID format: " + staged.loc[bad_id, 'Employee_ID'])])
+            staged = staged[~bad_id]
+        self.log_invalid_records(rejected, file_name)
+
+        inserted = updated = keys = 0
+        if not staged.empty:
+            raw_conn = self.db_engine.raw_connection()
+            try:
+                cursor = raw_conn.cursor()
+                cursor.execute(CREATE_STAGING_QUERY)
+                cursor.copy_expert(COPY_STAGING_QUERY, frame_to_csv(staged))
+                cursor.execute(UPSERT_QUERY, {
+                    'file_name': file_name,
+                    'reason': NO_CHANGE_REASON,
+                    'logged_at': datetime.now(IST)
+                })
+                inserted, updated, keys = cursor.fetchone()
+                raw_conn.commit()
+            except Exception:
+                raw_conn.rollback()
+                raise
+            finally:
+                raw_conn.close()
+
+        # Log final summary; unchanged counts keys, merged counts the extra rows folded into them
+        summary_msg = (f"Processed {total_records} records. Inserted {inserted} records. Updated {updated} records. "
+                       f"Unchanged {keys - inserted - updated} records. Merged {len(staged) - keys} duplicate records. "
+                       f"Rejected {len(rejected)} invalid records.")
+        self.log_event("Summary", summary_msg, file_name)
+        print(summary_msg)
+
 
 class ExcelHandler(FileSystemEventHandler):
     def __init__(self, db_manager):
@@ -213,7 +228,7 @@ class ExcelHandler(FileSystemEventHandler):
         
         try:
             df = pd.read_excel(file_path, header=1)
-            df['Punch_Date'] = pd.to_datetime(df['Punch_Date']).dt.date
+            df['Punch_Date'] = pd.to_datetime(df['Punch_Date'], errors='coerce').dt.date
 
             # Modified time column handling
             time_columns = ['Shift_In', 'Shift_Out']
@@ -0,0 +1,156 @@
+import datetime as dt
+import io
+import pandas as pd
+
+ATTENDANCE_COLUMNS = ['Punch_Date', 'Employee_ID', 'Employee_Name', 'Shift_In', 'Punch_In_Time',
+                      'Punch_Out_Time', 'Shift_Out', 'Hours_Worked', 'Status', 'Late_By']
+
+TIME_FORMATS = ('%H:%M:%S', '%H:%M')
+
+# Per-transaction staging table typed like biometric_attendance; dropped automatically on commit or rollback
+CREATE_STAGING_QUERY = """
+CREATE TEMP TABLE attendance_staging ON COMMIT DROP AS
+SELECT 0 AS row_no, Punch_Date, Employee_ID, Employee_Name, Shift_In, Punch_In_Time,
+       Punch_Out_Time, Shift_Out, Hours_Worked, Status, Late_By, file_hash
+FROM biometric_attendance
+WITH NO DATA;
+"""
+
+COPY_STAGING_QUERY = "COPY attendance_staging FROM STDIN WITH (FORMAT csv)"
+
+# Collapse in-file duplicates like service/attendance_merge.py: earliest in, latest out and
+# the other columns from the last row; then upsert, only ever widening an existing record.
+# Callers wrap it as "WITH <UPSERT_CTE> SELECT ..." over merged and upserted.
+UPSERT_CTE = """
+merged AS (
+    SELECT DISTINCT ON (Punch_Date, Employee_ID)
+        Punch_Date, Employee_ID, Employee_Name, Shift_In,
+        MIN(Punch_In_Time) OVER same_key AS Punch_In_Time,
+        MAX(Punch_Out_Time) OVER same_key AS Punch_Out_Time,
+        Shift_Out, Hours_Worked, Status, Late_By, file_hash
+    FROM attendance_staging
+    WINDOW same_key AS (PARTITION BY Punch_Date, Employee_ID)
+    ORDER BY Punch_Date, Employee_ID, row_no DESC
+), upserted AS (
+    INSERT INTO biometric_attendance AS b (
+        Punch_Date, Employee_ID, Employee_Name, Shift_In,
+        Punch_In_Time, Punch_Out_Time, Shift_Out, Hours_Worked,
+        Status, Late_By, file_hash
+    )
+    SELECT Punch_Date, Employee_ID, Employee_Name, Shift_In,
+           Punch_In_Time, Punch_Out_Time, Shift_Out, Hours_Worked,
+           Status, Late_By, file_hash
+    FROM merged
+    ON CONFLICT (Punch_Date, Employee_ID) DO UPDATE SET
+        Punch_In_Time = LEAST(b.Punch_In_Time, EXCLUDED.Punch_In_Time),
+        Punch_Out_Time = GREATEST(b.Punch_Out_Time, EXCLUDED.Punch_Out_Time),
+        file_hash = EXCLUDED.file_hash,
+        processed_at = CURRENT_TIMESTAMP
+    WHERE LEAST(b.Punch_In_Time, EXCLUDED.Punch_In_Time) IS DISTINCT FROM b.Punch_In_Time
+       OR GREATEST(b.Punch_Out_Time, EXCLUDED.Punch_Out_Time) IS DISTINCT FROM b.Punch_Out_Time
+    RETURNING Punch_Date, Employee_ID, (xmax = 0) AS inserted
+)
+"""
+
+
+def _is_blank(value):
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return not value.strip()
+    return bool(pd.isna(value))
+
+
+def date_value(value):
+    if _is_blank(value):
+        return None
+    if isinstance(value, dt.datetime):
+        return value.date()
+    if isinstance(value, dt.date):
+        return value
+    raise ValueError(value)
+
+
+def time_value(value):
+    """Time cells as 'HH:MM:SS' text; raises ValueError for anything the TIME column would refuse"""
+    if _is_blank(value):
+        return None
+    if isinstance(value, (dt.time, dt.datetime)):
+        return value.strftime('%H:%M:%S')
+    if isinstance(value, str):
+        for fmt in TIME_FORMATS:
+            try:
+                return dt.datetime.strptime(value.strip(), fmt).strftime('%H:%M:%S')
+            except ValueError:
+                continue
+    raise ValueError(value)
+
+
+def text_value(size):
+    """Converter for a VARCHAR(size) column; whole floats lose their '.0' like the service reader"""
+    def convert(value):
+        if _is_blank(value):
+            return None
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        text = str(value).strip()
+        if len(text) > size:
+            raise ValueError(value)
+        return text
+    return convert
+
+
+COLUMN_CONVERTERS = {
+    'Punch_Date': date_value,
+    'Employee_ID': text_value(50),
+    'Employee_Name': text_value(100),
+    'Status': text_value(50),
+    'Shift_In': time_value,
+    'Punch_In_Time': time_value,
+    'Punch_Out_Time': time_value,
+    'Shift_Out': time_value,
+    'Late_By': time_value,
+}
+
+
+def stage_attendance(df, file_hash, hours_worked):
+    """Coerce a frame to the staging column types before COPY.
+
+    `hours_worked` converts one Hours_Worked cell for the caller's table and
+    raises ValueError when it can't. Returns (staged, rejected): staged has
+    row_no and file_hash and is ready for frame_to_csv; rejected holds the rows
+    that would have failed the whole COPY, with a 'reason' column and None in
+    place of each unusable cell.
+    """
+    converters = dict(COLUMN_CONVERTERS, Hours_Worked=hours_worked)
+    values = {col: [] for col in ATTENDANCE_COLUMNS}
+    reasons = []
+    for record in df.reindex(columns=ATTENDANCE_COLUMNS).itertuples(index=False, name=None):
+        reason = None
+        for col, value in zip(ATTENDANCE_COLUMNS, record):
+            try:
+                converted = converters[col](value)
+            except (ValueError, TypeError):
+                converted = None
+                reason = reason or f"Invalid {col} '{str(value)[:50]}'"
+            values[col].append(converted)
+        if reason is None and values['Employee_ID'][-1] is None:
+            reason = "Missing Employee_ID"
+        elif reason is None and values['Punch_Date'][-1] is None:
+            reason = f"Missing Punch_Date for employee {values['Employee_ID'][-1]}"
+        reasons.append(reason)
+
+    coerced = pd.DataFrame(values, index=df.index, dtype=object)
+    bad = pd.Series([reason is not None for reason in reasons], index=df.index, dtype=bool)
+    staged = coerced[~bad].assign(file_hash=file_hash)
+    staged.insert(0, 'row_no', range(len(staged)))  # COPY keeps file order; the last row wins for in-file duplicates
+    rejected = coerced[bad].assign(reason=[reason for reason in reasons if reason is not None])
+    return staged, rejected
+
+
+def frame_to_csv(df):
+    """Render a frame as headerless CSV for COPY; missing values become NULL"""
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False, na_rep='')
+    buffer.seek(0)
+    return buffer
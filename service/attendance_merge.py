@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+
+# Sentinel for a missing punch time in the seconds-since-midnight arrays
+MISSING_TIME = -1
+
+KEY_COLUMNS = ['Punch_Date', 'Employee_ID']
+WRITE_COLUMNS = [
+    'Punch_Date', 'Employee_ID', 'Employee_Name', 'Shift_In', 'Punch_In_Time',
+    'Punch_Out_Time', 'Shift_Out', 'Hours_Worked', 'Status', 'Late_By'
+]
+
+NO_CHANGE_REASON = "Record exists but no changes to punch times were needed"
+
+_TIME_PATTERN = r'(\d{1,2}):(\d{2})(?::(\d{2}))?'
+
+
+def time_to_seconds(values):
+    """Convert time-like values (time objects, 'HH:MM[:SS]' text, timestamps) to
+    an int64 array of seconds since midnight, MISSING_TIME for blanks/unparseable"""
+    text = pd.Series(values, dtype=object).reset_index(drop=True)
+    text = text.where(text.notna(), '').astype(str)
+    parts = text.str.extract(_TIME_PATTERN)
+    hours = pd.to_numeric(parts[0], errors='coerce')
+    minutes = pd.to_numeric(parts[1], errors='coerce')
+    seconds = pd.to_numeric(parts[2], errors='coerce').fillna(0)
+    total = hours * 3600 + minutes * 60 + seconds
+    return total.fillna(MISSING_TIME).to_numpy(dtype=np.int64)
+
+
+def seconds_to_text(seconds, missing=None):
+    """Format a seconds-since-midnight array as 'HH:MM:SS' text, `missing` for MISSING_TIME"""
+    seconds = np.asarray(seconds, dtype=np.int64)
+    valid = seconds != MISSING_TIME
+    safe = np.where(valid, seconds, 0)
+    text = (
+        pd.Series(safe // 3600).astype(str).str.zfill(2) + ':'
+        + pd.Series(safe % 3600 // 60).astype(str).str.zfill(2) + ':'
+        + pd.Series(safe % 60).astype(str).str.zfill(2)
+    ).astype(object)
+    text[~valid] = missing
+    return text
+
+
+def _text_or_none(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if hasattr(value, 'strftime'):
+        return value.strftime('%H:%M:%S')
+    return str(value).strip() or None
+
+
+def _earliest(a, b):
+    """Element-wise earliest of two seconds arrays, ignoring MISSING_TIME"""
+    return np.where(a == MISSING_TIME, b, np.where(b == MISSING_TIME, a, np.minimum(a, b)))
+
+
+def _latest(a, b):
+    """Element-wise latest of two seconds arrays, ignoring MISSING_TIME"""
+    return np.maximum(a, b)  # MISSING_TIME is negative, so max already ignores it
+
+
+def normalize_incoming(df):
+    """Project the incoming frame to WRITE_COLUMNS with string keys and integer punch times.
+
+    Duplicate (Punch_Date, Employee_ID) keys inside the file are collapsed to one
+    row: earliest punch-in, latest punch-out and the other columns from the last row.
+    """
+    frame = df.reindex(columns=WRITE_COLUMNS).reset_index(drop=True)
+    frame['Employee_ID'] = frame['Employee_ID'].astype(str).str.strip()
+    frame['Punch_Date'] = pd.to_datetime(frame['Punch_Date']).dt.date
+
+    in_seconds = time_to_seconds(frame['Punch_In_Time'])
+    frame['in_sec'] = np.where(in_seconds == MISSING_TIME, np.iinfo(np.int64).max, in_seconds)
+    frame['out_sec'] = time_to_seconds(frame['Punch_Out_Time'])
+
+    grouped = frame.groupby(KEY_COLUMNS, sort=False)
+    collapsed = grouped.tail(1).set_index(KEY_COLUMNS)
+    collapsed['in_sec'] = grouped['in_sec'].min()
+    collapsed['out_sec'] = grouped['out_sec'].max()
+    collapsed = collapsed.reset_index()
+    collapsed.loc[collapsed['in_sec'] == np.iinfo(np.int64).max, 'in_sec'] = MISSING_TIME
+    return collapsed
+
+
+def merge_attendance(incoming, existing):
+    """Pure earliest-in / latest-out merge of a file against the records already stored.
+
+    `incoming` is the validated file frame; `existing` holds the stored
+    Punch_Date, Employee_ID, Punch_In_Time and Punch_Out_Time for its keys.
+
+    Returns (inserts, updates, unchanged):
+      inserts   - WRITE_COLUMNS rows for keys not stored yet
+      updates   - WRITE_COLUMNS rows with the merged punch times, plus old/new
+                  seconds columns and the audit `reason`
+      unchanged - Punch_Date, Employee_ID, Employee_Name of stored keys whose
+                  punch times did not move
+    Time columns are returned as 'HH:MM:SS' text (None when blank).
+    """
+    collapsed = normalize_incoming(incoming)
+
+    stored = existing.reindex(columns=KEY_COLUMNS + ['Punch_In_Time', 'Punch_Out_Time']).copy()
+    stored['Employee_ID'] = stored['Employee_ID'].astype(str).str.strip()
+    stored['Punch_Date'] = pd.to_datetime(stored['Punch_Date']).dt.date
+    stored['old_in_sec'] = time_to_seconds(stored['Punch_In_Time'])
+    stored['old_out_sec'] = time_to_seconds(stored['Punch_Out_Time'])
+    stored = stored.drop(columns=['Punch_In_Time', 'Punch_Out_Time']).drop_duplicates(KEY_COLUMNS)
+
+    merged = collapsed.merge(stored, on=KEY_COLUMNS, how='left', indicator=True)
+    matched = (merged['_merge'] == 'both').to_numpy()
+    old_in = merged['old_in_sec'].fillna(MISSING_TIME).to_numpy(dtype=np.int64)
+    old_out = merged['old_out_sec'].fillna(MISSING_TIME).to_numpy(dtype=np.int64)
+    new_in = merged['in_sec'].to_numpy(dtype=np.int64)
+    new_out = merged['out_sec'].to_numpy(dtype=np.int64)
+
+    final_in = np.where(matched, _earliest(old_in, new_in), new_in)
+    final_out = np.where(matched, _latest(old_out, new_out), new_out)
+    in_changed = matched & (final_in != old_in)
+    out_changed = matched & (final_out != old_out)
+    changed = in_changed | out_changed
+
+    for column in ('Shift_In', 'Shift_Out', 'Late_By'):
+        merged[column] = seconds_to_text(time_to_seconds(merged[column])).to_numpy()
+    merged['Punch_In_Time'] = seconds_to_text(final_in).to_numpy()
+    merged['Punch_Out_Time'] = seconds_to_text(final_out).to_numpy()
+    merged['Hours_Worked'] = merged['Hours_Worked'].astype(object).map(_text_or_none)
+
+    inserts = _without_nan(merged.loc[~matched, WRITE_COLUMNS])
+
+    updates = _without_nan(merged.loc[changed, WRITE_COLUMNS])
+    updates['old_in_sec'] = old_in[changed]
+    updates['new_in_sec'] = final_in[changed]
+    updates['old_out_sec'] = old_out[changed]
+    updates['new_out_sec'] = final_out[changed]
+    updates['reason'] = _update_reasons(updates, in_changed[changed], out_changed[changed])
+
+    unchanged = _without_nan(merged.loc[matched & ~changed, ['Punch_Date', 'Employee_ID', 'Employee_Name']])
+    return inserts, updates, unchanged
+
+
+def _without_nan(frame):
+    """Object-typed copy with None for every blank, ready for DB-API parameters"""
+    frame = frame.reset_index(drop=True).astype(object)
+    return frame.where(frame.notna(), None)
+
+
+def _update_reasons(updates, in_changed, out_changed):
+    """Build the same audit text the row-by-row path writes, without a Python loop"""
+    if updates.empty:
+        return pd.Series([], dtype=object)
+    old_in = seconds_to_text(updates['old_in_sec'], missing='None')
+    new_in = seconds_to_text(updates['new_in_sec'], missing='None')
+    old_out = seconds_to_text(updates['old_out_sec'], missing='None')
+    new_out = seconds_to_text(updates['new_out_sec'], missing='None')
+    dates = pd.Series(updates['Punch_Date']).astype(str)
+
+    reason = 'Record updated for date ' + dates + ' and employee ' + updates['Employee_ID'] + '. '
+    reason = reason + np.where(in_changed, 'Punch-in updated from ' + old_in + ' to ' + new_in + '. ', '')
+    reason = reason + np.where(out_changed, 'Punch-out updated from ' + old_out + ' to ' + new_out + '.', '')
+    return reason.astype(object)
@@ -1,22 +1,30 @@
 import sys
 import os
+import io
 import time
-import hashlib
-import pandas as pd
-from datetime import datetime, timedelta
+import itertools
+import multiprocessing
+from datetime import datetime
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from PyQt6.QtWidgets import QApplication, QMessageBox
-from PyQt6.QtCore import QThread, pyqtSignal, Qt, QSettings, QStandardPaths, QTimer, QDate
-from PyQt6.QtGui import QIcon
+from PyQt6.QtCore import QThread, pyqtSignal, Qt, QSettings, QStandardPaths, QTimer
 from notifications import NotificationManager
-from database_manager import DatabaseManager
+from database_manager import DatabaseManager, QUERY_PAGE_SIZE
+from storage_backends import BACKENDS, SqlServerBackend
+from file_ledger import ProcessedFileLedger
+from offline_spool import OfflineSpool, SpoolReplayer
+from work_queue import FileWorkQueue
+from event_coalescer import EventCoalescer, is_ingestible_excel
+from file_readiness import ReadinessTracker, default_probe
+from ingest_worker import parse_attendance_file, default_parse_workers, PARSE_READ_ERROR, PARSE_MISSING_COLUMNS, PARSE_WORKER_ERROR, PARSE_SKIPPED
+from ingest_pipeline import IngestPipeline
+from query_worker import QueryThread
+from export_worker import ExportThread
+from excel_reader import iter_attendance_chunks, read_file_buffer, MissingColumnsError, DEFAULT_CHUNK_SIZE
 from ui_manager import AttendanceMonitorUI
-import configparser
+from log_channel import LogChannel, DEFAULT_MAX_LINES
 import psutil  # For process management
-import win32api  # For Windows-specific file operations
-import win32con  # For Windows constants
-import win32file  # For low-level file operations
 
 # For PyInstaller resource handling
 def resource_path(relative_path):
@@ -73,17 +81,36 @@ def is_already_running():
 
 class FolderMonitorThread(QThread):
     log_signal = pyqtSignal(str)
+    stopped_signal = pyqtSignal(str)  # Monitoring ended on its own; carries the reason
     
-    def __init__(self, folder_path, db_manager, notification_manager):
+    def __init__(self, folder_path, db_manager, notification_manager, ledger, quiet_period=2.0, parse_workers=0, spool=None):
         super().__init__()
         self.folder_path = folder_path
         self.db_manager = db_manager
         self.notification_manager = notification_manager
+        self.ledger = ledger  # Durable record of processed files (ProcessedFileLedger)
+        self.spool = spool  # OfflineSpool used while the database is unreachable
+        self.replayer = SpoolReplayer(
+            spool, db_manager, self._spooled_file_replayed, self.log_signal.emit,
+            on_drained=notification_manager.spool_replayed,
+            on_failed=self._spooled_file_failed
+        ) if spool else None
         self.running = True
-        self.file_queue = []
-        self.processed_files = set()  # Track processed files by name
-        self.processing_lock = False
+        self.file_queue = FileWorkQueue()  # Filled by the watchdog thread, drained here
+        self.readiness = ReadinessTracker(  # Releases files to the queue once they stop changing
+            self.queue_file,
+            on_timeout=self._file_ready_timeout,
+            on_gone=self._file_gone,
+            probe=default_probe()
+        )
+        self.event_coalescer = EventCoalescer(self.readiness.add, quiet_period)  # Debounces save bursts
         self.batch_files = []  # Track files in current batch
+        self.batch_size = 0  # Number of files in the batch being processed
+        self.pipeline = IngestPipeline(  # ready -> parse -> normalize -> write (this thread)
+            self.file_queue, ledger, self.log_signal.emit,
+            parse_workers=parse_workers,
+            on_batch_started=self._batch_started
+        )
         
         # Monitor performance metrics
         self.start_time = datetime.now()
@@ -98,10 +125,19 @@ class FolderMonitorThread(QThread):
             
     def run(self):
         try:
-            event_handler = ExcelHandler(self.db_manager, self.log_signal, self.notification_manager, self)
+            event_handler = ExcelHandler(self.db_manager, self.log_signal, self.notification_manager, self,
+                                         ledger=self.ledger, spool=self.spool)
             observer = Observer()
             observer.schedule(event_handler, self.folder_path, recursive=False)
             observer.start()
+            self.pipeline.start()
+            if self.replayer:
+                self.replayer.start()
+                if self.spool.offline:
+                    self.log_signal.emit(f"{len(self.spool)} files waiting in the offline spool")
+                    self.replayer.wake()
+            self.readiness.start()
+            self.event_coalescer.start()
             self.log_signal.emit(f"Started monitoring folder: {self.folder_path}")
             
             # Add error recovery mechanism
@@ -110,51 +146,17 @@ class FolderMonitorThread(QThread):
             
             while self.running:
                 try:
-                    # Process any queued files
-                    if self.file_queue and not self.processing_lock:
-                        self.processing_lock = True
-                        try:
-                            # Get number of files to process
-                            files_to_process = len(self.file_queue)
-                            if files_to_process > 1:
-                                # Notify about multiple files
-                                self.notification_manager.batch_processing_started(files_to_process)
-                                self.log_signal.emit(f"Processing batch of {files_to_process} files")
-                                
-                            self.batch_files = []  # Reset batch tracking
-                            success_count = 0
-                            failed_files = []
-                            
-                            while self.file_queue and self.running:
-                                file_path = self.file_queue.pop(0)
-                                file_name = os.path.basename(file_path)
-                                
-                                # Skip if already processed
-                                if file_name in self.processed_files:
-                                    self.log_signal.emit(f"Skipping already processed file: {file_name}")
-                                    continue
-                                
-                                # Process the file
-                                self.log_signal.emit(f"Processing file: {file_name}")
-                                if event_handler.process_excel_file(file_path):
-                                    self.processed_files.add(file_name)
-                                    self.batch_files.append(file_name)
-                                    success_count += 1
-                                else:
-                                    failed_files.append(file_name)
-                            
-                            # Show summary notification after batch processing
-                            if len(self.batch_files) > 0 or len(failed_files) > 0:
-                                self.notification_manager.batch_processing_completed(success_count, len(failed_files))
-                                status_msg = f"Successfully processed {success_count} files. Failed: {len(failed_files)} files."
-                                self.log_signal.emit(f"Completed batch processing. {status_msg}")
-                                if failed_files:
-                                    self.log_signal.emit(f"Failed files: {', '.join(failed_files)}")
-                        except Exception as e:
-                            self.log_signal.emit(f"Error processing queued file: {str(e)}")
-                        finally:
-                            self.processing_lock = False
-                    time.sleep(1)
+                    # Block until the pipeline hands over a parsed file; None once stopped
+                    item = self.pipeline.next_job()
+                    if item is None:
+                        if self.running:  # Not a stop() request: a pipeline stage died
+                            self.stopped_signal.emit(self.pipeline.failure or "Ingest pipeline stopped unexpectedly")
+                        break
+                    
+                    try:
+                        self._write_job(event_handler, *item)
+                    except Exception as e:
+                        self.log_signal.emit(f"Error processing queued file: {str(e)}")
                 except Exception as e:
                     failure_count += 1
                     self.log_signal.emit(f"Error in monitoring loop: {str(e)}")
@@ -173,124 +175,295 @@ class FolderMonitorThread(QThread):
                 
         except Exception as e:
             self.log_signal.emit(f"Monitoring error: {str(e)}")
+            if self.running:
+                self.stopped_signal.emit(str(e))
         finally:
             observer.stop()
             observer.join()
+            self.pipeline.stop()
+    
+    def _batch_started(self, batch):
+        """Called by the parse stage when it takes a batch off the ready queue"""
+        if batch.size > 1:
+            # Notify about multiple files
+            self.notification_manager.batch_processing_started(batch.size)
+            self.log_signal.emit(f"Processing batch of {batch.size} files")
+
+    def _write_job(self, event_handler, job, chunks):
+        """Write stage: commit one file and settle its batch"""
+        self.batch_size = job.batch.size
+        if job.parsed.status == PARSE_SKIPPED:
+            success = None
+        else:
+            success = event_handler.ingest_parsed_file(job.parsed, chunks, job.started_at)
+        batch = job.batch
+        batch.record(job.file_path, success)
+        if success:
+            self.batch_files.append(os.path.basename(job.file_path))
+            self.files_processed += 1
+        if not batch.done:
+            return
+
+        # Show summary notification after batch processing
+        self.batch_files = []
+        if batch.succeeded or batch.failed:
+            if batch.size > 1:
+                self.notification_manager.batch_processing_completed(len(batch.succeeded), len(batch.failed))
+            status_msg = f"Successfully processed {len(batch.succeeded)} files. Failed: {len(batch.failed)} files."
+            self.log_signal.emit(f"Completed batch processing. {status_msg}")
+            if batch.failed:
+                self.log_signal.emit(f"Failed files: {', '.join(batch.failed)}")
+            self.log_signal.emit(f"Pipeline {self.pipeline.format_stats()}")
+
+    def _spooled_file_replayed(self, file_hash, file_path, row_count, summary):
+        """Called by the replayer thread once a spooled file is in the database"""
+        self.ledger.set_status(file_hash, self.ledger.STATUS_PROCESSED)
+        self.log_signal.emit(summary)
+
+    def _spooled_file_failed(self, file_hash, file_path, error):
+        """Called by the replayer thread when the database rejects a spooled file"""
+        self.ledger.set_status(file_hash, self.ledger.STATUS_FAILED)
+        self.notification_manager.file_processing_error(os.path.basename(file_path), str(error))
+
+    def spooling_started(self):
+        """Called by the handler when it switches the spool offline"""
+        self.notification_manager.db_offline_spooling()
+        if self.replayer:
+            self.replayer.wake()
+
+    def pipeline_stats(self):
+        """Queue depth and stall time per ingest stage"""
+        return self.pipeline.stats()
+    
+    def file_event(self, file_path):
+        """Called by the watchdog thread for every created/modified/moved event.
+
+        A newer event supersedes a queued-but-unstarted job for the same path,
+        and the path is only queued once it has been quiet for the quiet period.
+        """
+        if self.file_queue.discard(file_path):
+            self.log_signal.emit(f"File changed again before processing, re-queuing newest version: {os.path.basename(file_path)}")
+        self.event_coalescer.touch(file_path)
+    
+    def _file_ready_timeout(self, file_path):
+        self.log_signal.emit(f"Timeout waiting for file, proceeding anyway: {os.path.basename(file_path)}")
+        self.queue_file(file_path)
+    
+    def _file_gone(self, file_path):
+        self.log_signal.emit(f"File disappeared before processing: {os.path.basename(file_path)}")
     
     def queue_file(self, file_path):
         """Add file to processing queue if it's not already there"""
         file_name = os.path.basename(file_path)
         
-        # Skip if already processed
-        if file_name in self.processed_files:
+        # Skip if this exact file (path, size, mtime) was already processed
+        if self.ledger.is_known_file(file_path):
             self.log_signal.emit(f"File already processed, skipping: {file_name}")
             return
             
-        # Add to queue if not already there
-        if file_path not in self.file_queue:
-            self.file_queue.append(file_path)
+        # Add to queue if not already there (membership check and insert are atomic)
+        if self.file_queue.put(file_path):
             self.log_signal.emit(f"Queued file for processing: {file_name}")
-            
-            # Memory management: keep processed files list from growing too large
-            if len(self.processed_files) > 1000:
-                # Remove oldest 200 files from memory
-                self.log_signal.emit("Trimming processed files history...")
-                self.processed_files = set(list(self.processed_files)[-800:])
     
     def stop(self):
         self.running = False
+        if self.replayer:
+            self.replayer.stop()
+        self.event_coalescer.stop()
+        self.readiness.stop()
+        self.file_queue.close()  # Wake the parse stage immediately instead of waiting for a poll
+        self.pipeline.stop()
 
 class ExcelHandler(FileSystemEventHandler):
-    def __init__(self, db_manager, log_signal, notification_manager, monitor_thread=None):
+    def __init__(self, db_manager, log_signal, notification_manager, monitor_thread=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                 ledger=None, spool=None):
         self.db_manager = db_manager
         self.log_signal = log_signal
         self.notification_manager = notification_manager
         self.monitor_thread = monitor_thread
+        self.chunk_size = chunk_size
+        self.ledger = ledger
+        self.spool = spool
     
     # Update process_excel_file method in ExcelHandler
-    def process_excel_file(self, file_path):
+    def process_excel_file(self, file_path, wait_ready=True):
         file_name = os.path.basename(file_path)
         self.log_signal.emit(f"Starting to process file: {file_name}")
+        started_at = time.time()
+        file_hash = None
+        row_count = 0
         
         try:
-            # Make sure file is not being written to
-            if not self.wait_until_file_ready(file_path):
+            # Make sure file is not being written to (the monitor's ReadinessTracker already did this)
+            if wait_ready and not self.wait_until_file_ready(file_path):
                 error_msg = f"Timeout waiting for file to be ready: {file_name}"
                 self.log_signal.emit(error_msg)
                 self.notification_manager.file_skipped(file_name, "File was locked or unavailable")
                 return False
             
-            # Try to load the Excel file with better error handling
+            # Open the workbook as a stream; the header row is validated before any data is read
             try:
-                df = pd.read_excel(file_path, header=0)
+                data, file_hash = read_file_buffer(file_path)
+            except Exception as read_error:
+                return self._read_failed(file_name, str(read_error))
+
+            if self._skip_known_content(file_hash, file_path):
+                return True
+
+            try:
+                chunks = iter_attendance_chunks(io.BytesIO(data), chunk_size=self.chunk_size)
+                first_chunk = next(chunks)
+            except MissingColumnsError as column_error:
+                return self._parse_failed(file_path, file_hash, started_at, str(column_error), missing_columns=True)
             except Exception as excel_error:
-                error_msg = f"Error reading Excel file: {str(excel_error)}"
-                self.log_signal.emit(error_msg)
-                error_details = "File may be corrupted or in unsupported format"
-                self.log_signal.emit(f"Skipped: {file_name} - {error_details}")
-                self.notification_manager.file_skipped(file_name, error_details)
-                return False
-                
-            # Validate required columns
-            required_columns = ['Punch_Date', 'Employee_ID', 'Employee_Name', 'Punch_In_Time', 'Punch_Out_Time']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            if missing_columns:
-                error_msg = f"Missing required columns: {', '.join(missing_columns)}"
-                self.log_signal.emit(error_msg)
-                self.notification_manager.file_skipped(file_name, "Missing required columns")
-                return False
+                return self._parse_failed(file_path, file_hash, started_at, str(excel_error))
             
-            # Continue with processing
-            df['Punch_Date'] = pd.to_datetime(df['Punch_Date']).dt.date
-            file_hash = hashlib.sha256(open(file_path, 'rb').read()).hexdigest()
-            result = self.db_manager.insert_attendance_data(df, file_hash, file_name)
-            self.log_signal.emit(f"Successfully processed file: {file_name}")
-            self.log_signal.emit(result)
-            
-            # Only show notification for single file processing
-            # (batch notifications are handled by the monitor thread)
-            if not self.monitor_thread or len(self.monitor_thread.batch_files) <= 1:
-                self.notification_manager.file_processed(file_name)
-            return True
+            # Continue with processing, handing bounded chunks to the DB writer
+            def counted(chunk_iter):
+                nonlocal row_count
+                for chunk in chunk_iter:
+                    row_count += len(chunk)
+                    yield chunk
+
+            try:
+                return self._write_chunks(
+                    counted(itertools.chain([first_chunk], chunks)), file_hash, file_path, started_at,
+                    lambda: row_count
+                )
+            finally:
+                chunks.close()  # Releases the workbook even if the DB write fails
             
         except Exception as e:
-            error_msg = f"Error processing file {file_name}: {str(e)}"
-            self.log_signal.emit(error_msg)
-            self.notification_manager.file_processing_error(file_name, str(e))
+            return self._write_failed(file_path, file_hash, row_count, started_at, e)
+
+    def ingest_parsed_file(self, parsed, frames=None, started_at=None):
+        """Write a file parsed by the ingest pipeline; frames defaults to parsed.frames()"""
+        file_path = parsed.file_path
+        file_name = os.path.basename(file_path)
+        if started_at is None:
+            started_at = time.time() - parsed.parse_seconds
+
+        try:
+            if parsed.status == PARSE_READ_ERROR:
+                return self._read_failed(file_name, parsed.error)
+            if parsed.status == PARSE_WORKER_ERROR:
+                self.log_signal.emit(f"Parser process failed on {file_name}: {parsed.error}")
+                self.notification_manager.file_processing_error(file_name, parsed.error)
+                return False
+            if self._skip_known_content(parsed.file_hash, file_path):
+                return True
+            if not parsed.ok:
+                return self._parse_failed(file_path, parsed.file_hash, started_at, parsed.error,
+                                          missing_columns=parsed.status == PARSE_MISSING_COLUMNS)
+
+            return self._write_chunks(frames if frames is not None else parsed.frames(),
+                                      parsed.file_hash, file_path, started_at, lambda: parsed.row_count)
+        except Exception as e:
+            return self._write_failed(file_path, parsed.file_hash, parsed.row_count, started_at, e)
+
+    def _skip_known_content(self, file_hash, file_path):
+        """True if the same content was already ingested (e.g. a re-drop under another name)"""
+        if not self.ledger or not self.ledger.is_known_hash(file_hash):
             return False
+        self.ledger.remember_location(file_hash, file_path)
+        self.log_signal.emit(f"Skipping {os.path.basename(file_path)}: identical content was already processed")
+        return True
+
+    def _read_failed(self, file_name, error):
+        self.log_signal.emit(f"Error reading file: {error}")
+        self.notification_manager.file_skipped(file_name, "File was locked or unavailable")
+        return False
+
+    def _parse_failed(self, file_path, file_hash, started_at, error, missing_columns=False):
+        file_name = os.path.basename(file_path)
+        if missing_columns:
+            self.log_signal.emit(error)
+            self.notification_manager.file_skipped(file_name, "Missing required columns")
+        else:
+            self.log_signal.emit(f"Error reading Excel file: {error}")
+            error_details = "File may be corrupted or in unsupported format"
+            self.log_signal.emit(f"Skipped: {file_name} - {error_details}")
+            self.notification_manager.file_skipped(file_name, error_details)
+        self._record_in_ledger(file_hash, file_path, False, 0, started_at)
+        return False
+
+    def _write_chunks(self, chunks, file_hash, file_path, started_at, row_count):
+        """Insert all chunks of one file in a single transaction; row_count is read after the write.
+
+        While the database is unreachable the file goes to the offline spool instead.
+        """
+        file_name = os.path.basename(file_path)
+        if self.spool is not None:
+            spooled_rows = self.spool.append_if_offline(file_hash, file_path, chunks)
+            if spooled_rows is not None:
+                return self._spooled(file_hash, file_path, spooled_rows, started_at)
+        try:
+            result = self.db_manager.insert_attendance_chunks(chunks, file_hash, file_name)
+        except Exception as e:
+            if self.spool is None or self.db_manager.is_reachable():
+                raise
+            return self._spool_after_failure(file_path, started_at, e)
+        self._record_in_ledger(file_hash, file_path, True, row_count(), started_at)
+        self.log_signal.emit(f"Successfully processed file: {file_name}")
+        self.log_signal.emit(result)
+
+        # Only show notification for single file processing
+        # (batch notifications are handled by the monitor thread)
+        if not self.monitor_thread or self.monitor_thread.batch_size <= 1:
+            self.notification_manager.file_processed(file_name)
+        return True
+
+    def _spool_after_failure(self, file_path, started_at, error):
+        """The database dropped mid-file: go offline and spool the file, re-read from disk"""
+        self.log_signal.emit(f"Database unreachable ({str(error)[:100]}), switching to offline spool")
+        was_offline = self.spool.offline
+        self.spool.go_offline()
+        if not was_offline and self.monitor_thread:
+            self.monitor_thread.spooling_started()
+        parsed = parse_attendance_file(file_path, self.chunk_size)
+        if not parsed.ok:
+            raise error
+        spooled_rows = self.spool.append(parsed.file_hash, file_path, parsed.batches)
+        return self._spooled(parsed.file_hash, file_path, spooled_rows, started_at)
+
+    def _spooled(self, file_hash, file_path, row_count, started_at):
+        self._record_in_ledger(file_hash, file_path, True, row_count, started_at, status=self.ledger.STATUS_SPOOLED if self.ledger else None)
+        self.log_signal.emit(f"Stored {os.path.basename(file_path)} ({row_count} rows) in the offline spool; "
+                             f"{len(self.spool)} files waiting for the database")
+        return True
+
+    def _write_failed(self, file_path, file_hash, row_count, started_at, error):
+        file_name = os.path.basename(file_path)
+        self.log_signal.emit(f"Error processing file {file_name}: {str(error)}")
+        self.notification_manager.file_processing_error(file_name, str(error))
+        if file_hash:
+            self._record_in_ledger(file_hash, file_path, False, row_count, started_at)
+        return False
+
+    def _record_in_ledger(self, file_hash, file_path, success, row_count, started_at, status=None):
+        """Store the outcome and timings of a file in the processed-file ledger"""
+        if not self.ledger:
+            return
+        if status is None:
+            status = self.ledger.STATUS_PROCESSED if success else self.ledger.STATUS_FAILED
+        try:
+            self.ledger.record(file_hash, file_path, status, row_count=row_count, started_at=started_at)
+        except Exception as e:
+            self.log_signal.emit(f"Could not update processed-file ledger: {str(e)}")
         
     def wait_until_file_ready(self, file_path, timeout=20):
-        """Wait until file is fully written and ready to be processed using pywin32"""
+        """Wait until file is fully written and ready to be processed (manual processing path)"""
         start_time = time.time()
         last_size = -1
         attempt = 0
+        probe = default_probe()
         
         while time.time() - start_time < timeout:
             try:
-                # Check file availability using Win32 API
-                try:
-                    # Try to open the file with shared read access
-                    handle = win32file.CreateFile(
-                        file_path,
-                        win32con.GENERIC_READ,
-                        win32con.FILE_SHARE_READ | win32con.FILE_SHARE_WRITE,
-                        None,
-                        win32con.OPEN_EXISTING,
-                        0,
-                        None
-                    )
-                    
-                    # If successful, close the handle
-                    if handle and handle != win32file.INVALID_HANDLE_VALUE:
-                        win32api.CloseHandle(handle)
-                    else:
-                        if attempt % 4 == 0:
-                            self.log_signal.emit(f"File handle invalid, waiting: {os.path.basename(file_path)}")
-                        time.sleep(0.5)
-                        attempt += 1
-                        continue
-                        
-                except Exception as lock_error:
+                # Check file availability (Windows share-mode probe when pywin32 is present)
+                if not probe(file_path):
+                    if not os.path.exists(file_path):
+                        raise FileNotFoundError(file_path)
                     if attempt % 4 == 0:  # Log only occasionally
                         self.log_signal.emit(f"File locked, waiting: {os.path.basename(file_path)}")
                     time.sleep(0.5)
@@ -318,25 +491,37 @@ class ExcelHandler(FileSystemEventHandler):
         return True  # Try to process anyway
 
     def on_created(self, event):
-        if not event.is_directory and event.src_path.endswith('.xlsx'):
+        if not event.is_directory and is_ingestible_excel(event.src_path):
             if self.monitor_thread:
-                # Queue the file for processing instead of processing immediately
-                self.monitor_thread.queue_file(event.src_path)
+                # Coalesce the event burst; the file is queued once it goes quiet
+                self.monitor_thread.file_event(event.src_path)
             else:
                 # If no monitor thread (like in manual processing), handle directly
                 time.sleep(1)  # Wait for file to be completely written
                 self.process_excel_file(event.src_path)
                 
     def on_modified(self, event):
-        if not event.is_directory and event.src_path.endswith('.xlsx'):
+        if not event.is_directory and is_ingestible_excel(event.src_path):
+            if self.monitor_thread:
+                self.monitor_thread.file_event(event.src_path)
+
+    def on_moved(self, event):
+        # Excel saves by writing a temp file and renaming it over the workbook
+        if not event.is_directory and is_ingestible_excel(event.dest_path):
             if self.monitor_thread:
-                # Queue the file for processing if it was modified
-                self.monitor_thread.queue_file(event.src_path)
+                self.monitor_thread.file_event(event.dest_path)
 
 class AttendanceMonitorApp:
     def __init__(self):
         self.monitor_thread = None
         self.db_manager = None
+        self.query_id = 0  # Bumped per query; replies tagged with an older id are stale
+        self.query_thread = None  # The query the results table is waiting for
+        self.query_threads = set()  # Started threads, kept referenced until they finish
+        self.fetch_page = None  # fetch_page(after, handle) for the current filter
+        self.next_page_key = None  # Keyset position of the next page; None after the last one
+        self.results_filter = None  # (filter name, value, description) of the rows on show
+        self.export_thread = None
         self.icon_path = resource_path("logo.png")
         self.settings = QSettings("YourCompany", "AttendanceMonitor")
         
@@ -353,9 +538,29 @@ class AttendanceMonitorApp:
         # Initialize notification manager
         self.notification_manager = NotificationManager(icon_path=self.icon_path)
         
+        # Durable processed-file ledger, survives restarts
+        data_dir = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppDataLocation)
+        os.makedirs(data_dir, exist_ok=True)
+        self.ledger = ProcessedFileLedger(
+            os.path.join(data_dir, "processed_files.db"),
+            retention_days=int(self.settings.value("ledger_retention_days", 90))
+        )
+        # Local store for parsed files while the database is unreachable
+        self.spool = OfflineSpool(
+            os.path.join(data_dir, "offline_spool.db"),
+            quarantine_days=int(self.settings.value("spool_quarantine_days", 30))
+        )
+        
         # Initialize UI manager
         self.ui = AttendanceMonitorUI(self, self.icon_path, self.version)
         
+        # Logs tab keeps the newest lines; the rotating file keeps everything
+        max_log_lines = int(self.settings.value("log_max_lines", DEFAULT_MAX_LINES))
+        self.ui.log_display.setMaximumBlockCount(max_log_lines)
+        self.log_channel = LogChannel(self.ui.log_display, os.path.join(data_dir, "attendance_monitor.log"),
+                                      max_lines=max_log_lines)
+        self.ui.log_channel = self.log_channel
+        
         # Connect UI signals
         self.connect_signals()
         
@@ -365,6 +570,9 @@ class AttendanceMonitorApp:
         # Auto-connect and start monitoring with a slight delay to allow UI to initialize
         QTimer.singleShot(500, self.auto_connect)
         
+        # Last chance to flush buffered audit events, however the event loop ends
+        QApplication.instance().aboutToQuit.connect(self.close_database)
+        
         # Setup system resource monitoring
         self.resource_timer = QTimer()
         self.resource_timer.timeout.connect(self.check_system_resources)
@@ -385,8 +593,14 @@ class AttendanceMonitorApp:
         # Connect filter type change
         self.ui.filter_type.currentIndexChanged.connect(self.change_filter_type)
         
+        # A running query no longer matches the filter once it is edited
+        self.ui.date_filter.dateChanged.connect(lambda _: self.cancel_query(reason="filter changed"))
+        self.ui.employee_id_filter.textEdited.connect(lambda _: self.cancel_query(reason="filter changed"))
+        
         # Connect query and export buttons
         self.ui.run_query_btn.clicked.connect(self.query_database)
+        self.ui.cancel_query_btn.clicked.connect(lambda: self.cancel_query(reason="cancelled"))
+        self.ui.results_model.fetch_more_requested.connect(self.fetch_next_page)
         self.ui.export_btn.clicked.connect(self.export_results)
         
         # Connect tray icon actions - FIXED: Use window.show() instead of show()
@@ -412,7 +626,7 @@ class AttendanceMonitorApp:
             self.connect_to_database(silent=True)
             
             # If connection was successful, start monitoring
-            if self.db_manager and self.db_manager.conn:
+            if self.db_manager and self.db_manager.connected:
                 self.log_message("Auto-starting monitoring...")
                 # Brief delay to ensure DB connection is fully established
                 QTimer.singleShot(1000, self.start_monitoring)
@@ -437,9 +651,12 @@ class AttendanceMonitorApp:
     
     def connect_to_database(self, silent=False, retry_count=0, max_retries=3):
         connection_params = {field: widget.text().strip() for field, widget in self.ui.connection_fields.items()}
+        backend_name = self.settings.value("storage_backend", "sqlserver")
+        backend_class = BACKENDS.get(backend_name, SqlServerBackend)
+        required_params = backend_class.required_params
         
-        # Validate input fields
-        missing_fields = [field.capitalize() for field, value in connection_params.items() if not value]
+        # Validate input fields (SQLite only needs a database file)
+        missing_fields = [field.capitalize() for field in required_params if not connection_params.get(field)]
         if missing_fields:
             error_msg = f"Please fill in: {', '.join(missing_fields)}"
             self.log_message(error_msg)
@@ -447,7 +664,24 @@ class AttendanceMonitorApp:
                 self.ui.show_error_dialog('Error', error_msg)
             return
         
-        self.db_manager = DatabaseManager(connection_params, self.notification_manager)
+        # Not retried: an ingest mode the backend can't run never starts working
+        ingest_mode = self.settings.value("ingest_mode", backend_class.default_ingest_mode)
+        if ingest_mode not in backend_class.ingest_modes:
+            error_msg = (f"Ingest mode '{ingest_mode}' is not supported by the {backend_name} backend "
+                         f"(supported: {', '.join(backend_class.ingest_modes)})")
+            self.log_message(error_msg)
+            if not silent:
+                self.ui.show_error_dialog('Error', error_msg)
+            return
+        
+        data_dir = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppDataLocation)
+        self.db_manager = DatabaseManager(
+            connection_params, self.notification_manager, ingest_mode=ingest_mode,
+            audit_spill_path=os.path.join(data_dir, "audit_spill.jsonl"),
+            audit_mode=self.settings.value("audit_mode", "changes"),
+            pool_size=int(self.settings.value("db_pool_size", 3)),
+            backend=backend_name
+        )
         success, message = self.db_manager.connect()
         
         if success:
@@ -480,11 +714,11 @@ class AttendanceMonitorApp:
         if folder_path:
             self.ui.folder_path_label.setText(folder_path)
             self.save_settings()
-            if self.db_manager and self.db_manager.conn:
+            if self.db_manager and self.db_manager.connected:
                 self.ui.start_btn.setEnabled(True)
     
     def start_monitoring(self):
-        if not self.db_manager or not self.db_manager.conn:
+        if not self.db_manager or not self.db_manager.connected:
             self.log_message("Not connected to database")
             self.ui.show_warning_dialog('Warning', 'Connect to database first')
             return
@@ -500,8 +734,15 @@ class AttendanceMonitorApp:
             self.ui.show_error_dialog('Error', f'Folder {folder_path} does not exist')
             return
         
-        self.monitor_thread = FolderMonitorThread(folder_path, self.db_manager, self.notification_manager)
-        self.monitor_thread.log_signal.connect(self.log_message)
+        self.monitor_thread = FolderMonitorThread(
+            folder_path, self.db_manager, self.notification_manager, self.ledger,
+            quiet_period=float(self.settings.value("event_quiet_period", 2.0)),
+            parse_workers=int(self.settings.value("parse_workers", default_parse_workers())),
+            spool=self.spool
+        )
+        # Direct: the worker posts straight into the batched log channel, no queued event per line
+        self.monitor_thread.log_signal.connect(self.log_channel.post, Qt.ConnectionType.DirectConnection)
+        self.monitor_thread.stopped_signal.connect(self.monitoring_failed)
         self.monitor_thread.start()
         
         self.ui.start_btn.setEnabled(False)
@@ -523,7 +764,7 @@ class AttendanceMonitorApp:
             self.monitor_thread = None
         
         # Fix: Use a boolean check instead of passing the connection object
-        self.ui.start_btn.setEnabled(self.db_manager is not None and self.db_manager.conn is not None)
+        self.ui.start_btn.setEnabled(self.db_manager is not None and self.db_manager.connected)
         self.ui.stop_btn.setEnabled(False)
         self.ui.connect_btn.setEnabled(True)
         self.ui.select_folder_btn.setEnabled(True)  # Re-enable folder selection when monitoring stops
@@ -535,6 +776,18 @@ class AttendanceMonitorApp:
         # Add notification
         self.notification_manager.monitoring_stopped()
 
+    def close_database(self):
+        """Flush the audit writer and close the pool; safe to call more than once"""
+        if self.db_manager:
+            self.db_manager.close()
+
+    def monitoring_failed(self, reason):
+        """The monitor thread gave up on its own; reset the controls so the user can restart it"""
+        if self.monitor_thread is None or self.monitor_thread is not self.sender():
+            return
+        self.log_message(f"Monitoring stopped unexpectedly: {reason}")
+        self.stop_monitoring()
+
     def closeEvent(self, event):
         # Save settings
         self.save_settings()
@@ -546,11 +799,9 @@ class AttendanceMonitorApp:
         )
         
         if reply == QMessageBox.StandardButton.Yes:
-            # Quit the application
-            if self.monitor_thread:
-                self.stop_monitoring()
+            # Quit the application, flushing the audit log and closing the database like the tray's Quit
             event.accept()
-            QApplication.instance().quit()
+            self.quit_app()
         elif reply == QMessageBox.StandardButton.No:
             # Minimize to system tray
             self.ui.hide()
@@ -563,6 +814,15 @@ class AttendanceMonitorApp:
         # Save settings
         self.save_settings()
         
+        # Interrupt background queries and exports before their connections are closed
+        self.cancel_query()
+        if self.export_thread is not None:
+            self.export_thread.cancel()
+            self.export_thread.wait(2000)
+        for thread in list(self.query_threads):
+            thread.cancel()
+            thread.wait(2000)
+        
         # Stop resource monitoring
         if hasattr(self, 'resource_timer'):
             self.resource_timer.stop()
@@ -588,6 +848,13 @@ class AttendanceMonitorApp:
                 self.log_message(f"Error stopping monitoring thread: {str(e)}")
             self.monitor_thread = None
         
+        # Close the processed-file ledger and the offline spool
+        try:
+            self.ledger.close()
+            self.spool.close()
+        except Exception as e:
+            self.log_message(f"Error closing local stores: {str(e)}")
+        
         # Properly clean up database connection
         if self.db_manager:
             try:
@@ -615,6 +882,12 @@ class AttendanceMonitorApp:
                     pass
         except:
             pass
+        
+        # Stop the toast thread; anything still waiting is dropped
+        self.notification_manager.shutdown()
+        
+        # Write out the last batch of log lines and close the log file
+        self.log_channel.close()
             
         # Use a timer to ensure application quits cleanly
         QTimer.singleShot(200, QApplication.instance().quit)
@@ -639,15 +912,15 @@ class AttendanceMonitorApp:
             if cpu_percent > 50:  # Over 50%
                 self.log_message(f"High CPU usage: {cpu_percent:.1f}%")
                 
-            # Perform cleanup if memory is very high
-            if memory_mb > 800:  # Over 800MB
-                self.log_message("Performing memory cleanup due to high usage")
-                if hasattr(self, 'monitor_thread') and self.monitor_thread:
-                    # Trim the processed files set to reduce memory
-                    if len(self.monitor_thread.processed_files) > 500:
-                        old_size = len(self.monitor_thread.processed_files)
-                        self.monitor_thread.processed_files = set(list(self.monitor_thread.processed_files)[-400:])
-                        self.log_message(f"Trimmed processed files history from {old_size} to {len(self.monitor_thread.processed_files)}")
+            # Expire processed-file ledger entries past their retention period
+            evicted = self.ledger.evict_expired()
+            if evicted:
+                self.log_message(f"Expired {evicted} processed file entries older than {self.ledger.retention_days} days")
+            
+            # Drop quarantined spool files (and their stored rows) past their retention period
+            evicted = self.spool.evict_quarantined()
+            if evicted:
+                self.log_message(f"Removed {evicted} quarantined spool files older than {self.spool.quarantine_days} days")
         except Exception as e:
             # Silently handle errors in resource monitoring
             pass
@@ -655,14 +928,15 @@ class AttendanceMonitorApp:
     def change_filter_type(self, index):
         """Change the filter type based on the dropdown selection"""
         self.ui.filter_stack.setCurrentIndex(index)
+        self.cancel_query(reason="filter changed")
         
         # If employee ID is selected and we have a DB connection, try to load suggestions
-        if index == 1 and self.db_manager and self.db_manager.conn:
+        if index == 1 and self.db_manager and self.db_manager.connected:
             self.load_employee_suggestions()
 
     def load_employee_suggestions(self):
         """Load employee ID suggestions from the database"""
-        if not self.db_manager or not self.db_manager.conn:
+        if not self.db_manager or not self.db_manager.connected:
             return
             
         try:
@@ -679,51 +953,123 @@ class AttendanceMonitorApp:
             self.log_message(f"Error loading employee suggestions: {str(e)}")
 
     def query_database(self):
-        """Query the database with the selected filter"""
-        if not self.db_manager or not self.db_manager.conn:
+        """Query the database with the selected filter on a background thread, a page at a time"""
+        if not self.db_manager or not self.db_manager.connected:
             self.ui.show_warning_dialog("Database Error", "Not connected to database")
             return
         
-        try:
-            filter_type = self.ui.filter_type.currentIndex()
-            
-            # Query using the appropriate method based on filter type
-            if filter_type == 0:  # Date
-                selected_date = self.ui.date_filter.date().toString("yyyy-MM-dd")
-                results, columns = self.db_manager.query_by_date(selected_date)
-                filter_desc = f"Date: {selected_date}"
-                
-            else:  # Employee ID
-                # Get the employee ID from the text field
-                employee_id = self.ui.employee_id_filter.text().strip()
-                
-                if not employee_id:
-                    self.ui.show_warning_dialog("Input Error", "Please enter an Employee ID")
-                    return
-                    
-                results, columns = self.db_manager.query_by_employee_id(employee_id)
-                filter_desc = f"Employee ID: {employee_id}"
-    
-            # Update the results table
-            self.ui.set_results_table_data(results, columns)
-            
-            # Switch to the database tab
-            self.ui.tab_widget.setCurrentIndex(1)
+        filter_type = self.ui.filter_type.currentIndex()
+        db_manager = self.db_manager
+        page_size = int(self.settings.value("query_page_size", QUERY_PAGE_SIZE))
+        
+        # Pick the paged query for the selected filter type
+        if filter_type == 0:  # Date
+            selected_date = self.ui.date_filter.date().toString("yyyy-MM-dd")
+            fetch_page = lambda after, handle: db_manager.query_page_by_date(selected_date, after, page_size, handle)
+            query_filter = ('date', selected_date, f"Date: {selected_date}")
             
-            self.log_message(f"Executed query with filter: {filter_desc}")
+        else:  # Employee ID
+            # Get the employee ID from the text field
+            employee_id = self.ui.employee_id_filter.text().strip()
             
-            if not results or len(results) == 0:
-                self.log_message(f"Query completed: No data found for {filter_desc}")
-                     
-        except Exception as e:
-            self.ui.show_error_dialog("Query Error", f"Error querying database: {str(e)}")
-            self.log_message(f"Database query error: {str(e)}")
+            if not employee_id:
+                self.ui.show_warning_dialog("Input Error", "Please enter an Employee ID")
+                return
+                
+            fetch_page = lambda after, handle: db_manager.query_page_by_employee_id(employee_id, after, page_size, handle)
+            query_filter = ('employee', employee_id, f"Employee ID: {employee_id}")
+        
+        self.cancel_query()  # Only the latest query may fill the table
+        self.fetch_page = fetch_page
+        self.next_page_key = None
+        self.log_message(f"Running query with filter: {query_filter[2]}")
+        self.start_query(lambda handle: fetch_page(None, handle), query_filter)
+
+    def fetch_next_page(self):
+        """Load the next page once the results view has scrolled to the end"""
+        if self.query_thread is not None:
+            return  # A new query is loading; it resets the model
+        if self.fetch_page is None or self.next_page_key is None:
+            self.ui.results_model.stop_fetching()
+            return
+        fetch_page, after = self.fetch_page, self.next_page_key
+        self.start_query(lambda handle: fetch_page(after, handle), None)
+
+    def start_query(self, run_query, query_filter):
+        """Run one page query in a QueryThread; query_filter is None for follow-up pages"""
+        self.query_id += 1
+        thread = QueryThread(self.query_id, run_query, timeout=float(self.settings.value("query_timeout", 60)))
+        thread.result_signal.connect(lambda query_id, page: self.page_loaded(query_id, page, query_filter))
+        thread.error_signal.connect(self.query_failed)
+        thread.finished.connect(lambda: self.query_threads.discard(thread))
+        self.query_threads.add(thread)
+        self.query_thread = thread
+        
+        self.ui.set_query_running(True)
+        thread.start()
+
+    def page_loaded(self, query_id, page, query_filter):
+        if query_id != self.query_id:
+            return  # Superseded by a newer query or a filter change
+        self.query_thread = None
+        self.ui.set_query_running(False)
+        results, columns, self.next_page_key = page
+        has_more = self.next_page_key is not None
+        
+        if query_filter is None:
+            self.ui.append_results_table_data(results, has_more)
+            return
+        self.results_filter = query_filter
+        filter_desc = query_filter[2]
+        
+        # Update the results table
+        self.ui.set_results_table_data(results, columns, has_more)
+        
+        # Switch to the database tab
+        self.ui.tab_widget.setCurrentIndex(1)
+        
+        self.log_message(f"Executed query with filter: {filter_desc}")
+        
+        if not results or len(results) == 0:
+            self.log_message(f"Query completed: No data found for {filter_desc}")
+
+    def query_failed(self, query_id, message):
+        if query_id != self.query_id:
+            return
+        self.query_thread = None
+        self.next_page_key = None
+        self.ui.results_model.stop_fetching()
+        self.ui.set_query_running(False)
+        self.ui.show_results_count(suffix="query failed")
+        self.ui.show_error_dialog("Query Error", f"Error querying database: {message}")
+        self.log_message(f"Database query error: {message}")
+
+    def cancel_query(self, reason=None):
+        """Cancel the query the results table is waiting for, if any; its reply is discarded"""
+        thread, self.query_thread = self.query_thread, None
+        if thread is None:
+            return
+        self.query_id += 1
+        thread.cancel()
+        self.next_page_key = None
+        self.ui.results_model.stop_fetching()
+        self.ui.set_query_running(False)
+        self.ui.show_results_count(suffix="query cancelled")
+        if reason:
+            self.log_message(f"Query {reason}: discarded its results")
 
     def export_results(self):
-        """Export the current table results to CSV or Excel"""
-        if self.ui.results_table.rowCount() == 0:
+        """Export every record matching the shown results' filter to CSV or Excel.
+
+        The filter is re-run on a background thread and streamed to the file,
+        so the export is not limited to the pages loaded in the table.
+        """
+        if self.results_filter is None or self.ui.results_count() == 0:
             self.ui.show_message_box("Export", "No data to export")
             return
+        if self.export_thread is not None:
+            self.ui.show_message_box("Export", "An export is already running")
+            return
         
         # Ask for file location
         file_path, selected_filter = self.ui.get_save_file_dialog(
@@ -736,54 +1082,41 @@ class AttendanceMonitorApp:
         if not file_path:
             return
         
-        try:
-            # Get table data from UI
-            headers, data = self.ui.get_table_data()
-            
-            # Export based on file extension
-            if file_path.lower().endswith('.csv'):
-                import csv
-                with open(file_path, 'w', newline='') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(headers)
-                    writer.writerows(data)
-            elif file_path.lower().endswith('.xlsx'):
-                import openpyxl
-                wb = openpyxl.Workbook()
-                ws = wb.active
-                ws.append(headers)
-                for row_data in data:
-                    ws.append(row_data)
-                wb.save(file_path)
-            else:
-                # Add default extension if none provided
-                if "csv" in selected_filter.lower():
-                    file_path += ".csv"
-                    import csv
-                    with open(file_path, 'w', newline='') as f:
-                        writer = csv.writer(f)
-                        writer.writerow(headers)
-                        writer.writerows(data)
-                else:
-                    file_path += ".xlsx"
-                    import openpyxl
-                    wb = openpyxl.Workbook()
-                    ws = wb.active
-                    ws.append(headers)
-                    for row_data in data:
-                        ws.append(row_data)
-                    wb.save(file_path)
-            
-            self.log_message(f"Exported {self.ui.results_table.rowCount()} records to {file_path}")
-            self.ui.show_message_box("Export Successful", f"Data exported to {file_path}")
-            
-        except Exception as e:
-            self.ui.show_error_dialog("Export Error", f"Error exporting data: {str(e)}")
-            self.log_message(f"Export error: {str(e)}")
+        # Add default extension if none provided
+        if not file_path.lower().endswith(('.csv', '.xlsx')):
+            file_path += ".csv" if "csv" in selected_filter.lower() else ".xlsx"
+        
+        filter_name, value, filter_desc = self.results_filter
+        thread = ExportThread(self.db_manager, filter_name, value, file_path)
+        progress = self.ui.create_progress_dialog("Export Results", f"Exporting {filter_desc}...")
+        progress.canceled.connect(thread.cancel)
+        thread.progress_signal.connect(lambda written, total: self.ui.update_progress_dialog(progress, written, total))
+        thread.finished_signal.connect(self.export_finished)
+        thread.error_signal.connect(self.export_failed)
+        thread.finished.connect(lambda: self.export_thread_done(thread, progress))
+        self.export_thread = thread
+        self.log_message(f"Exporting {filter_desc} to {file_path}")
+        thread.start()
+
+    def export_finished(self, file_path, written):
+        self.log_message(f"Exported {written} records to {file_path}")
+        self.ui.show_message_box("Export Successful", f"Data exported to {file_path}")
+
+    def export_failed(self, message):
+        self.ui.show_error_dialog("Export Error", f"Error exporting data: {message}")
+        self.log_message(f"Export error: {message}")
+
+    def export_thread_done(self, thread, progress):
+        if thread.handle.cancelled:
+            self.log_message("Export cancelled")
+        progress.canceled.disconnect(thread.cancel)  # Closing the dialog emits canceled
+        progress.close()
+        if self.export_thread is thread:
+            self.export_thread = None
 
 def create_default_icon():
     """Create a default icon if logo.png doesn't exist using PyQt6"""
-    from PyQt6.QtGui import QIcon, QPixmap, QPainter, QColor, QFont, QBrush
+    from PyQt6.QtGui import QPixmap, QPainter, QColor, QFont
     from PyQt6.QtCore import Qt, QRect
     
     icon_path = resource_path("logo.png")
@@ -820,6 +1153,9 @@ def create_default_icon():
     return True
 
 if __name__ == "__main__":
+    # Parser processes re-launch the frozen executable; let them run their task instead of the app
+    multiprocessing.freeze_support()
+    
     # Check if another instance is already running
     if is_already_running():
         # Create minimal QApplication to show message box
@@ -0,0 +1,169 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+# SQL Server caps a VALUES list at 1000 rows and a statement at 2100 parameters (4 per log row)
+MAX_ROWS_PER_INSERT = 500
+DESCRIPTION_LIMIT = 500
+
+
+class AuditLogWriter:
+    """Buffered, asynchronous writer for the `logs` table.
+
+    log() only appends to an in-memory buffer. A background thread owning its
+    own connection flushes the buffer with multi-row INSERTs once `max_batch`
+    events are waiting or `flush_interval` seconds have passed. Events carry
+    the time they were logged, not the time they were flushed. When the
+    database is unreachable, events are appended to `spill_path` (JSON lines)
+    and replayed ahead of new events once a flush succeeds again.
+    """
+
+    def __init__(self, connect, spill_path=None, max_batch=200, flush_interval=2.0, placeholder='?', max_params=2100):
+        self.connect = connect  # Returns a new DB-API connection
+        self.placeholder = placeholder  # '?' (pyodbc, sqlite3) or '%s' (psycopg2)
+        self.rows_per_insert = max(1, min(MAX_ROWS_PER_INSERT, max_params // 4))
+        self.spill_path = spill_path
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.conn = None
+        self._buffer = []
+        self._condition = threading.Condition()
+        self._flush_requested = False
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="AuditLogWriter", daemon=True)
+        self._thread.start()
+
+    def log(self, event_type, event_description, file_name):
+        self.log_many([(event_type, event_description, file_name)])
+
+    def log_many(self, events):
+        """Queue (event_type, event_description, file_name) records"""
+        now = datetime.now()
+        with self._condition:
+            self._buffer.extend(
+                (event_type, (event_description or '')[:DESCRIPTION_LIMIT], file_name, now)
+                for event_type, event_description, file_name in events
+            )
+            if len(self._buffer) >= self.max_batch:
+                self._condition.notify()
+
+    def flush(self):
+        """Ask the writer thread to flush now, without waiting for it"""
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify()
+
+    def pending(self):
+        with self._condition:
+            return len(self._buffer)
+
+    def close(self, timeout=10.0):
+        """Stop the writer after a final flush (spilling whatever cannot be written)"""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        else:
+            self._flush_once()
+        self._close_connection()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                deadline = time.monotonic() + self.flush_interval
+                while self._running and not self._flush_requested and len(self._buffer) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                self._flush_requested = False
+                running = self._running
+            self._flush_once()
+            if not running:
+                return
+
+    def _flush_once(self):
+        with self._condition:
+            events, self._buffer = self._buffer, []
+        spilled = self._read_spill()
+        if not events and not spilled:
+            return
+        try:
+            self._insert(spilled + events)
+            if spilled:
+                os.remove(self.spill_path)
+        except Exception as e:
+            if events:
+                print(f"Failed to write {len(events)} log events, spilling to disk: {str(e)}")
+            self._close_connection()  # Reconnect on the next flush
+            self._spill(events)
+
+    def _insert(self, events):
+        if self.conn is None:
+            self.conn = self.connect()
+        cursor = self.conn.cursor()
+        try:
+            row_placeholders = "(" + ", ".join([self.placeholder] * 4) + ")"
+            for start in range(0, len(events), self.rows_per_insert):
+                rows = events[start:start + self.rows_per_insert]
+                placeholders = ", ".join([row_placeholders] * len(rows))
+                cursor.execute(
+                    f"INSERT INTO logs (event_type, event_description, file_name, timestamp) VALUES {placeholders}",
+                    [value for row in rows for value in row]
+                )
+            self.conn.commit()
+        except Exception:
+            try:
+                self.conn.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            cursor.close()
+
+    def _spill(self, events):
+        if not events:
+            return
+        if not self.spill_path:
+            print(f"Dropped {len(events)} log events (no spill file configured)")
+            return
+        try:
+            with open(self.spill_path, 'a', encoding='utf-8') as f:
+                for event_type, description, file_name, logged_at in events:
+                    f.write(json.dumps([event_type, description, file_name, logged_at.isoformat()]) + "\n")
+        except Exception as e:
+            print(f"Failed to spill {len(events)} log events: {str(e)}")
+
+    def _read_spill(self):
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return []
+        events = []
+        try:
+            with open(self.spill_path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        event_type, description, file_name, logged_at = json.loads(line)
+                        events.append((event_type, description, file_name, datetime.fromisoformat(logged_at)))
+                    except ValueError:
+                        continue  # Torn last line after a crash
+        except Exception as e:
+            print(f"Failed to read log spill file: {str(e)}")
+        return events
+
+    def _close_connection(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
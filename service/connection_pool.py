@@ -0,0 +1,141 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PoolClosedError(Exception):
+    """Raised by acquire() after the pool has been closed"""
+
+
+class ConnectionPool:
+    """Small, bounded, thread-safe pool of DB-API connections.
+
+    A connection is leased to one caller at a time, so threads never share a
+    cursor. Connections idle for more than `check_after` seconds are pinged
+    before reuse, and a connection that fails its ping or errors during a
+    lease is thrown away and replaced. New connections are opened with
+    exponential backoff, so a network blip costs a retry instead of a restart.
+    """
+
+    def __init__(self, connect, max_size=4, check_after=30.0, ping_sql="SELECT 1",
+                 retries=3, backoff=1.0, max_backoff=30.0):
+        self.connect = connect  # Returns a new DB-API connection
+        self.max_size = max_size
+        self.check_after = check_after
+        self.ping_sql = ping_sql
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._idle = []  # (connection, last released at), most recent last
+        self._size = 0  # Open connections, idle or leased
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def acquire(self, timeout=None, retries=None):
+        """Lease a live connection, waiting up to `timeout` seconds for a free slot"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise PoolClosedError("Connection pool is closed")
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1  # Reserve the slot before connecting outside the lock
+                    conn = None
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"No database connection free after {timeout}s")
+                self._condition.wait(remaining)
+
+        if conn is not None:
+            if time.monotonic() - released_at < self.check_after or self.is_alive(conn):
+                return conn
+            _close_quietly(conn)  # Dead; reuse its slot for a fresh one
+
+        try:
+            return self._open(self.retries if retries is None else retries)
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+    def release(self, conn, broken=False):
+        """Return a leased connection; broken ones are closed instead of reused"""
+        with self._condition:
+            if not broken and not self._closed:
+                self._idle.append((conn, time.monotonic()))
+                self._condition.notify()
+                return
+            self._size -= 1
+            self._condition.notify()
+        _close_quietly(conn)
+
+    @contextmanager
+    def connection(self, timeout=None, retries=None):
+        """Lease a connection for a with-block; errors roll back and health-check it"""
+        conn = self.acquire(timeout, retries)
+        broken = False
+        try:
+            yield conn
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            broken = not self.is_alive(conn)
+            raise
+        finally:
+            self.release(conn, broken)
+
+    def is_alive(self, conn):
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self.ping_sql)
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def close(self):
+        """Close idle connections now and leased ones as they are released"""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for conn, _ in idle:
+            _close_quietly(conn)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def stats(self):
+        with self._condition:
+            return {'open': self._size, 'idle': len(self._idle), 'max_size': self.max_size}
+
+    def _open(self, retries):
+        delay = self.backoff
+        for attempt in range(retries + 1):
+            try:
+                return self.connect()
+            except Exception as e:
+                if attempt == retries or self._closed:
+                    raise
+                print(f"Database connection attempt {attempt + 1} failed, retrying in {delay:.0f}s: {str(e)}")
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
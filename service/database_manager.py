@@ -1,206 +1,664 @@
-import pyodbc
+import threading
 import pandas as pd
 from datetime import datetime
+from attendance_merge import merge_attendance, seconds_to_text, NO_CHANGE_REASON
+from audit_log import AuditLogWriter
+from connection_pool import ConnectionPool
+from storage_backends import get_backend
+
+# Columns stored in biometric_attendance, in staging/insert order
+ATTENDANCE_COLUMNS = [
+    'Punch_Date', 'Employee_ID', 'Employee_Name', 'Shift_In', 'Punch_In_Time',
+    'Punch_Out_Time', 'Shift_Out', 'Hours_Worked', 'Status', 'Late_By'
+]
+
+# ODBC parameter type codes (the values of pyodbc.SQL_*) for setinputsizes;
+# pyodbc itself is only imported by the SQL Server backend
+SQL_INTEGER = 4
+SQL_VARCHAR = 12
+SQL_TYPE_DATE = 91
+
+# 'full' writes a duplicate_records_log row for every re-ingested record;
+# 'changes' writes only real punch-time changes to attendance_change_log
+AUDIT_MODES = ('full', 'changes')
+
+# Interactive (UI thread) queries retry once instead of backing off for long
+INTERACTIVE_RETRIES = 1
+
+# Seconds a UI-thread caller waits for a free pooled connection before giving up
+INTERACTIVE_ACQUIRE_TIMEOUT = 2.0
+
+# Rows per page for the paged query APIs
+QUERY_PAGE_SIZE = 500
+
+# Rows per fetchmany() when streaming a result set (exports)
+STREAM_CHUNK_SIZE = 5000
+
+# Results-view filters: the condition on the filter value and the row order
+ATTENDANCE_FILTERS = {
+    'date': ("b.Punch_Date = ?", "b.Employee_ID"),
+    'employee': ("b.Employee_ID = ?", "b.Punch_Date DESC"),
+}
+
+# Columns shown in the results view; the name comes from the employees dimension
+ATTENDANCE_SELECT_SQL = """
+    SELECT 
+        b.Punch_Date, 
+        b.Employee_ID, 
+        COALESCE(e.Employee_Name, b.Employee_Name) AS Employee_Name, 
+        b.Shift_In, 
+        b.Punch_In_Time, 
+        b.Punch_Out_Time, 
+        b.Shift_Out, 
+        b.Hours_Worked, 
+        b.Status, 
+        b.Late_By,
+        b.processed_at
+    FROM biometric_attendance b
+    LEFT JOIN employees e ON e.Employee_ID = b.Employee_ID
+"""
+
+class QueryCancelled(Exception):
+    """Raised by a query whose QueryHandle was cancelled or timed out"""
+
+
+class QueryHandle:
+    """Lets another thread cancel a running query, or cancels it after `timeout` seconds"""
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self.cancelled = False
+        self.timed_out = False
+        self._lock = threading.Lock()
+        self._cancel = None  # Interrupts the statement currently running
+
+    def attach(self, cancel):
+        with self._lock:
+            if self.cancelled:
+                raise QueryCancelled("Query cancelled")
+            self._cancel = cancel
+
+    def detach(self):
+        with self._lock:
+            self._cancel = None
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            cancel, self._cancel = self._cancel, None
+        if cancel is not None:
+            try:
+                cancel()
+            except Exception as e:
+                print(f"Failed to cancel query: {str(e)}")
+
+    def expire(self):
+        self.timed_out = True
+        self.cancel()
+
 
 class DatabaseManager:
-    def __init__(self, connection_params, notification_manager):
+    def __init__(self, connection_params, notification_manager, ingest_mode=None, audit_spill_path=None, audit_mode='full',
+                 pool_size=3, backend='sqlserver'):
         self.connection_params = connection_params
+        self.backend = get_backend(backend, connection_params)  # Dialect: connection, schema, portable SQL
         self.notification_manager = notification_manager
-        self.conn = None
+        self.pool_size = pool_size
+        self.pool = None  # ConnectionPool; ingestion and UI queries each lease their own connection
+        self.ingest_mode = ingest_mode or self.backend.default_ingest_mode  # Checked against the backend in connect()
+        self.audit_mode = audit_mode if audit_mode in AUDIT_MODES else 'full'
+        self.audit_spill_path = audit_spill_path
+        self.audit_log = None  # AuditLogWriter, started once connected
+        self.employee_names = None  # Employee_ID -> (name, last_seen) as stored in employees; loaded on first ingest
         
+    def open_connection(self):
+        """Open a new connection with the stored parameters"""
+        return self.backend.connect()
+
+    @property
+    def connected(self):
+        return self.pool is not None and not self.pool.closed
+
+    def is_reachable(self):
+        """True if the database answers a ping right now (a dead idle connection is replaced once)"""
+        if self.pool is None:
+            return False
+        for _ in range(2):
+            try:
+                conn = self.pool.acquire(timeout=5, retries=0)
+            except Exception:
+                return False
+            alive = self.pool.is_alive(conn)
+            self.pool.release(conn, broken=not alive)
+            if alive:
+                return True
+        return False
+
     def connect(self):
+        # The row/transactional/bulk SQL is T-SQL; refuse a mode here rather than fail mid-ingest
+        if self.ingest_mode not in self.backend.ingest_modes:
+            return False, (f"Ingest mode '{self.ingest_mode}' is not supported by the {self.backend.name} backend "
+                           f"(supported: {', '.join(self.backend.ingest_modes)})")
         try:
-            # Add connection timeout
-            self.conn = pyodbc.connect(
-                f"DRIVER={{ODBC Driver 17 for SQL Server}};"
-                f"SERVER={self.connection_params['host']},{self.connection_params['port']};"
-                f"DATABASE={self.connection_params['database']};"
-                f"UID={self.connection_params['username']};"
-                f"PWD={self.connection_params['password']};"
-                f"Connection Timeout=30;"
-                f"TrustServerCertificate=yes;"
-            )
-            
-            # Set better timeout for queries
-            self.conn.timeout = 60
-            self.create_tables()
+            if self.pool is None:
+                self.pool = ConnectionPool(self.open_connection, max_size=self.pool_size)
+            with self.pool.connection(retries=0) as conn:
+                self.create_tables(conn)
+                
+                # Test connection with a simple query
+                cursor = conn.cursor()
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+                cursor.close()
             
-            # Test connection with a simple query
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT @@version")
-            cursor.fetchone()
-            cursor.close()
+            # Audit events are written in the background on a separate connection
+            if self.audit_log is None:
+                self.audit_log = AuditLogWriter(
+                    self.open_connection, self.audit_spill_path,
+                    placeholder=self.backend.placeholder, max_params=self.backend.max_params
+                )
+                self.audit_log.start()
             
             self.notification_manager.db_connected()
             return True, "Successfully connected to database"
         except Exception as e:
+            if self.pool is not None:
+                self.pool.close()
+                self.pool = None
             return False, f"Connection error: {str(e)}"
 
-    def create_tables(self):
-        create_table_query = """
-        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='biometric_attendance' AND xtype='U')
-        CREATE TABLE biometric_attendance (
-            id INT IDENTITY(1,1) PRIMARY KEY,
-            Punch_Date DATE,
-            Employee_ID VARCHAR(50),
-            Employee_Name VARCHAR(100),
-            Shift_In TIME,
-            Punch_In_Time TIME,
-            Punch_Out_Time TIME,
-            Shift_Out TIME,
-            Hours_Worked VARCHAR(8),
-            Status VARCHAR(50),
-            Late_By TIME,
-            file_hash VARCHAR(64),
-            processed_at DATETIME DEFAULT GETDATE(),
-            CONSTRAINT unique_employee_record UNIQUE (Punch_Date, Employee_ID)
-        );
-        
-        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='duplicate_records_log' AND xtype='U')
-        CREATE TABLE duplicate_records_log (
-            id INT IDENTITY(1,1) PRIMARY KEY,
-            Punch_Date DATE,
-            Employee_ID VARCHAR(50),
-            Employee_Name VARCHAR(100),
-            file_name VARCHAR(255),
-            logged_at DATETIME DEFAULT GETDATE(),
-            reason TEXT
-        );
-        
-        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='logs' AND xtype='U')
-        CREATE TABLE logs (
-            id INT IDENTITY(1,1) PRIMARY KEY,
-            event_type VARCHAR(50),
-            event_description TEXT,
-            file_name VARCHAR(255),
-            timestamp DATETIME DEFAULT GETDATE()
-        );
-        """
-        cursor = self.conn.cursor()
-        cursor.execute(create_table_query)
-        self.conn.commit()
-        cursor.close()
+    def create_tables(self, conn):
+        """Bring the schema up to date; a no-op beyond a version check once migrated"""
+        applied = self.backend.migrate(conn)
+        if applied:
+            print(f"Applied schema migrations: {', '.join(str(version) for version in applied)}")
 
     def log_event(self, event_type, event_description, file_name):
+        self.log_events([(event_type, event_description, file_name)])
+
+    def log_events(self, events, commit=True, conn=None):
+        """Record many (event_type, event_description, file_name) events.
+
+        Events go to the buffered audit writer; without one they are written
+        here in one round trip (on the caller's `conn` and inside its
+        transaction if commit=False).
+        """
+        if not events:
+            return
+        if self.audit_log is not None:
+            self.audit_log.log_many(events)
+            return
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(
-                "INSERT INTO logs (event_type, event_description, file_name, timestamp) VALUES (?, ?, ?, GETDATE())",
-                (event_type, event_description[:500], file_name)
-            )
-            self.conn.commit()
-            cursor.close()
+            if conn is None:
+                with self.pool.connection() as conn:
+                    self._write_log_rows(conn, events, True)
+            else:
+                self._write_log_rows(conn, events, commit)
         except Exception as e:
-            print(f"Failed to log event: {str(e)}")
+            print(f"Failed to log {len(events)} events: {str(e)}")
+
+    def _write_log_rows(self, conn, events, commit):
+        cursor = conn.cursor()
+        cursor.executemany(
+            self.backend.sql("INSERT INTO logs (event_type, event_description, file_name, timestamp) VALUES (?, ?, ?, CURRENT_TIMESTAMP)"),
+            [(event_type, event_description[:500], file_name) for event_type, event_description, file_name in events]
+        )
+        if commit:
+            conn.commit()
+        cursor.close()
 
     def insert_attendance_data(self, df, file_hash, file_name):
-        cursor = self.conn.cursor()
+        return self.insert_attendance_chunks([df], file_hash, file_name)
+
+    def insert_attendance_chunks(self, chunks, file_hash, file_name):
+        """Ingest one file delivered as an iterable of DataFrame chunks.
+
+        'row' mode commits after every row as it always has; the other modes
+        validate each chunk, apply it without committing, and commit the whole
+        file once together with its batched Error/Summary events.
+        """
+        if not self.backend.native_ingest:
+            # Other dialects run their own portable merge (their only mode, checked in connect())
+            def apply_chunk(cursor, df, file_hash, file_name, events):
+                return self.backend.apply_chunk(cursor, df, file_hash, file_name, self.audit_mode)
+        elif self.ingest_mode == 'row':
+            return self._row_insert_chunks(chunks, file_hash, file_name)
+        else:
+            apply_chunk = {
+                'transactional': self._transactional_apply,
+                'bulk': self._bulk_apply,
+                'vectorized': self._vectorized_apply,
+            }[self.ingest_mode]
+
+        # Set-based applies fold in-file duplicate keys into one record; count those rows separately
+        merges_duplicates = not (self.backend.native_ingest and self.ingest_mode == 'transactional')
+
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            events = []
+            employees = {}
+            total_records = 0
+            successful_inserts = 0
+            successful_updates = 0
+            unchanged_records = 0
+            duplicate_records = 0
+            rejected_records = 0
+
+            try:
+                for df in chunks:
+                    total_records += len(df)
+                    valid_df, rejected = self._validate_attendance_rows(df, file_name)
+                    events.extend(rejected)
+                    rejected_records += len(df) - len(valid_df)
+                    inserted, updated, unchanged = apply_chunk(cursor, valid_df, file_hash, file_name, events)
+                    successful_inserts += inserted
+                    successful_updates += updated
+                    unchanged_records += unchanged
+                    if merges_duplicates:
+                        duplicate_records += _duplicate_key_count(valid_df)
+                    self._collect_employee_changes(cursor, valid_df, employees)
+
+                if employees:
+                    self.backend.upsert_employees(cursor, employees)
+                summary_msg = self._summary_message(total_records, successful_inserts, successful_updates, unchanged_records,
+                                                    duplicate_records, rejected_records)
+                events.append(("Summary", summary_msg, file_name))
+                if self.audit_log is None:
+                    self.log_events(events, commit=False, conn=conn)  # Commit together with the data
+                conn.commit()
+                if employees:
+                    self.employee_names.update(employees)
+                if self.audit_log is not None:
+                    self.log_events(events)  # Only audit what was actually committed
+            except Exception as e:
+                conn.rollback()
+                self.log_event("Error", f"{self.ingest_mode.capitalize()} ingest rolled back: {str(e)[:200]}", file_name)
+                raise
+            finally:
+                cursor.close()
+
+        return summary_msg
+
+    def _row_insert_chunks(self, chunks, file_hash, file_name):
         successful_inserts = 0
         successful_updates = 0
-        total_records = len(df)
+        unchanged_records = 0
+        total_records = 0
+        
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            employees = {}
+            for df in chunks:
+                total_records += len(df)
+                try:
+                    self._collect_employee_changes(cursor, df.dropna(subset=['Employee_ID']), employees)
+                except Exception as e:
+                    print(f"Failed to read employees: {str(e)}")
+                for _, row in df.iterrows():
+                    try:
+                        outcome = self._upsert_attendance_row(cursor, row, file_hash, file_name)
+                        conn.commit()
+                        if outcome == 'insert':
+                            successful_inserts += 1
+                        elif outcome == 'update':
+                            successful_updates += 1
+                        else:
+                            unchanged_records += 1
+                    except Exception as e:
+                        try:
+                            conn.rollback()
+                        except Exception:
+                            pass
+                        if not self.pool.is_alive(conn):
+                            raise  # Lost the connection, not a bad row: the caller spools the file
+                        self.log_event("Error", str(e)[:200], file_name)
+            if employees:
+                try:
+                    self.backend.upsert_employees(cursor, employees)
+                    conn.commit()
+                    self.employee_names.update(employees)
+                except Exception as e:
+                    conn.rollback()
+                    self.log_event("Error", f"Failed to update employees: {str(e)[:200]}", file_name)
+            cursor.close()
         
+        summary_msg = self._summary_message(total_records, successful_inserts, successful_updates, unchanged_records)
+        self.log_event("Summary", summary_msg, file_name)
+        return summary_msg
+
+    def _collect_employee_changes(self, cursor, df, employees):
+        """Add IDs in `df` that are new, or seen on a later date or renamed, to `employees`.
+
+        Each ID takes the name from its latest Punch_Date, so an older file
+        arriving late cannot undo a rename.
+        """
+        if self.employee_names is None:
+            cursor.execute("SELECT Employee_ID, Employee_Name, last_seen FROM employees")
+            self.employee_names = {
+                employee_id: (name, _as_date(last_seen)) for employee_id, name, last_seen in cursor.fetchall()
+            }
+        people = pd.DataFrame({
+            'Employee_ID': df['Employee_ID'].astype(str).str.strip(),
+            'Employee_Name': df['Employee_Name'],
+            'Punch_Date': df['Punch_Date'].map(_as_date),
+        })
+        people = people.sort_values('Punch_Date', kind='stable', na_position='first')
+        for employee_id, name, last_seen in people.drop_duplicates('Employee_ID', keep='last').itertuples(index=False, name=None):
+            name = None if pd.isna(name) else name
+            if not employee_id:
+                continue
+            current = employees.get(employee_id) or self.employee_names.get(employee_id)
+            if current is None:
+                employees[employee_id] = (name, last_seen)
+                continue
+            current_name, current_seen = current
+            if last_seen is None:
+                continue  # Undated rows never overwrite a known name
+            if current_seen is None or last_seen > current_seen or (last_seen == current_seen and name != current_name):
+                employees[employee_id] = (name, last_seen)
+
+    def _summary_message(self, total_records, inserted, updated, unchanged, duplicates=0, rejected=0):
+        """Per-file summary; in 'changes' audit mode it is the only trace of unchanged records.
+
+        Every count is in records (rows): `duplicates` are rows merged into an
+        earlier row with the same key in the same chunk, `rejected` rows that
+        failed validation.
+        """
+        message = (f"Processed {total_records} records. Inserted {inserted} records. "
+                   f"Updated {updated} records. Unchanged {unchanged} records.")
+        if duplicates:
+            message += f" Merged {duplicates} duplicate records."
+        if rejected:
+            message += f" Rejected {rejected} invalid records."
+        return message
+
+    def _transactional_apply(self, cursor, df, file_hash, file_name, events):
+        """Apply validated rows one by one inside the file transaction.
+
+        Each row runs under a savepoint, so a row that fails on the server is
+        rolled back on its own and recorded in `events` instead of aborting the file.
+        """
+        successful_inserts = 0
+        successful_updates = 0
+        unchanged_records = 0
+
+        cursor.execute("IF @@TRANCOUNT = 0 BEGIN TRANSACTION")
         for _, row in df.iterrows():
+            cursor.execute("SAVE TRANSACTION attendance_row")
             try:
-                employee_id = str(row['Employee_ID']).strip()
-                punch_date = row['Punch_Date']
-                
-                # Check if record exists
-                cursor.execute("SELECT Punch_In_Time, Punch_Out_Time FROM biometric_attendance WHERE Punch_Date=? AND Employee_ID=?", (punch_date, employee_id))
-                existing_record = cursor.fetchone()
-                
-                if existing_record:
-                    # Get existing punch times
-                    existing_in_time = existing_record[0]  # Punch_In_Time
-                    existing_out_time = existing_record[1]  # Punch_Out_Time
-                    
-                    # Get new punch times
-                    new_in_time = row['Punch_In_Time'] if pd.notna(row['Punch_In_Time']) else None
-                    new_out_time = row['Punch_Out_Time'] if pd.notna(row['Punch_Out_Time']) else None
-                    
-                    # Logic: Keep earliest punch-in time and latest punch-out time
-                    final_in_time = self.get_earliest_time(existing_in_time, new_in_time)
-                    final_out_time = self.get_latest_time(existing_out_time, new_out_time)
-                    
-                    # Get hours worked from Excel file
-                    hours_worked_value = row['Hours_Worked'] if pd.notna(row['Hours_Worked']) else None
+                outcome = self._upsert_attendance_row(cursor, row, file_hash, file_name)
+            except Exception as e:
+                # XACT_STATE() = -1 means the error doomed the whole transaction
+                cursor.execute("SELECT XACT_STATE()")
+                if cursor.fetchone()[0] == -1:
+                    raise
+                cursor.execute("ROLLBACK TRANSACTION attendance_row")
+                events.append(("Error", str(e)[:200], file_name))
+                continue
+            if outcome == 'insert':
+                successful_inserts += 1
+            elif outcome == 'update':
+                successful_updates += 1
+            else:
+                unchanged_records += 1
+
+        return successful_inserts, successful_updates, unchanged_records
+
+    def _upsert_attendance_row(self, cursor, row, file_hash, file_name):
+        """Insert or merge a single row without committing; returns 'insert', 'update' or 'unchanged'"""
+        employee_id = str(row['Employee_ID']).strip()
+        punch_date = row['Punch_Date']
+        
+        # Check if record exists
+        cursor.execute("SELECT Punch_In_Time, Punch_Out_Time FROM biometric_attendance WHERE Punch_Date=? AND Employee_ID=?", (punch_date, employee_id))
+        existing_record = cursor.fetchone()
+        
+        if existing_record:
+            # Get existing punch times
+            existing_in_time = existing_record[0]  # Punch_In_Time
+            existing_out_time = existing_record[1]  # Punch_Out_Time
+            
+            # Get new punch times
+            new_in_time = row['Punch_In_Time'] if pd.notna(row['Punch_In_Time']) else None
+            new_out_time = row['Punch_Out_Time'] if pd.notna(row['Punch_Out_Time']) else None
+            
+            # Logic: Keep earliest punch-in time and latest punch-out time
+            final_in_time = self.get_earliest_time(existing_in_time, new_in_time)
+            final_out_time = self.get_latest_time(existing_out_time, new_out_time)
+            
+            # Get hours worked from Excel file
+            hours_worked_value = row['Hours_Worked'] if pd.notna(row['Hours_Worked']) else None
+            
+            # Only update if we have changes
+            if (final_in_time != existing_in_time or final_out_time != existing_out_time):
+                # Log the update
+                if self.audit_mode == 'changes':
+                    cursor.execute(CHANGE_LOG_INSERT_SQL, (
+                        punch_date, employee_id, file_name,
+                        _time_text(existing_in_time), _time_text(final_in_time),
+                        _time_text(existing_out_time), _time_text(final_out_time)
+                    ))
+                else:
+                    reason = f"Record updated for date {punch_date} and employee {employee_id}. "
+                    if existing_in_time != final_in_time:
+                        reason += f"Punch-in updated from {existing_in_time} to {final_in_time}. "
+                    if existing_out_time != final_out_time:
+                        reason += f"Punch-out updated from {existing_out_time} to {final_out_time}."
                     
-                    # Only update if we have changes
-                    if (final_in_time != existing_in_time or final_out_time != existing_out_time):
-                        # Log the update
-                        reason = f"Record updated for date {punch_date} and employee {employee_id}. "
-                        if existing_in_time != final_in_time:
-                            reason += f"Punch-in updated from {existing_in_time} to {final_in_time}. "
-                        if existing_out_time != final_out_time:
-                            reason += f"Punch-out updated from {existing_out_time} to {final_out_time}."
-                        
-                        cursor.execute(
-                            "INSERT INTO duplicate_records_log (Punch_Date, Employee_ID, Employee_Name, file_name, reason, logged_at) VALUES (?, ?, ?, ?, ?, GETDATE())",
-                            (punch_date, employee_id, row['Employee_Name'], file_name, reason)
-                        )
-                        
-                        cursor.execute("""
-                            UPDATE biometric_attendance
-                            SET Employee_Name = ?,
-                                Shift_In = ?,
-                                Punch_In_Time = ?,
-                                Punch_Out_Time = ?,
-                                Shift_Out = ?,
-                                Hours_Worked = ?,
-                                Status = ?,
-                                Late_By = ?,
-                                file_hash = ?,
-                                processed_at = GETDATE()
-                            WHERE Punch_Date = ? AND Employee_ID = ?
-                        """, (
-                            row['Employee_Name'],
-                            row['Shift_In'] if pd.notna(row['Shift_In']) else None,
-                            final_in_time,
-                            final_out_time,
-                            row['Shift_Out'] if pd.notna(row['Shift_Out']) else None,
-                            hours_worked_value,  # Always use the Excel hours
-                            row['Status'],
-                            row['Late_By'] if pd.notna(row['Late_By']) else None,
-                            file_hash,
-                            punch_date,
-                            employee_id
-                        ))
-                        successful_updates += 1
-                        self.conn.commit()
-                        continue
-                    else:
-                        # Log that no changes were made
-                        cursor.execute(
-                            "INSERT INTO duplicate_records_log (Punch_Date, Employee_ID, Employee_Name, file_name, reason, logged_at) VALUES (?, ?, ?, ?, ?, GETDATE())",
-                            (punch_date, employee_id, row['Employee_Name'], file_name, "Record exists but no changes to punch times were needed")
-                        )
-                        self.conn.commit()
-                        continue
+                    cursor.execute(
+                        "INSERT INTO duplicate_records_log (Punch_Date, Employee_ID, Employee_Name, file_name, reason, logged_at) VALUES (?, ?, ?, ?, ?, GETDATE())",
+                        (punch_date, employee_id, row['Employee_Name'], file_name, reason)
+                    )
                 
-                # Insert new record
                 cursor.execute("""
-                    INSERT INTO biometric_attendance (Punch_Date, Employee_ID, Employee_Name, Shift_In, Punch_In_Time, Punch_Out_Time, Shift_Out, Hours_Worked, Status, Late_By, file_hash)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    UPDATE biometric_attendance
+                    SET Employee_Name = ?,
+                        Shift_In = ?,
+                        Punch_In_Time = ?,
+                        Punch_Out_Time = ?,
+                        Shift_Out = ?,
+                        Hours_Worked = ?,
+                        Status = ?,
+                        Late_By = ?,
+                        file_hash = ?,
+                        processed_at = GETDATE()
+                    WHERE Punch_Date = ? AND Employee_ID = ?
                 """, (
-                    punch_date,
-                    employee_id,
                     row['Employee_Name'],
                     row['Shift_In'] if pd.notna(row['Shift_In']) else None,
-                    row['Punch_In_Time'] if pd.notna(row['Punch_In_Time']) else None,
-                    row['Punch_Out_Time'] if pd.notna(row['Punch_Out_Time']) else None,
+                    final_in_time,
+                    final_out_time,
                     row['Shift_Out'] if pd.notna(row['Shift_Out']) else None,
-                    row['Hours_Worked'] if pd.notna(row['Hours_Worked']) else None,
+                    hours_worked_value,  # Always use the Excel hours
                     row['Status'],
                     row['Late_By'] if pd.notna(row['Late_By']) else None,
-                    file_hash
+                    file_hash,
+                    punch_date,
+                    employee_id
                 ))
-                successful_inserts += 1
-                self.conn.commit()
-            except Exception as e:
-                self.log_event("Error", str(e)[:200], file_name)
+                return 'update'
+            else:
+                # Log that no changes were made ('changes' mode only counts them)
+                if self.audit_mode != 'changes':
+                    cursor.execute(
+                        "INSERT INTO duplicate_records_log (Punch_Date, Employee_ID, Employee_Name, file_name, reason, logged_at) VALUES (?, ?, ?, ?, ?, GETDATE())",
+                        (punch_date, employee_id, row['Employee_Name'], file_name, "Record exists but no changes to punch times were needed")
+                    )
+                return 'unchanged'
         
-        summary_msg = f"Processed {total_records} records. Inserted {successful_inserts} records. Updated {successful_updates} records."
-        self.log_event("Summary", summary_msg, file_name)
-        return summary_msg
+        # Insert new record
+        cursor.execute("""
+            INSERT INTO biometric_attendance (Punch_Date, Employee_ID, Employee_Name, Shift_In, Punch_In_Time, Punch_Out_Time, Shift_Out, Hours_Worked, Status, Late_By, file_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            punch_date,
+            employee_id,
+            row['Employee_Name'],
+            row['Shift_In'] if pd.notna(row['Shift_In']) else None,
+            row['Punch_In_Time'] if pd.notna(row['Punch_In_Time']) else None,
+            row['Punch_Out_Time'] if pd.notna(row['Punch_Out_Time']) else None,
+            row['Shift_Out'] if pd.notna(row['Shift_Out']) else None,
+            row['Hours_Worked'] if pd.notna(row['Hours_Worked']) else None,
+            row['Status'],
+            row['Late_By'] if pd.notna(row['Late_By']) else None,
+            file_hash
+        ))
+        return 'insert'
+
+    def _validate_attendance_rows(self, df, file_name):
+        """Pre-validation pass: split off rows that would fail on the server.
+
+        Returns the valid rows and a list of ("Error", description, file_name)
+        events describing each rejected row. The DataFrame index is taken as the
+        0-based data row number, so messages point at the spreadsheet row.
+        """
+        keep = []
+        events = []
+        for position, punch_date, employee_id, punch_in, punch_out in \
+                df.reindex(columns=['Punch_Date', 'Employee_ID', 'Punch_In_Time', 'Punch_Out_Time']).itertuples(name=None):
+            problem = None
+            if pd.isna(employee_id) or not str(employee_id).strip():
+                problem = "missing Employee_ID"
+            elif pd.isna(punch_date):
+                problem = "missing or invalid Punch_Date"
+            elif not _is_valid_time(punch_in):
+                problem = f"invalid Punch_In_Time '{punch_in}'"
+            elif not _is_valid_time(punch_out):
+                problem = f"invalid Punch_Out_Time '{punch_out}'"
+
+            keep.append(problem is None)
+            if problem:
+                events.append(("Error", f"Row {position + 2} rejected: {problem}"[:200], file_name))
+
+        return df[keep], events
+
+    def _bulk_apply(self, cursor, df, file_hash, file_name, events):
+        """Stage the chunk in one round trip and apply it with a single MERGE.
+
+        Keeps the earliest punch-in and latest punch-out per (Punch_Date, Employee_ID),
+        exactly like the row-by-row path.
+        """
+        rows = self._attendance_stage_rows(df)
+        cursor.execute(STAGE_TABLE_DDL)
+
+        if rows:
+            cursor.fast_executemany = True
+            cursor.setinputsizes(STAGE_INPUT_SIZES)
+            cursor.executemany(STAGE_INSERT_SQL, rows)
+            cursor.setinputsizes(None)
+            cursor.fast_executemany = False
+
+        cursor.execute(MERGE_STAGE_SQL, (file_hash, file_hash))
+        if self.audit_mode == 'changes':
+            cursor.execute(CHANGE_LOG_FROM_MERGE_SQL, (file_name,))
+        else:
+            cursor.execute(LOG_UPDATED_SQL, (file_name,))
+            cursor.execute(LOG_UNCHANGED_SQL, (file_name,))
+
+        cursor.execute("SELECT merge_action, COUNT(*) FROM #merge_output GROUP BY merge_action")
+        counts = {action: count for action, count in cursor.fetchall()}
+        cursor.execute("SELECT COUNT(*) FROM (SELECT DISTINCT Punch_Date, Employee_ID FROM #attendance_stage) k")
+        unchanged = cursor.fetchone()[0] - counts.get('INSERT', 0) - counts.get('UPDATE', 0)
+        cursor.execute("DROP TABLE #merge_output; DROP TABLE #attendance_stage;")
+        return counts.get('INSERT', 0), counts.get('UPDATE', 0), unchanged
+
+    def _vectorized_apply(self, cursor, df, file_hash, file_name, events):
+        """Prefetch the stored rows for the chunk's keys in one query, merge them with
+        attendance_merge.merge_attendance and write the insert/update sets in batches."""
+        existing = self.fetch_existing_records(cursor, df)
+        inserts, updates, unchanged = merge_attendance(df, existing)
+
+        cursor.fast_executemany = True
+        if len(inserts):
+            cursor.executemany(
+                INSERT_ATTENDANCE_SQL,
+                [values + (file_hash,) for values in inserts.itertuples(index=False, name=None)]
+            )
+        if len(updates):
+            cursor.executemany(UPDATE_ATTENDANCE_SQL, [
+                (row.Employee_Name, row.Shift_In, row.Punch_In_Time, row.Punch_Out_Time, row.Shift_Out,
+                 row.Hours_Worked, row.Status, row.Late_By, file_hash, row.Punch_Date, row.Employee_ID)
+                for row in updates.itertuples(index=False)
+            ])
+        if self.audit_mode == 'changes':
+            if len(updates):
+                change_rows = list(zip(
+                    updates['Punch_Date'], updates['Employee_ID'], [file_name] * len(updates),
+                    seconds_to_text(updates['old_in_sec']), seconds_to_text(updates['new_in_sec']),
+                    seconds_to_text(updates['old_out_sec']), seconds_to_text(updates['new_out_sec'])
+                ))
+                cursor.setinputsizes(CHANGE_LOG_INPUT_SIZES)
+                cursor.executemany(CHANGE_LOG_INSERT_SQL, change_rows)
+                cursor.setinputsizes(None)
+        else:
+            audit_rows = [
+                (row.Punch_Date, row.Employee_ID, row.Employee_Name, file_name, row.reason)
+                for row in updates.itertuples(index=False)
+            ] + [
+                (row.Punch_Date, row.Employee_ID, row.Employee_Name, file_name, NO_CHANGE_REASON)
+                for row in unchanged.itertuples(index=False)
+            ]
+            if audit_rows:
+                cursor.executemany(
+                    "INSERT INTO duplicate_records_log (Punch_Date, Employee_ID, Employee_Name, file_name, reason, logged_at) VALUES (?, ?, ?, ?, ?, GETDATE())",
+                    audit_rows
+                )
+        cursor.fast_executemany = False
+        return len(inserts), len(updates), len(unchanged)
+
+    def fetch_existing_records(self, cursor, df):
+        """Fetch the stored punch times for every (Punch_Date, Employee_ID) in df with one keyed join.
+
+        The keys are staged in a temp table; UPDLOCK/HOLDLOCK keeps them stable
+        until the caller commits, so the insert set cannot race another writer.
+        """
+        keys = df[['Punch_Date', 'Employee_ID']].copy()
+        keys['Punch_Date'] = pd.to_datetime(keys['Punch_Date']).dt.date
+        keys['Employee_ID'] = keys['Employee_ID'].astype(str).str.strip()
+        keys = keys.drop_duplicates()
+
+        cursor.execute("CREATE TABLE #incoming_keys (Punch_Date DATE NOT NULL, Employee_ID VARCHAR(50) NOT NULL)")
+        if len(keys):
+            cursor.fast_executemany = True
+            cursor.setinputsizes([(SQL_TYPE_DATE, 0, 0), (SQL_VARCHAR, 50, 0)])
+            cursor.executemany(
+                "INSERT INTO #incoming_keys (Punch_Date, Employee_ID) VALUES (?, ?)",
+                list(keys.itertuples(index=False, name=None))
+            )
+            cursor.setinputsizes(None)
+            cursor.fast_executemany = False
+
+        cursor.execute("""
+            SELECT b.Punch_Date, b.Employee_ID, b.Punch_In_Time, b.Punch_Out_Time
+            FROM biometric_attendance b WITH (UPDLOCK, HOLDLOCK)
+            JOIN #incoming_keys k ON k.Punch_Date = b.Punch_Date AND k.Employee_ID = b.Employee_ID
+        """)
+        existing = pd.DataFrame.from_records(
+            [tuple(row) for row in cursor.fetchall()],
+            columns=['Punch_Date', 'Employee_ID', 'Punch_In_Time', 'Punch_Out_Time']
+        )
+        cursor.execute("DROP TABLE #incoming_keys")
+        return existing
+
+    def _attendance_stage_rows(self, df):
+        """Convert the DataFrame into plain tuples matching STAGE_INSERT_SQL"""
+        rows = []
+        for row_no, values in enumerate(df.reindex(columns=ATTENDANCE_COLUMNS).itertuples(index=False, name=None)):
+            punch_date, employee_id, employee_name, shift_in, punch_in, punch_out, shift_out, hours_worked, status, late_by = values
+            rows.append((
+                row_no,
+                None if pd.isna(punch_date) else punch_date,
+                str(employee_id).strip(),
+                None if pd.isna(employee_name) else str(employee_name),
+                _time_text(shift_in),
+                _time_text(punch_in),
+                _time_text(punch_out),
+                _time_text(shift_out),
+                _time_text(hours_worked),
+                None if pd.isna(status) else str(status),
+                _time_text(late_by),
+            ))
+        return rows
     
     def get_earliest_time(self, time1, time2):
         """Returns the earlier of two time values, or the non-None value if one is None"""
@@ -233,86 +691,386 @@ class DatabaseManager:
         return time1 if time1 > time2 else time2
         
     def get_employee_suggestions(self):
-        """Get employee suggestions for autocomplete"""
+        """Get employee suggestions for autocomplete; runs on the UI thread, so it never waits long for a connection"""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(
-                "SELECT DISTINCT Employee_ID, Employee_Name FROM biometric_attendance ORDER BY Employee_ID"
-            )
-            results = cursor.fetchall()
-            cursor.close()
+            with self.pool.connection(timeout=INTERACTIVE_ACQUIRE_TIMEOUT, retries=INTERACTIVE_RETRIES) as conn:
+                cursor = conn.cursor()
+                # The employees dimension holds one row per ID, however long the history
+                cursor.execute("SELECT Employee_ID, Employee_Name FROM employees ORDER BY Employee_ID")
+                results = cursor.fetchall()
+                cursor.close()
             return results
         except Exception as e:
             print(f"Error getting employee suggestions: {str(e)}")
             return []
             
-    def query_by_date(self, selected_date):
+    def run_query(self, query, params, handle=None):
+        """Run a read query on a pooled connection; returns (rows, columns).
+
+        With a QueryHandle the query can be cancelled from another thread and
+        is cancelled after handle.timeout seconds; either raises QueryCancelled.
+        """
+        with self.pool.connection(retries=INTERACTIVE_RETRIES) as conn:
+            cursor = conn.cursor()
+            timer = None
+            try:
+                if handle is not None:
+                    handle.attach(lambda: self.backend.cancel(conn, cursor))
+                    if handle.timeout:
+                        timer = threading.Timer(handle.timeout, handle.expire)
+                        timer.daemon = True
+                        timer.start()
+                cursor.execute(self.backend.sql(query), params)
+                results = cursor.fetchall()
+                columns = [column[0] for column in cursor.description]
+            except Exception as e:
+                if handle is not None and handle.cancelled:
+                    reason = f"timed out after {handle.timeout:g}s" if handle.timed_out else "cancelled"
+                    raise QueryCancelled(f"Query {reason}") from e
+                raise
+            finally:
+                if timer is not None:
+                    timer.cancel()
+                if handle is not None:
+                    handle.detach()
+                cursor.close()
+        return results, columns
+
+    def query_by_date(self, selected_date, handle=None):
         """Query records by date"""
         try:
-            cursor = self.conn.cursor()
-            query = """
-                SELECT 
-                    Punch_Date, 
-                    Employee_ID, 
-                    Employee_Name, 
-                    Shift_In, 
-                    Punch_In_Time, 
-                    Punch_Out_Time, 
-                    Shift_Out, 
-                    Hours_Worked, 
-                    Status, 
-                    Late_By,
-                    processed_at
-                FROM biometric_attendance
-                WHERE Punch_Date = ?
-                ORDER BY Employee_ID
+            query = ATTENDANCE_SELECT_SQL + """
+                WHERE b.Punch_Date = ?
+                ORDER BY b.Employee_ID
             """
-            cursor.execute(query, [selected_date])
-            results = cursor.fetchall()
-            columns = [column[0] for column in cursor.description]
-            cursor.close()
-            return results, columns
+            return self.run_query(query, [selected_date], handle)
+        except QueryCancelled:
+            raise
         except Exception as e:
             print(f"Error querying by date: {str(e)}")
             return [], []
             
-    def query_by_employee_id(self, employee_id):
+    def query_by_employee_id(self, employee_id, handle=None):
         """Query records by employee ID"""
         try:
-            cursor = self.conn.cursor()
-            query = """
-                SELECT 
-                    Punch_Date, 
-                    Employee_ID, 
-                    Employee_Name, 
-                    Shift_In, 
-                    Punch_In_Time, 
-                    Punch_Out_Time, 
-                    Shift_Out, 
-                    Hours_Worked, 
-                    Status, 
-                    Late_By,
-                    processed_at
-                FROM biometric_attendance
-                WHERE Employee_ID = ?
-                ORDER BY Punch_Date DESC
+            query = ATTENDANCE_SELECT_SQL + """
+                WHERE b.Employee_ID = ?
+                ORDER BY b.Punch_Date DESC
             """
-            cursor.execute(query, [employee_id])
-            results = cursor.fetchall()
-            columns = [column[0] for column in cursor.description]
-            cursor.close()
-            return results, columns
+            return self.run_query(query, [employee_id], handle)
+        except QueryCancelled:
+            raise
         except Exception as e:
             print(f"Error querying by employee ID: {str(e)}")
             return [], []
             
+    def count_filtered(self, filter_name, value, handle=None):
+        """Number of records matching one of ATTENDANCE_FILTERS"""
+        condition, _ = ATTENDANCE_FILTERS[filter_name]
+        rows, _ = self.run_query(f"SELECT COUNT(*) FROM biometric_attendance b WHERE {condition}", [value], handle)
+        return rows[0][0]
+
+    def iter_filtered(self, filter_name, value, handle=None, chunk_size=STREAM_CHUNK_SIZE):
+        """Stream the records matching one of ATTENDANCE_FILTERS as (columns, rows) chunks.
+
+        Rows come straight off the cursor with fetchmany(), so memory stays
+        bounded by chunk_size. The pooled connection is held until the
+        generator is exhausted or closed. Cancelling `handle` stops it with
+        QueryCancelled.
+        """
+        condition, order = ATTENDANCE_FILTERS[filter_name]
+        query = f"{ATTENDANCE_SELECT_SQL} WHERE {condition} ORDER BY {order}"
+        with self.pool.connection(retries=INTERACTIVE_RETRIES) as conn:
+            cursor = conn.cursor()
+            try:
+                if handle is not None:
+                    handle.attach(lambda: self.backend.cancel(conn, cursor))
+                cursor.execute(self.backend.sql(query), [value])
+                columns = [column[0] for column in cursor.description]
+                first = True
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if handle is not None and handle.cancelled:
+                        raise QueryCancelled("Query cancelled")
+                    if not rows and not first:
+                        break
+                    yield columns, rows  # The first chunk may be empty, so headers are always known
+                    if not rows:
+                        break
+                    first = False
+            except QueryCancelled:
+                raise
+            except Exception as e:
+                if handle is not None and handle.cancelled:
+                    raise QueryCancelled("Query cancelled") from e
+                raise
+            finally:
+                if handle is not None:
+                    handle.detach()
+                cursor.close()
+
+    def query_page_by_date(self, selected_date, after=None, page_size=QUERY_PAGE_SIZE, handle=None):
+        """One page of a day's records in Employee_ID order; returns (rows, columns, next_key).
+
+        Keyset pagination on (Punch_Date, Employee_ID): pass next_key back as
+        `after` for the following page. It is None on the last page.
+        """
+        query = ATTENDANCE_SELECT_SQL + " WHERE b.Punch_Date = ?"
+        params = [selected_date]
+        if after is not None:
+            query += " AND b.Employee_ID > ?"
+            params.append(after)
+        return self._query_page(query + " ORDER BY b.Employee_ID", params, 1, page_size, handle)
+
+    def query_page_by_employee_id(self, employee_id, after=None, page_size=QUERY_PAGE_SIZE, handle=None):
+        """One page of an employee's records, newest first; see query_page_by_date"""
+        query = ATTENDANCE_SELECT_SQL + " WHERE b.Employee_ID = ?"
+        params = [employee_id]
+        if after is not None:
+            query += " AND b.Punch_Date < ?"
+            params.append(after)
+        return self._query_page(query + " ORDER BY b.Punch_Date DESC", params, 0, page_size, handle)
+
+    def _query_page(self, query, params, key_column, page_size, handle):
+        # One extra row tells whether another page follows
+        rows, columns = self.run_query(self.backend.limit(query, page_size + 1), params, handle)
+        next_key = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_key = rows[-1][key_column]
+        return rows, columns, next_key
+
     def close(self):
         """Close the database connection"""
-        if self.conn:
+        if self.audit_log is not None:
+            self.audit_log.close()  # Flushes pending events first
+            self.audit_log = None
+        if self.pool is not None:
             try:
-                self.conn.close()
+                self.pool.close()
                 return True
             except Exception as e:
                 print(f"Error closing connection: {str(e)}")
                 return False
-        return True
\ No newline at end of file
+        return True
+
+
+def _duplicate_key_count(df):
+    """Rows whose (Punch_Date, Employee_ID) repeats an earlier row of `df`"""
+    if df.empty:
+        return 0
+    keys = pd.DataFrame({
+        'Punch_Date': df['Punch_Date'].map(_as_date),
+        'Employee_ID': df['Employee_ID'].astype(str).str.strip(),
+    })
+    return int(keys.duplicated().sum())
+
+
+def _as_date(value):
+    """Punch dates as datetime.date, whether the driver or reader gave a date, datetime or ISO text"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        try:
+            return datetime.strptime(value[:10], '%Y-%m-%d').date()
+        except ValueError:
+            return None
+    return value
+
+
+def _is_valid_time(value):
+    """True for blanks, time-like objects and 'HH:MM[:SS]' strings"""
+    if value is None or hasattr(value, 'strftime'):
+        return True
+    if not isinstance(value, str):
+        return pd.isna(value)
+    text = value.strip()
+    for fmt in ('%H:%M:%S', '%H:%M'):
+        try:
+            datetime.strptime(text, fmt)
+            return True
+        except ValueError:
+            pass
+    return not text
+
+
+def _time_text(value):
+    """Render a time-like cell as 'HH:MM:SS' text (None for blanks) for staging"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if hasattr(value, 'strftime'):
+        return value.strftime('%H:%M:%S')
+    return str(value).strip() or None
+
+
+INSERT_ATTENDANCE_SQL = """
+INSERT INTO biometric_attendance (Punch_Date, Employee_ID, Employee_Name, Shift_In, Punch_In_Time, Punch_Out_Time,
+                                  Shift_Out, Hours_Worked, Status, Late_By, file_hash)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+UPDATE_ATTENDANCE_SQL = """
+UPDATE biometric_attendance
+SET Employee_Name = ?,
+    Shift_In = ?,
+    Punch_In_Time = ?,
+    Punch_Out_Time = ?,
+    Shift_Out = ?,
+    Hours_Worked = ?,
+    Status = ?,
+    Late_By = ?,
+    file_hash = ?,
+    processed_at = GETDATE()
+WHERE Punch_Date = ? AND Employee_ID = ?
+"""
+
+# Session-scoped staging tables used by the bulk ingest mode.
+# Times are staged as text and converted server-side so that one bad cell
+# does not change the parameter types fast_executemany binds for the batch.
+STAGE_TABLE_DDL = """
+CREATE TABLE #attendance_stage (
+    row_no INT NOT NULL,
+    Punch_Date DATE,
+    Employee_ID VARCHAR(50),
+    Employee_Name VARCHAR(100),
+    Shift_In VARCHAR(16),
+    Punch_In_Time VARCHAR(16),
+    Punch_Out_Time VARCHAR(16),
+    Shift_Out VARCHAR(16),
+    Hours_Worked VARCHAR(8),
+    Status VARCHAR(50),
+    Late_By VARCHAR(16)
+);
+
+CREATE TABLE #merge_output (
+    merge_action NVARCHAR(10),
+    Punch_Date DATE,
+    Employee_ID VARCHAR(50),
+    Employee_Name VARCHAR(100),
+    old_in_time TIME,
+    new_in_time TIME,
+    old_out_time TIME,
+    new_out_time TIME
+);
+"""
+
+STAGE_INSERT_SQL = """
+INSERT INTO #attendance_stage (row_no, Punch_Date, Employee_ID, Employee_Name, Shift_In, Punch_In_Time,
+                               Punch_Out_Time, Shift_Out, Hours_Worked, Status, Late_By)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Explicit parameter types so fast_executemany skips SQLDescribeParam on the temp table
+STAGE_INPUT_SIZES = [
+    (SQL_INTEGER, 0, 0),
+    (SQL_TYPE_DATE, 0, 0),
+    (SQL_VARCHAR, 50, 0),
+    (SQL_VARCHAR, 100, 0),
+    (SQL_VARCHAR, 16, 0),
+    (SQL_VARCHAR, 16, 0),
+    (SQL_VARCHAR, 16, 0),
+    (SQL_VARCHAR, 16, 0),
+    (SQL_VARCHAR, 8, 0),
+    (SQL_VARCHAR, 50, 0),
+    (SQL_VARCHAR, 16, 0),
+]
+
+# Collapses duplicate keys inside the file (earliest in / latest out, other
+# columns from the last row) and merges them into biometric_attendance.
+MERGE_STAGE_SQL = """
+WITH ranked AS (
+    SELECT
+        Punch_Date,
+        Employee_ID,
+        Employee_Name,
+        TRY_CONVERT(TIME, Shift_In) AS Shift_In,
+        MIN(TRY_CONVERT(TIME, Punch_In_Time)) OVER (PARTITION BY Punch_Date, Employee_ID) AS Punch_In_Time,
+        MAX(TRY_CONVERT(TIME, Punch_Out_Time)) OVER (PARTITION BY Punch_Date, Employee_ID) AS Punch_Out_Time,
+        TRY_CONVERT(TIME, Shift_Out) AS Shift_Out,
+        Hours_Worked,
+        Status,
+        TRY_CONVERT(TIME, Late_By) AS Late_By,
+        ROW_NUMBER() OVER (PARTITION BY Punch_Date, Employee_ID ORDER BY row_no DESC) AS rn
+    FROM #attendance_stage
+)
+MERGE biometric_attendance WITH (HOLDLOCK) AS t
+USING (SELECT * FROM ranked WHERE rn = 1) AS s
+    ON t.Punch_Date = s.Punch_Date AND t.Employee_ID = s.Employee_ID
+WHEN MATCHED AND (
+        (s.Punch_In_Time IS NOT NULL AND (t.Punch_In_Time IS NULL OR s.Punch_In_Time < t.Punch_In_Time))
+     OR (s.Punch_Out_Time IS NOT NULL AND (t.Punch_Out_Time IS NULL OR s.Punch_Out_Time > t.Punch_Out_Time))
+    ) THEN UPDATE SET
+        Employee_Name = s.Employee_Name,
+        Shift_In = s.Shift_In,
+        Punch_In_Time = CASE WHEN s.Punch_In_Time IS NOT NULL AND (t.Punch_In_Time IS NULL OR s.Punch_In_Time < t.Punch_In_Time)
+                             THEN s.Punch_In_Time ELSE t.Punch_In_Time END,
+        Punch_Out_Time = CASE WHEN s.Punch_Out_Time IS NOT NULL AND (t.Punch_Out_Time IS NULL OR s.Punch_Out_Time > t.Punch_Out_Time)
+                              THEN s.Punch_Out_Time ELSE t.Punch_Out_Time END,
+        Shift_Out = s.Shift_Out,
+        Hours_Worked = s.Hours_Worked,
+        Status = s.Status,
+        Late_By = s.Late_By,
+        file_hash = ?,
+        processed_at = GETDATE()
+WHEN NOT MATCHED BY TARGET THEN
+    INSERT (Punch_Date, Employee_ID, Employee_Name, Shift_In, Punch_In_Time, Punch_Out_Time, Shift_Out, Hours_Worked, Status, Late_By, file_hash)
+    VALUES (s.Punch_Date, s.Employee_ID, s.Employee_Name, s.Shift_In, s.Punch_In_Time, s.Punch_Out_Time, s.Shift_Out, s.Hours_Worked, s.Status, s.Late_By, ?)
+OUTPUT $action, inserted.Punch_Date, inserted.Employee_ID, inserted.Employee_Name,
+       deleted.Punch_In_Time, inserted.Punch_In_Time, deleted.Punch_Out_Time, inserted.Punch_Out_Time
+INTO #merge_output;
+"""
+
+# Same reason text the row-by-row path writes for updated records
+LOG_UPDATED_SQL = """
+INSERT INTO duplicate_records_log (Punch_Date, Employee_ID, Employee_Name, file_name, reason, logged_at)
+SELECT
+    Punch_Date, Employee_ID, Employee_Name, ?,
+    CONCAT(
+        'Record updated for date ', CONVERT(VARCHAR(10), Punch_Date, 23), ' and employee ', Employee_ID, '. ',
+        CASE WHEN (old_in_time IS NULL AND new_in_time IS NOT NULL) OR old_in_time <> new_in_time
+             THEN CONCAT('Punch-in updated from ', ISNULL(CONVERT(VARCHAR(8), old_in_time), 'None'), ' to ', CONVERT(VARCHAR(8), new_in_time), '. ')
+             ELSE '' END,
+        CASE WHEN (old_out_time IS NULL AND new_out_time IS NOT NULL) OR old_out_time <> new_out_time
+             THEN CONCAT('Punch-out updated from ', ISNULL(CONVERT(VARCHAR(8), old_out_time), 'None'), ' to ', CONVERT(VARCHAR(8), new_out_time), '.')
+             ELSE '' END
+    ),
+    GETDATE()
+FROM #merge_output
+WHERE merge_action = 'UPDATE'
+"""
+
+LOG_UNCHANGED_SQL = """
+INSERT INTO duplicate_records_log (Punch_Date, Employee_ID, Employee_Name, file_name, reason, logged_at)
+SELECT s.Punch_Date, s.Employee_ID, s.Employee_Name, ?, 'Record exists but no changes to punch times were needed', GETDATE()
+FROM #attendance_stage s
+JOIN biometric_attendance t ON t.Punch_Date = s.Punch_Date AND t.Employee_ID = s.Employee_ID
+WHERE NOT EXISTS (
+    SELECT 1 FROM #merge_output o
+    WHERE o.Punch_Date = s.Punch_Date AND o.Employee_ID = s.Employee_ID
+)
+"""
+
+# Structured before/after row for the 'changes' audit mode
+CHANGE_LOG_INSERT_SQL = """
+INSERT INTO attendance_change_log (Punch_Date, Employee_ID, file_name, old_in_time, new_in_time, old_out_time, new_out_time)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+CHANGE_LOG_INPUT_SIZES = [
+    (SQL_TYPE_DATE, 0, 0),
+    (SQL_VARCHAR, 50, 0),
+    (SQL_VARCHAR, 255, 0),
+    (SQL_VARCHAR, 8, 0),
+    (SQL_VARCHAR, 8, 0),
+    (SQL_VARCHAR, 8, 0),
+    (SQL_VARCHAR, 8, 0),
+]
+
+CHANGE_LOG_FROM_MERGE_SQL = """
+INSERT INTO attendance_change_log (Punch_Date, Employee_ID, file_name, old_in_time, new_in_time, old_out_time, new_out_time)
+SELECT Punch_Date, Employee_ID, ?, old_in_time, new_in_time, old_out_time, new_out_time
+FROM #merge_output
+WHERE merge_action = 'UPDATE'
+"""
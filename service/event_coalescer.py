@@ -0,0 +1,92 @@
+import heapq
+import os
+import threading
+import time
+
+# Office lock/owner files ('~$name.xlsx') and hidden temp files share the .xlsx suffix
+TEMP_FILE_PREFIXES = ('~', '.')
+
+
+def is_ingestible_excel(file_path):
+    """True for real .xlsx workbooks, False for lock/temp files such as '~$name.xlsx'"""
+    name = os.path.basename(file_path).lower()
+    if name.startswith(TEMP_FILE_PREFIXES):
+        return False
+    return name.endswith('.xlsx')
+
+
+class EventCoalescer:
+    """Fold bursts of filesystem events into one callback per path.
+
+    Every touch() pushes the path's deadline `quiet_period` seconds into the
+    future; the callback fires once the path has been quiet that long. A
+    single timer thread serves all paths from a heap of deadlines.
+    """
+
+    def __init__(self, callback, quiet_period=2.0):
+        self.callback = callback
+        self.quiet_period = quiet_period
+        self._deadlines = {}  # path -> current deadline
+        self._heap = []  # (deadline, path); stale entries are skipped lazily
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="EventCoalescer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        with self._condition:
+            self._running = False
+            self._deadlines.clear()
+            self._heap.clear()
+            self._condition.notify_all()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def touch(self, file_path):
+        """Record an event for file_path, restarting its quiet period"""
+        deadline = time.monotonic() + self.quiet_period
+        with self._condition:
+            self._deadlines[file_path] = deadline
+            heapq.heappush(self._heap, (deadline, file_path))
+            self._condition.notify()
+
+    def cancel(self, file_path):
+        with self._condition:
+            self._deadlines.pop(file_path, None)
+
+    def pending(self):
+        with self._condition:
+            return len(self._deadlines)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                due = self._next_due()
+                while self._running and due is None:
+                    timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                    self._condition.wait(timeout)
+                    due = self._next_due()
+                if not self._running:
+                    return
+
+            try:
+                self.callback(due)
+            except Exception as e:
+                print(f"Error dispatching file event: {str(e)}")
+
+    def _next_due(self):
+        """Pop the next path whose quiet period has elapsed (caller holds the lock)"""
+        now = time.monotonic()
+        while self._heap and self._heap[0][0] <= now:
+            deadline, file_path = heapq.heappop(self._heap)
+            if self._deadlines.get(file_path) == deadline:
+                del self._deadlines[file_path]
+                return file_path
+        return None
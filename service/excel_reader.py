@@ -0,0 +1,165 @@
+import datetime as dt
+import hashlib
+import openpyxl
+import pandas as pd
+
+# Columns the biometric export must contain for a file to be ingested
+REQUIRED_COLUMNS = ['Punch_Date', 'Employee_ID', 'Employee_Name', 'Punch_In_Time', 'Punch_Out_Time']
+
+# Columns stored in biometric_attendance; everything else in the export is skipped
+STORED_COLUMNS = [
+    'Punch_Date', 'Employee_ID', 'Employee_Name', 'Shift_In', 'Punch_In_Time',
+    'Punch_Out_Time', 'Shift_Out', 'Hours_Worked', 'Status', 'Late_By'
+]
+
+TEXT_COLUMNS = ['Employee_Name', 'Hours_Worked', 'Status']
+TIME_COLUMNS = ['Shift_In', 'Punch_In_Time', 'Punch_Out_Time', 'Shift_Out', 'Late_By']
+
+# Text Punch_Date cells; the device exports day-first dates
+DATE_FORMATS = ('%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%d-%b-%Y')
+
+DEFAULT_CHUNK_SIZE = 5000
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class MissingColumnsError(ValueError):
+    """Raised when the header row lacks one of REQUIRED_COLUMNS"""
+    def __init__(self, missing_columns):
+        self.missing_columns = missing_columns
+        super().__init__(f"Missing required columns: {', '.join(missing_columns)}")
+
+
+def read_file_buffer(file_path):
+    """Read a file exactly once and return (data, sha256 hexdigest).
+
+    The bytes object feeds both the digest, hashed block by block through a
+    memoryview, and the parser via io.BytesIO, which shares it without copying.
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read()
+
+    hasher = hashlib.sha256()
+    view = memoryview(data)
+    for offset in range(0, len(data), HASH_BLOCK_SIZE):
+        hasher.update(view[offset:offset + HASH_BLOCK_SIZE])
+    view.release()
+    return data, hasher.hexdigest()
+
+
+def iter_attendance_chunks(source, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream the first worksheet of an attendance workbook as DataFrame chunks.
+
+    `source` is a path or a binary file object. The header row is checked
+    before any data row is read (MissingColumnsError), only STORED_COLUMNS
+    are kept, and each chunk holds at most `chunk_size` rows. The chunk index
+    is the 0-based data row of the sheet, so messages can point at the source row.
+    """
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None) or ()
+
+        positions = {}
+        for index, name in enumerate(header):
+            if isinstance(name, str) and name in STORED_COLUMNS and name not in positions:
+                positions[name] = index
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in positions]
+        if missing_columns:
+            raise MissingColumnsError(missing_columns)
+
+        columns = [col for col in STORED_COLUMNS if col in positions]
+        indexes = [positions[col] for col in columns]
+        width = len(header)
+
+        buffer = []
+        row_numbers = []
+        chunks_yielded = 0
+        for row_number, row in enumerate(rows):
+            if len(row) < width:
+                row = tuple(row) + (None,) * (width - len(row))
+            values = tuple(row[index] for index in indexes)
+            if all(value is None for value in values):
+                continue  # pd.read_excel drops blank lines as well
+            buffer.append(values)
+            row_numbers.append(row_number)
+            if len(buffer) >= chunk_size:
+                yield _to_frame(buffer, columns, row_numbers)
+                chunks_yielded += 1
+                buffer = []
+                row_numbers = []
+
+        if buffer or not chunks_yielded:
+            yield _to_frame(buffer, columns, row_numbers)
+    finally:
+        workbook.close()
+
+
+def _to_frame(records, columns, row_numbers):
+    """Build a chunk with explicit dtypes for the stored columns"""
+    index = pd.Index(row_numbers, dtype='int64')
+    by_column = dict(zip(columns, zip(*records))) if records else {}
+    converters = {'Punch_Date': _date_value, 'Employee_ID': _id_value}
+    converters.update({col: _text_value for col in TEXT_COLUMNS})
+    converters.update({col: _time_value for col in TIME_COLUMNS})
+
+    data = {}
+    for col in STORED_COLUMNS:
+        values = by_column.get(col, (None,) * len(records))
+        data[col] = pd.Series([converters[col](value) for value in values], index=index, dtype=object)
+    return pd.DataFrame(data, index=index)
+
+
+def _is_blank(value):
+    """Empty cells, NaN and whitespace-only text all read as missing, like pd.read_excel's NaN"""
+    if value is None:
+        return True
+    if isinstance(value, float):
+        return pd.isna(value)
+    return isinstance(value, str) and not value.strip()
+
+
+def _date_value(value):
+    """Punch dates as datetime.date; anything unparseable (a TOTAL footer, a typo)
+    becomes None and is rejected by the validator instead of failing the file"""
+    if _is_blank(value):
+        return None
+    if isinstance(value, dt.datetime):
+        return value.date()
+    if isinstance(value, dt.date):
+        return value
+    if isinstance(value, str):
+        text = value.strip()
+        for fmt in DATE_FORMATS:
+            try:
+                return dt.datetime.strptime(text, fmt).date()
+            except ValueError:
+                continue
+    return None
+
+
+def _id_value(value):
+    """Employee IDs as text; whole floats lose their '.0' like pd.read_excel does"""
+    if _is_blank(value):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _text_value(value):
+    if _is_blank(value):
+        return None
+    if isinstance(value, (dt.time, dt.datetime)):
+        return value.strftime('%H:%M:%S')
+    return str(value)
+
+
+def _time_value(value):
+    """Time cells as datetime.time; text is left for the DB layer to validate"""
+    if _is_blank(value):
+        return None
+    if isinstance(value, dt.datetime):
+        return value.time()
+    if isinstance(value, dt.timedelta):
+        return (dt.datetime.min + value).time()
+    return value
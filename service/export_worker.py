@@ -0,0 +1,109 @@
+import csv
+import os
+from datetime import date, time, datetime
+from PyQt6.QtCore import QThread, pyqtSignal
+from database_manager import QueryHandle, QueryCancelled
+
+# Columns written as typed Excel values; SQLite hands them back as ISO text
+DATE_COLUMNS = {'Punch_Date'}
+TIME_COLUMNS = {'Shift_In', 'Punch_In_Time', 'Punch_Out_Time', 'Shift_Out', 'Late_By'}
+DATETIME_COLUMNS = {'processed_at'}
+
+
+class ExportThread(QThread):
+    """Re-runs a results filter and streams every matching row to a file.
+
+    Rows go from the cursor to a .csv file or a write-only .xlsx workbook
+    a chunk at a time, so memory does not grow with the export. The file
+    is written under a temporary name and only renamed into place once
+    complete; a cancelled or failed export leaves nothing behind.
+    """
+    progress_signal = pyqtSignal(int, int)  # rows written, total rows
+    finished_signal = pyqtSignal(str, int)  # file path, rows written
+    error_signal = pyqtSignal(str)
+
+    def __init__(self, db_manager, filter_name, value, file_path):
+        super().__init__()
+        self.db_manager = db_manager
+        self.filter_name = filter_name
+        self.value = value
+        self.file_path = file_path
+        self.handle = QueryHandle()
+
+    def run(self):
+        part_path = self.file_path + ".part"
+        try:
+            total = self.db_manager.count_filtered(self.filter_name, self.value, self.handle)
+            self.progress_signal.emit(0, total)
+            chunks = self.db_manager.iter_filtered(self.filter_name, self.value, self.handle)
+            write = write_xlsx if self.file_path.lower().endswith('.xlsx') else write_csv
+            written = write(part_path, chunks, lambda count: self.progress_signal.emit(count, total))
+            os.replace(part_path, self.file_path)
+        except Exception as e:
+            _remove_quietly(part_path)
+            if not isinstance(e, QueryCancelled):
+                self.error_signal.emit(str(e))
+            return
+        self.finished_signal.emit(self.file_path, written)
+
+    def cancel(self):
+        self.handle.cancel()
+
+
+def write_csv(path, chunks, on_progress):
+    written = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        header_written = False
+        for columns, rows in chunks:
+            if not header_written:
+                writer.writerow(columns)
+                header_written = True
+            writer.writerows(rows)
+            written += len(rows)
+            on_progress(written)
+    return written
+
+
+def write_xlsx(path, chunks, on_progress):
+    import openpyxl
+    workbook = openpyxl.Workbook(write_only=True)  # Rows are flushed to disk as they are appended
+    sheet = workbook.create_sheet("Attendance")
+    written = 0
+    converters = None
+    for columns, rows in chunks:
+        if converters is None:
+            sheet.append(columns)
+            converters = [_excel_converter(column) for column in columns]
+        for row in rows:
+            sheet.append([convert(value) for convert, value in zip(converters, row)])
+        written += len(rows)
+        on_progress(written)
+    workbook.save(path)
+    return written
+
+
+def _excel_converter(column):
+    if column in DATE_COLUMNS:
+        return lambda value: _parse(value, date.fromisoformat)
+    if column in TIME_COLUMNS:
+        return lambda value: _parse(value, time.fromisoformat)
+    if column in DATETIME_COLUMNS:
+        return lambda value: _parse(value, datetime.fromisoformat)
+    return lambda value: value
+
+
+def _parse(value, from_text):
+    if not isinstance(value, str):
+        return value
+    try:
+        return from_text(value)
+    except ValueError:
+        return value
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,122 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+class ProcessedFileLedger:
+    """Durable record of ingested files, kept in a local SQLite index.
+
+    Files are keyed by content hash, with a secondary (path, size, mtime)
+    index so a file seen before can be skipped without reading it again.
+    Entries expire after `retention_days` instead of being trimmed by count.
+    """
+
+    STATUS_PROCESSED = 'processed'
+    STATUS_FAILED = 'failed'
+    STATUS_SPOOLED = 'spooled'  # Held in the offline spool until the database is back
+
+    def __init__(self, db_path, retention_days=90):
+        self.db_path = db_path
+        self.retention_days = retention_days
+        self.lock = threading.Lock()
+
+        # Shared by the watchdog observer, the monitor thread and the UI thread
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS processed_files (
+                file_hash TEXT PRIMARY KEY,
+                file_path TEXT NOT NULL,
+                file_size INTEGER,
+                file_mtime REAL,
+                row_count INTEGER,
+                status TEXT NOT NULL,
+                started_at REAL,
+                finished_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_processed_files_stat
+                ON processed_files (file_path, file_size, file_mtime);
+            CREATE INDEX IF NOT EXISTS ix_processed_files_finished
+                ON processed_files (finished_at);
+        """)
+        self.conn.commit()
+
+    @staticmethod
+    def stat(file_path):
+        """Return (size, mtime) for file_path, or (None, None) if it is gone"""
+        try:
+            st = os.stat(file_path)
+            return st.st_size, st.st_mtime
+        except OSError:
+            return None, None
+
+    def is_known_file(self, file_path):
+        """True if this exact path/size/mtime was already ingested (or spooled) successfully"""
+        size, mtime = self.stat(file_path)
+        if size is None:
+            return False
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM processed_files WHERE file_path = ? AND file_size = ? AND file_mtime = ? AND status IN (?, ?)",
+                (os.path.abspath(file_path), size, mtime, self.STATUS_PROCESSED, self.STATUS_SPOOLED)
+            ).fetchone()
+        return row is not None
+
+    def is_known_hash(self, file_hash):
+        """True if a file with this content was already ingested (or spooled) successfully"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM processed_files WHERE file_hash = ? AND status IN (?, ?)",
+                (file_hash, self.STATUS_PROCESSED, self.STATUS_SPOOLED)
+            ).fetchone()
+        return row is not None
+
+    def remember_location(self, file_hash, file_path):
+        """Point a known hash at the path it was just seen under, so the next
+        drop of the same file is skipped by is_known_file without hashing"""
+        size, mtime = self.stat(file_path)
+        with self.lock:
+            self.conn.execute(
+                "UPDATE processed_files SET file_path = ?, file_size = ?, file_mtime = ? WHERE file_hash = ?",
+                (os.path.abspath(file_path), size, mtime, file_hash)
+            )
+            self.conn.commit()
+
+    def record(self, file_hash, file_path, status, row_count=None, started_at=None, finished_at=None):
+        """Insert or replace the ledger entry for file_hash"""
+        size, mtime = self.stat(file_path)
+        with self.lock:
+            self.conn.execute(
+                """INSERT OR REPLACE INTO processed_files
+                   (file_hash, file_path, file_size, file_mtime, row_count, status, started_at, finished_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (file_hash, os.path.abspath(file_path), size, mtime, row_count, status,
+                 started_at, finished_at or time.time())
+            )
+            self.conn.commit()
+
+    def set_status(self, file_hash, status):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE processed_files SET status = ?, finished_at = ? WHERE file_hash = ?",
+                (status, time.time(), file_hash)
+            )
+            self.conn.commit()
+
+    def evict_expired(self):
+        """Delete entries older than retention_days; returns the number removed"""
+        cutoff = time.time() - self.retention_days * 86400
+        with self.lock:
+            cursor = self.conn.execute("DELETE FROM processed_files WHERE finished_at < ?", (cutoff,))
+            self.conn.commit()
+        return cursor.rowcount
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM processed_files").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
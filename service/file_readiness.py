@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+
+# The Windows share-mode probe is optional; size/mtime stability works everywhere
+try:
+    import win32api
+    import win32con
+    import win32file
+except ImportError:
+    win32file = None
+
+
+def file_signature(file_path):
+    """Return (size, mtime_ns) for file_path, or None if it does not exist"""
+    try:
+        st = os.stat(file_path)
+        return st.st_size, st.st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def share_mode_probe(file_path):
+    """True if the writer no longer holds the file exclusively (Windows share-mode check)"""
+    try:
+        handle = win32file.CreateFile(
+            file_path,
+            win32con.GENERIC_READ,
+            win32con.FILE_SHARE_READ | win32con.FILE_SHARE_WRITE,
+            None,
+            win32con.OPEN_EXISTING,
+            0,
+            None
+        )
+    except Exception:
+        return False
+    if handle and handle != win32file.INVALID_HANDLE_VALUE:
+        win32api.CloseHandle(handle)
+        return True
+    return False
+
+
+def portable_probe(file_path):
+    """True if the file can be opened for reading"""
+    try:
+        with open(file_path, 'rb'):
+            return True
+    except OSError:
+        return False
+
+
+def default_probe():
+    """Best available open-probe backend for this platform"""
+    return share_mode_probe if win32file is not None else portable_probe
+
+
+class ReadinessTracker:
+    """Watch many pending files at once and release each one when it is ready.
+
+    A file is ready once its size and mtime have not changed for `stable_for`
+    seconds, it is not empty, and `probe` (if any) can open it. One thread
+    polls all pending files, so a file that stays locked only delays itself.
+    Callbacks run on the tracker thread:
+      on_ready(path)    - file is ready to ingest
+      on_timeout(path)  - still not ready after `timeout` seconds
+      on_gone(path)     - file disappeared while pending
+    """
+
+    def __init__(self, on_ready, on_timeout=None, on_gone=None, stable_for=1.0,
+                 poll_interval=0.25, timeout=20.0, probe=None):
+        self.on_ready = on_ready
+        self.on_timeout = on_timeout
+        self.on_gone = on_gone
+        self.stable_for = stable_for
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.probe = probe
+        self._pending = {}  # path -> [signature, stable_since, added_at]
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="ReadinessTracker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        with self._condition:
+            self._running = False
+            self._pending.clear()
+            self._condition.notify_all()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def add(self, file_path):
+        """Start (or restart) tracking file_path"""
+        now = time.monotonic()
+        with self._condition:
+            self._pending[file_path] = [file_signature(file_path), now, now]
+            self._condition.notify()
+
+    def discard(self, file_path):
+        with self._condition:
+            self._pending.pop(file_path, None)
+
+    def pending(self):
+        with self._condition:
+            return len(self._pending)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or not self._running)
+                if not self._running:
+                    return
+                snapshot = [(path, state, tuple(state)) for path, state in self._pending.items()]
+
+            results = self._check(snapshot)
+
+            ready, timed_out, gone = [], [], []
+            outcomes = {'ready': ready, 'timeout': timed_out, 'gone': gone}
+            with self._condition:
+                for file_path, state, outcome, signature, stable_since in results:
+                    if self._pending.get(file_path) is not state:
+                        continue  # Re-added by a newer event while we were checking
+                    if outcome is None:
+                        state[0], state[1] = signature, stable_since
+                    else:
+                        del self._pending[file_path]
+                        outcomes[outcome].append(file_path)
+
+            for callback, paths in ((self.on_ready, ready), (self.on_timeout, timed_out), (self.on_gone, gone)):
+                for file_path in paths:
+                    if callback:
+                        try:
+                            callback(file_path)
+                        except Exception as e:
+                            print(f"Error in readiness callback for {file_path}: {str(e)}")
+
+            with self._condition:
+                self._condition.wait(self.poll_interval)
+
+    def _check(self, snapshot):
+        """Classify pending files from copies of their state; stat and probe calls happen outside the lock.
+
+        Returns (path, state, outcome, signature, stable_since) per file, where
+        outcome is 'ready', 'timeout', 'gone' or None (still pending).
+        """
+        now = time.monotonic()
+        results = []
+        for file_path, state, (last_signature, stable_since, added_at) in snapshot:
+            signature = file_signature(file_path)
+            outcome = None
+            if signature is None:
+                outcome = 'gone'
+            elif signature != last_signature:
+                stable_since = now
+            elif signature[0] > 0 and now - stable_since >= self.stable_for:
+                if self.probe is None or self.probe(file_path):
+                    outcome = 'ready'
+            if outcome is None and now - added_at >= self.timeout:
+                outcome = 'timeout'
+            results.append((file_path, state, outcome, signature, stable_since))
+        return results
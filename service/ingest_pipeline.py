@@ -0,0 +1,423 @@
+import io
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import pandas as pd
+from excel_reader import iter_attendance_chunks, read_file_buffer, MissingColumnsError, DEFAULT_CHUNK_SIZE
+from ingest_worker import (
+    parse_attendance_file, batch_to_frame, ParsedFile,
+    PARSE_OK, PARSE_READ_ERROR, PARSE_MISSING_COLUMNS, PARSE_EXCEL_ERROR, PARSE_WORKER_ERROR, PARSE_SKIPPED
+)
+
+# Items passed between stages: (kind, job, payload)
+JOB_START = 'start'
+JOB_CHUNK = 'chunk'
+JOB_ERROR = 'error'  # Parsing failed part-way through; the writer must roll the file back
+JOB_END = 'end'
+
+
+class PipelineStopped(Exception):
+    """Raised to the writer when the pipeline shuts down in the middle of a file"""
+
+
+class StageQueue:
+    """Bounded FIFO between two pipeline stages that records how long each side waits.
+
+    put_stall is time producers spent blocked on a full queue (the consumer is
+    the bottleneck); get_stall is time the consumer spent waiting on an empty
+    queue (the producer is the bottleneck).
+    """
+
+    def __init__(self, name, maxsize):
+        self.name = name
+        self.maxsize = maxsize
+        self._items = deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self.high_water = 0
+        self.put_stall = 0.0
+        self.get_stall = 0.0
+
+    def put(self, item):
+        """Append item, blocking while the queue is full; returns False once closed"""
+        with self._condition:
+            if len(self._items) >= self.maxsize and not self._closed:
+                waited = time.perf_counter()
+                self._condition.wait_for(lambda: len(self._items) < self.maxsize or self._closed)
+                self.put_stall += time.perf_counter() - waited
+            if self._closed:
+                return False
+            self._items.append(item)
+            self.high_water = max(self.high_water, len(self._items))
+            self._condition.notify_all()
+            return True
+
+    def get(self):
+        """Pop the oldest item, blocking while empty; returns None once closed"""
+        with self._condition:
+            if not self._items and not self._closed:
+                waited = time.perf_counter()
+                self._condition.wait_for(lambda: self._items or self._closed)
+                self.get_stall += time.perf_counter() - waited
+            if self._closed:
+                return None
+            item = self._items.popleft()
+            self._condition.notify_all()
+            return item
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._items.clear()
+            self._condition.notify_all()
+
+    def __len__(self):
+        with self._condition:
+            return len(self._items)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'stage': self.name,
+                'depth': len(self._items),
+                'maxsize': self.maxsize,
+                'high_water': self.high_water,
+                'put_stall': self.put_stall,
+                'get_stall': self.get_stall,
+            }
+
+
+class IngestBatch:
+    """Files taken from the ready queue together; drives the batch notifications"""
+
+    def __init__(self, size):
+        self.size = size
+        self.succeeded = []
+        self.failed = []
+        self.skipped = 0
+
+    def record(self, file_path, success):
+        if success:
+            self.succeeded.append(os.path.basename(file_path))
+        elif success is None:
+            self.skipped += 1
+        else:
+            self.failed.append(os.path.basename(file_path))
+
+    @property
+    def done(self):
+        return len(self.succeeded) + len(self.failed) + self.skipped >= self.size
+
+
+class FileJob:
+    """One file travelling through the pipeline"""
+    __slots__ = ('file_path', 'batch', 'parsed', 'started_at', 'sent', 'finished')
+
+    def __init__(self, file_path, batch):
+        self.file_path = file_path
+        self.batch = batch
+        self.parsed = None
+        self.started_at = time.time()
+        self.sent = False  # Parse stage has passed on the JOB_START marker
+        self.finished = False  # Writer has consumed the JOB_END marker
+
+
+class IngestPipeline:
+    """ready -> parse -> normalize -> write, connected by bounded queues.
+
+    The parse and normalize stages run on their own threads (parsing fans out
+    to a process pool when parse_workers > 0). The write stage is the caller's
+    thread, which pulls files with next_job() so DB access stays on one
+    connection. File N+1 is parsed while file N is written, and within a file
+    chunks reach the writer as soon as they are parsed.
+    """
+
+    def __init__(self, ready_queue, ledger, log, parse_workers=0, chunk_size=DEFAULT_CHUNK_SIZE,
+                 queue_size=8, on_batch_started=None):
+        self.ready_queue = ready_queue
+        self.ledger = ledger
+        self.log = log
+        self.parse_workers = parse_workers
+        self.chunk_size = chunk_size
+        self.on_batch_started = on_batch_started
+        self.parsed = StageQueue('parse', queue_size)
+        self.normalized = StageQueue('normalize', queue_size)
+        self.ready_stall = 0.0  # Time the parse stage sat waiting for ready files
+        self.running = False
+        self.failure = None  # Why a stage died, if it did; the writer then gets None from next_job()
+        self._pool = None
+        self._current = None  # (job, chunk generator) handed to the writer last
+        self._threads = []
+
+    def start(self):
+        self.running = True
+        self._threads = [
+            threading.Thread(target=self._parse_loop, name="IngestParse", daemon=True),
+            threading.Thread(target=self._normalize_loop, name="IngestNormalize", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=2.0):
+        """Close every stage; the ready queue is closed by its owner"""
+        self.running = False
+        self.parsed.close()
+        self.normalized.close()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+        self._shutdown_pool()
+
+    def stats(self):
+        """Depth and stall time per stage, in pipeline order"""
+        ready = {
+            'stage': 'ready',
+            'depth': len(self.ready_queue),
+            'maxsize': None,
+            'high_water': None,
+            'put_stall': 0.0,
+            'get_stall': self.ready_stall,
+        }
+        return [ready, self.parsed.stats(), self.normalized.stats()]
+
+    def format_stats(self):
+        return "; ".join(
+            f"{s['stage']}: depth {s['depth']}, producer stalled {s['put_stall']:.1f}s, "
+            f"consumer waited {s['get_stall']:.1f}s"
+            for s in self.stats()
+        )
+
+    # Write stage (caller's thread)
+
+    def next_job(self):
+        """Block for the next file; returns (job, chunks) or None once stopped.
+
+        Chunks of the previous job the writer did not consume are discarded.
+        `chunks` yields DataFrames and raises if parsing failed mid-file or the
+        pipeline stopped, so a partial file is never committed.
+        """
+        if self._current:
+            job, chunks = self._current
+            self._current = None
+            if not job.finished:
+                try:
+                    for _ in self._job_chunks(job):
+                        pass
+                except Exception:
+                    pass
+        while True:
+            item = self.normalized.get()
+            if item is None:
+                return None
+            kind, job, _ = item
+            if kind == JOB_START:
+                break  # Anything else is the tail of a file abandoned after an error
+        chunks = self._job_chunks(job)
+        self._current = (job, chunks)
+        return job, chunks
+
+    def _job_chunks(self, job):
+        while not job.finished:
+            item = self.normalized.get()
+            if item is None:
+                raise PipelineStopped(f"Stopped while reading {os.path.basename(job.file_path)}")
+            kind, _, payload = item
+            if kind == JOB_END:
+                job.finished = True
+            elif kind == JOB_ERROR:
+                job.finished = True  # The parse stage sends nothing after an error
+                raise payload
+            else:
+                yield payload
+
+    # Parse stage
+
+    def _parse_loop(self):
+        try:
+            while self.running:
+                waited = time.perf_counter()
+                file_path = self.ready_queue.get()
+                self.ready_stall += time.perf_counter() - waited
+                if file_path is None:
+                    return
+
+                # Take everything queued so far as one batch; later arrivals form the next batch
+                paths = [file_path]
+                while True:
+                    file_path = self.ready_queue.get(timeout=0)
+                    if file_path is None:
+                        break
+                    paths.append(file_path)
+                batch = IngestBatch(len(paths))
+                if self.on_batch_started:
+                    self.on_batch_started(batch)
+
+                jobs = []
+                for file_path in paths:
+                    job = FileJob(file_path, batch)
+                    try:
+                        known = self.ledger.is_known_file(file_path)
+                    except Exception as e:
+                        if not self._emit_failed(job, e):
+                            return
+                        continue
+                    if known:
+                        self.log(f"Skipping already processed file: {os.path.basename(file_path)}")
+                        job.parsed = ParsedFile(file_path, PARSE_SKIPPED)
+                        if not self._emit_whole(job, ()):
+                            return
+                    else:
+                        jobs.append(job)
+
+                pool = self._parse_pool()
+                if pool is None:
+                    for job in jobs:
+                        try:
+                            sent = self._parse_streaming(job)
+                        except Exception as e:
+                            sent = self._emit_failed(job, e)
+                        if not sent:
+                            return
+                elif not self._parse_in_pool(pool, jobs):
+                    return
+        except Exception as e:
+            self.failure = f"Parse stage stopped: {str(e)}"
+            self.log(self.failure)
+        finally:
+            self.parsed.close()
+
+    def _parse_streaming(self, job):
+        """Parse on this thread, sending each chunk downstream as soon as it is read"""
+        file_path = job.file_path
+        self.log(f"Processing file: {os.path.basename(file_path)}")
+        job.started_at = time.time()
+        try:
+            data, file_hash = read_file_buffer(file_path)
+        except Exception as e:
+            job.parsed = ParsedFile(file_path, PARSE_READ_ERROR, error=str(e))
+            return self._emit_whole(job, ())
+
+        chunks = iter_attendance_chunks(io.BytesIO(data), chunk_size=self.chunk_size)
+        try:
+            try:
+                first_chunk = next(chunks)
+            except MissingColumnsError as e:
+                job.parsed = ParsedFile(file_path, PARSE_MISSING_COLUMNS, file_hash, error=str(e))
+                return self._emit_whole(job, ())
+            except Exception as e:
+                job.parsed = ParsedFile(file_path, PARSE_EXCEL_ERROR, file_hash, error=str(e))
+                return self._emit_whole(job, ())
+
+            job.parsed = ParsedFile(file_path, PARSE_OK, file_hash)
+            if not self._emit_start(job):
+                return False
+            started = time.perf_counter()
+            try:
+                for chunk in itertools.chain([first_chunk], chunks):
+                    job.parsed.row_count += len(chunk)
+                    if not self.parsed.put((JOB_CHUNK, job, chunk)):
+                        return False
+            except Exception as e:
+                return self.parsed.put((JOB_ERROR, job, e))
+            job.parsed.parse_seconds = time.perf_counter() - started
+            return self.parsed.put((JOB_END, job, None))
+        finally:
+            chunks.close()
+
+    def _parse_in_pool(self, pool, jobs):
+        """Parse a batch in worker processes and pass files on in completion order"""
+        futures = {}
+        for job in jobs:
+            self.log(f"Processing file: {os.path.basename(job.file_path)}")
+            try:
+                futures[pool.submit(parse_attendance_file, job.file_path, self.chunk_size)] = job
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    self._shutdown_pool()
+                if not self._emit_failed(job, e):
+                    return False
+        try:
+            for future in as_completed(futures):
+                if not self.running:
+                    return False
+                job = futures[future]
+                try:
+                    parsed = future.result()
+                except Exception as e:
+                    if isinstance(e, BrokenProcessPool):
+                        self._shutdown_pool()  # Rebuilt on the next batch
+                    parsed = ParsedFile(job.file_path, PARSE_WORKER_ERROR, error=str(e))
+                batches, parsed.batches = parsed.batches, ()
+                job.parsed = parsed
+                if not self._emit_whole(job, batches):
+                    return False
+            return True
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _emit_start(self, job):
+        job.sent = self.parsed.put((JOB_START, job, None))
+        return job.sent
+
+    def _emit_whole(self, job, chunks):
+        if not self._emit_start(job):
+            return False
+        for chunk in chunks:
+            if not self.parsed.put((JOB_CHUNK, job, chunk)):
+                return False
+        return self.parsed.put((JOB_END, job, None))
+
+    def _emit_failed(self, job, error):
+        """Fail one file without stopping the stage; the writer records the error"""
+        self.log(f"Could not parse {os.path.basename(job.file_path)}: {str(error)}")
+        if job.sent:
+            return self.parsed.put((JOB_ERROR, job, error))
+        job.parsed = ParsedFile(job.file_path, PARSE_WORKER_ERROR, error=str(error))
+        return self._emit_whole(job, ())
+
+    def _parse_pool(self):
+        """Process pool used for parsing, created on first use; None parses in-process"""
+        if self.parse_workers <= 0:
+            return None
+        if self._pool is None:
+            try:
+                self._pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+            except Exception as e:
+                self.log(f"Could not start parser processes, parsing in-process: {str(e)}")
+                self.parse_workers = 0
+                return None
+            self.log(f"Started {self.parse_workers} parser processes")
+        return self._pool
+
+    def _shutdown_pool(self):
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    # Normalize stage
+
+    def _normalize_loop(self):
+        """Turn compact worker batches back into DataFrames off the writer's thread"""
+        try:
+            while True:
+                item = self.parsed.get()
+                if item is None:
+                    return
+                kind, job, payload = item
+                if kind == JOB_CHUNK and not isinstance(payload, pd.DataFrame):
+                    try:
+                        payload = batch_to_frame(payload)
+                    except Exception as e:
+                        kind, payload = JOB_ERROR, e
+                if not self.normalized.put((kind, job, payload)):
+                    return
+        except Exception as e:
+            self.failure = f"Normalize stage stopped: {str(e)}"
+            self.log(self.failure)
+        finally:
+            self.normalized.close()
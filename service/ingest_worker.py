@@ -0,0 +1,80 @@
+import io
+import os
+import time
+import pandas as pd
+from excel_reader import iter_attendance_chunks, read_file_buffer, MissingColumnsError, STORED_COLUMNS, DEFAULT_CHUNK_SIZE
+
+# Outcomes reported by parse_attendance_file
+PARSE_OK = 'ok'
+PARSE_READ_ERROR = 'read_error'
+PARSE_MISSING_COLUMNS = 'missing_columns'
+PARSE_EXCEL_ERROR = 'excel_error'
+PARSE_WORKER_ERROR = 'worker_error'  # The worker process itself died
+PARSE_SKIPPED = 'skipped'  # Already in the processed-file ledger; never parsed
+
+
+def default_parse_workers():
+    """Leave one core for the UI and the DB writer; 0 means parse in-process"""
+    return min(4, max(0, (os.cpu_count() or 1) - 1))
+
+
+class ParsedFile:
+    """Picklable result of parsing one workbook in a worker process.
+
+    `batches` holds (row_numbers, rows) pairs: plain tuples in STORED_COLUMNS
+    order, which cross the process boundary far cheaper than DataFrames.
+    """
+    __slots__ = ('file_path', 'status', 'file_hash', 'batches', 'row_count', 'error', 'parse_seconds')
+
+    def __init__(self, file_path, status, file_hash=None, batches=(), row_count=0, error=None, parse_seconds=0.0):
+        self.file_path = file_path
+        self.status = status
+        self.file_hash = file_hash
+        self.batches = batches
+        self.row_count = row_count
+        self.error = error
+        self.parse_seconds = parse_seconds
+
+    @property
+    def ok(self):
+        return self.status == PARSE_OK
+
+    def frames(self):
+        """Rebuild the DataFrame chunks expected by DatabaseManager"""
+        for batch in self.batches:
+            yield batch_to_frame(batch)
+
+
+def parse_attendance_file(file_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Read, hash, validate and parse one workbook.
+
+    Runs inside a ProcessPoolExecutor worker, so it lives at module level and
+    never raises: every failure comes back as a ParsedFile status.
+    """
+    started = time.perf_counter()
+    try:
+        data, file_hash = read_file_buffer(file_path)
+    except Exception as e:
+        return ParsedFile(file_path, PARSE_READ_ERROR, error=str(e))
+
+    try:
+        batches = [frame_to_batch(chunk) for chunk in iter_attendance_chunks(io.BytesIO(data), chunk_size)]
+    except MissingColumnsError as e:
+        return ParsedFile(file_path, PARSE_MISSING_COLUMNS, file_hash, error=str(e))
+    except Exception as e:
+        return ParsedFile(file_path, PARSE_EXCEL_ERROR, file_hash, error=str(e))
+
+    row_count = sum(len(row_numbers) for row_numbers, _ in batches)
+    return ParsedFile(file_path, PARSE_OK, file_hash, batches, row_count,
+                      parse_seconds=time.perf_counter() - started)
+
+
+def frame_to_batch(frame):
+    """Compact a reader chunk to (row_numbers, rows) for pickling"""
+    return frame.index.tolist(), list(frame[STORED_COLUMNS].itertuples(index=False, name=None))
+
+
+def batch_to_frame(batch):
+    row_numbers, rows = batch
+    index = pd.Index(row_numbers, dtype='int64')
+    return pd.DataFrame(rows, columns=STORED_COLUMNS, index=index, dtype=object)
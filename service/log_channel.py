@@ -0,0 +1,74 @@
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from PyQt6.QtCore import QObject, QTimer
+
+DEFAULT_MAX_LINES = 5000
+FLUSH_INTERVAL_MS = 100  # Ten repaints a second however fast messages arrive
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUPS = 5
+
+
+class LogChannel(QObject):
+    """Batched, bounded sink for the Logs tab.
+
+    post() is safe from any thread: the line is written to a rotating log
+    file, which keeps the full history, and queued in memory. A timer on
+    the UI thread appends everything queued since the last tick in one
+    go. The view is expected to cap its own line count (see
+    QPlainTextEdit.setMaximumBlockCount), so neither the queue nor the
+    widget grows with uptime.
+    """
+
+    def __init__(self, view, log_path, max_lines=DEFAULT_MAX_LINES, parent=None):
+        super().__init__(parent)
+        self.view = view
+        self._pending = deque(maxlen=max_lines)  # Older lines would scroll out of the view anyway
+        self._lock = threading.Lock()
+
+        self.logger = logging.getLogger("attendance_monitor")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self._handler = None
+        try:
+            self._handler = RotatingFileHandler(log_path, maxBytes=LOG_FILE_MAX_BYTES,
+                                                backupCount=LOG_FILE_BACKUPS, encoding='utf-8')
+            self._handler.setFormatter(logging.Formatter("%(message)s"))
+            self.logger.addHandler(self._handler)
+        except OSError as e:
+            print(f"Log file unavailable, logging to the window only: {str(e)}")
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.flush)
+        self._timer.start(FLUSH_INTERVAL_MS)
+
+    def post(self, message):
+        """Queue a message for the view and write it to the log file"""
+        line = f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}"
+        if self._handler is not None:
+            self.logger.info(line)
+        with self._lock:
+            self._pending.append(line)
+
+    def flush(self):
+        """Append queued lines to the view; runs on the UI thread"""
+        with self._lock:
+            if not self._pending:
+                return
+            lines = list(self._pending)
+            self._pending.clear()
+        scrollbar = self.view.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum()  # Don't yank the view while the user reads back
+        self.view.appendPlainText("\n".join(lines))
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def close(self):
+        self._timer.stop()
+        self.flush()
+        if self._handler is not None:
+            self.logger.removeHandler(self._handler)
+            self._handler.close()
+            self._handler = None
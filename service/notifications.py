@@ -2,17 +2,40 @@ from winotify import Notification, audio
 import os
 import time
 import threading
-from queue import Queue
+from collections import deque
+
+COALESCE_WINDOW = 2.0  # Seconds to gather per-file toasts into one summary
+MIN_INTERVAL = 1.0  # Seconds between any two toasts
+MAX_PENDING = 20  # Plain toasts beyond this are dropped, oldest first
+
+# Per-file kinds folded into one summary, listed in this order
+FILE_KINDS = ('processed', 'skipped', 'failed')
+
 
 class NotificationManager:
-    def __init__(self, app_name="Attendance Monitor", icon_path=None):
+    """Shows toasts from a single consumer thread.
+
+    The thread sleeps on a condition until a toast is due. Toasts marked
+    `immediate` go ahead of everything else. Per-file toasts (processed,
+    skipped, failed) are gathered for COALESCE_WINDOW seconds and shown as
+    one summary such as "14 files: 12 processed, 2 skipped". Toasts are spaced
+    at least MIN_INTERVAL apart, whatever their priority.
+    """
+
+    def __init__(self, app_name="Attendance Monitor", icon_path=None,
+                 coalesce_window=COALESCE_WINDOW, min_interval=MIN_INTERVAL):
         self.app_name = app_name
         self.icon_path = icon_path
         self.default_duration = "short"
+        self.coalesce_window = coalesce_window
+        self.min_interval = min_interval
         
-        # For managing multiple notifications
-        self.notification_queue = Queue()
-        self.active_notifications = []
+        self._condition = threading.Condition()
+        self._priority = deque()  # Immediate toasts
+        self._pending = deque(maxlen=MAX_PENDING)  # Everything else, oldest first
+        self._batch = []  # Per-file toasts waiting to be summarised
+        self._batch_due = None  # When the batch is shown; pulled in by an immediate per-file toast
+        self._last_shown = float('-inf')
         self.positions = {
             'topRight': (0, 0),     # Default Windows position
             'topLeft': (1, 0),
@@ -25,14 +48,17 @@ class NotificationManager:
         
         # Start the notification processing thread
         self.processing = True
-        self.process_thread = threading.Thread(target=self._process_notification_queue)
-        self.process_thread.daemon = True
+        self.process_thread = threading.Thread(target=self._process_notification_queue,
+                                               name="NotificationManager", daemon=True)
         self.process_thread.start()
     
-    def __del__(self):
-        self.processing = False
-        if hasattr(self, 'process_thread') and self.process_thread.is_alive():
-            self.process_thread.join(timeout=1.0)
+    def shutdown(self, timeout=1.0):
+        """Stop the consumer thread; toasts still waiting are dropped"""
+        with self._condition:
+            self.processing = False
+            self._condition.notify_all()
+        if self.process_thread.is_alive() and self.process_thread is not threading.current_thread():
+            self.process_thread.join(timeout)
     
     def set_icon_path(self, icon_path):
         """Update the icon path"""
@@ -45,35 +71,56 @@ class NotificationManager:
         return position
     
     def _process_notification_queue(self):
-        """Background thread to process queued notifications"""
-        while self.processing:
+        """Background thread to show toasts as they fall due"""
+        while True:
+            with self._condition:
+                while self.processing:
+                    due = self._next_due()
+                    now = time.monotonic()
+                    if due is None:
+                        self._condition.wait()
+                    elif due > now:
+                        self._condition.wait(due - now)
+                    else:
+                        break
+                if not self.processing:
+                    return
+                title, message, duration, sound = self._take()
+                self._last_shown = time.monotonic()
             try:
-                if not self.notification_queue.empty():
-                    title, message, duration, sound, immediate = self.notification_queue.get()
-                    
-                    # Clean up expired notifications
-                    current_time = time.time()
-                    self.active_notifications = [n for n in self.active_notifications 
-                                               if current_time - n[1] < 5]  # Remove after 5 seconds
-                    
-                    # Show the notification with position offset if there are active notifications
-                    position = self._get_next_position()
-                    self._show_notification_at_position(title, message, position, duration, sound)
-                    
-                    # Mark as active
-                    self.active_notifications.append((position, time.time()))
-                    
-                    # Mark task as done
-                    self.notification_queue.task_done()
-                    
-                    # Brief delay to prevent notifications from stacking too quickly
-                    time.sleep(0.2)
-                else:
-                    # No notifications to process, sleep to reduce CPU usage
-                    time.sleep(0.1)
+                self._show_notification_at_position(title, message, self._get_next_position(), duration, sound)
             except Exception as e:
                 print(f"Error processing notification: {str(e)}")
-                time.sleep(0.5)
+    
+    def _next_due(self):
+        """Earliest time the next toast may be shown, or None if nothing is waiting"""
+        if self._priority or self._pending:
+            due = time.monotonic()
+        elif self._batch:
+            due = self._batch_due
+        else:
+            return None
+        return max(due, self._last_shown + self.min_interval)
+    
+    def _take(self):
+        if self._priority:
+            return self._priority.popleft()
+        if self._batch and self._batch_due <= time.monotonic():
+            return self._take_batch()
+        return self._pending.popleft()
+    
+    def _take_batch(self):
+        batch, self._batch, self._batch_due = self._batch, [], None
+        if len(batch) == 1:
+            kind, title, message, duration, sound = batch[0]
+            return title, message, duration, sound
+        counts = {}
+        for item in batch:
+            counts[item[0]] = counts.get(item[0], 0) + 1
+        parts = [f"{counts[kind]} {kind}" for kind in FILE_KINDS if kind in counts]
+        title = "File Processing Errors" if 'failed' in counts else "Files Processed"
+        sound = next((item[4] for item in batch if item[4]), None)
+        return title, f"{len(batch)} files: " + ", ".join(parts), None, sound
     
     def _show_notification_at_position(self, title, message, position, duration=None, sound=None):
         """Show a notification at a specific position"""
@@ -91,9 +138,23 @@ class NotificationManager:
         # Show the notification
         notification.show()
     
-    def show_notification(self, title, message, duration=None, sound=None, immediate=False):
-        """Queue a notification to be shown"""
-        self.notification_queue.put((title, message, duration, sound, immediate))
+    def show_notification(self, title, message, duration=None, sound=None, immediate=False, kind=None):
+        """Queue a notification to be shown; `kind` marks a per-file toast that may be summarised"""
+        with self._condition:
+            if not self.processing:
+                return
+            if kind is not None:
+                now = time.monotonic()
+                if not self._batch:
+                    self._batch_due = now + self.coalesce_window
+                if immediate:
+                    self._batch_due = now  # Still merged with whatever else arrives before the next slot
+                self._batch.append((kind, title, message, duration, sound))
+            elif immediate:
+                self._priority.append((title, message, duration, sound))
+            else:
+                self._pending.append((title, message, duration, sound))
+            self._condition.notify()
     
     # Application lifecycle notifications
     def app_started(self):
@@ -127,6 +188,21 @@ class NotificationManager:
             immediate=True  # Show immediately
         )
     
+    def db_offline_spooling(self):
+        """Show notification when files start going to the offline spool"""
+        self.show_notification(
+            "Database Unreachable",
+            "Files are being stored locally and will be sent when the connection returns",
+            immediate=True  # Show immediately
+        )
+    
+    def spool_replayed(self, file_count):
+        """Show notification when the offline spool has been sent to the database"""
+        self.show_notification(
+            "Database Reconnected",
+            f"Sent {file_count} locally stored file{'s' if file_count != 1 else ''} to the database"
+        )
+    
     # Monitoring notifications
     def monitoring_started(self, folder_name):
         """Show notification when monitoring starts"""
@@ -147,7 +223,8 @@ class NotificationManager:
         """Show notification when a single file is processed"""
         self.show_notification(
             "File Processed",
-            f"Processed: {file_name}"
+            f"Processed: {file_name}",
+            kind='processed'
         )
     
     def file_processing_error(self, file_name, error):
@@ -155,14 +232,16 @@ class NotificationManager:
         self.show_notification(
             "File Processing Error",
             f"Error with {file_name}: {error}",
-            immediate=True  # Show immediately
+            immediate=True,  # Show immediately
+            kind='failed'
         )
     
     def file_skipped(self, file_name, reason):
         """Show notification when a file is skipped"""
         self.show_notification(
             "File Processing Skipped",
-            f"Skipped: {file_name} - {reason}"
+            f"Skipped: {file_name} - {reason}",
+            kind='skipped'
         )
     
     def batch_processing_started(self, file_count):
@@ -0,0 +1,255 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import pandas as pd
+from ingest_worker import frame_to_batch, batch_to_frame
+
+# Spooled chunks are recombined into frames of up to this many rows on replay
+REPLAY_ROWS_PER_FRAME = 50000
+
+
+class OfflineSpool:
+    """Durable local queue of parsed attendance files for when the database is down.
+
+    Files are stored in a SQLite database as pickled (row_numbers, rows)
+    batches, in arrival order. While the spool is offline every new file goes
+    into it, so files reach the database in the order they were dropped; the
+    spool only goes back online once a replay has emptied it. Files the
+    database rejected are quarantined with their batches for
+    `quarantine_days`, then evicted.
+    """
+
+    def __init__(self, db_path, quarantine_days=30):
+        self.db_path = db_path
+        self.quarantine_days = quarantine_days
+        self.lock = threading.RLock()  # Serialises appends against going back online
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS spooled_files (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                file_hash TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                row_count INTEGER NOT NULL,
+                spooled_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS quarantined_files (
+                id INTEGER PRIMARY KEY,
+                file_hash TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                row_count INTEGER NOT NULL,
+                spooled_at REAL NOT NULL,
+                error TEXT,
+                quarantined_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS spooled_batches (
+                file_id INTEGER NOT NULL,
+                seq INTEGER NOT NULL,
+                payload BLOB NOT NULL,
+                PRIMARY KEY (file_id, seq)
+            );
+        """)
+        self.conn.commit()
+        self.offline = len(self) > 0  # Leftovers from a previous run must replay first
+
+    def go_offline(self):
+        with self.lock:
+            self.offline = True
+
+    def go_online_if_empty(self):
+        """Leave offline mode once nothing is waiting; returns True if online"""
+        with self.lock:
+            if len(self) == 0:
+                self.offline = False
+            return not self.offline
+
+    def append_if_offline(self, file_hash, file_path, chunks):
+        """Spool a file if the spool is offline; returns its row count, or None if online"""
+        with self.lock:
+            if not self.offline:
+                return None
+            return self.append(file_hash, file_path, chunks)
+
+    def append(self, file_hash, file_path, chunks):
+        """Store one file (DataFrame chunks or compact batches) atomically; returns its row count"""
+        with self.lock:
+            row_count = 0
+            try:
+                cursor = self.conn.execute(
+                    "INSERT INTO spooled_files (file_hash, file_path, row_count, spooled_at) VALUES (?, ?, 0, ?)",
+                    (file_hash, os.path.abspath(file_path), time.time())
+                )
+                file_id = cursor.lastrowid
+                for seq, chunk in enumerate(chunks):
+                    batch = frame_to_batch(chunk) if isinstance(chunk, pd.DataFrame) else chunk
+                    row_count += len(batch[0])
+                    self.conn.execute(
+                        "INSERT INTO spooled_batches (file_id, seq, payload) VALUES (?, ?, ?)",
+                        (file_id, seq, pickle.dumps(batch, protocol=pickle.HIGHEST_PROTOCOL))
+                    )
+                self.conn.execute("UPDATE spooled_files SET row_count = ? WHERE id = ?", (row_count, file_id))
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+            return row_count
+
+    def oldest(self):
+        """(file_id, file_hash, file_path, row_count) of the next file to replay, or None"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT id, file_hash, file_path, row_count FROM spooled_files ORDER BY id LIMIT 1"
+            ).fetchone()
+
+    def frames(self, file_id, rows_per_frame=REPLAY_ROWS_PER_FRAME):
+        """Yield a spooled file as DataFrames of up to rows_per_frame rows"""
+        with self.lock:
+            payloads = [payload for payload, in self.conn.execute(
+                "SELECT payload FROM spooled_batches WHERE file_id = ? ORDER BY seq", (file_id,)
+            )]
+        row_numbers, rows = [], []
+        for payload in payloads:
+            batch_rows, batch_rows_data = pickle.loads(payload)
+            row_numbers.extend(batch_rows)
+            rows.extend(batch_rows_data)
+            if len(rows) >= rows_per_frame:
+                yield batch_to_frame((row_numbers, rows))
+                row_numbers, rows = [], []
+        if rows or not payloads:
+            yield batch_to_frame((row_numbers, rows))
+
+    def remove(self, file_id):
+        with self.lock:
+            self.conn.execute("DELETE FROM spooled_batches WHERE file_id = ?", (file_id,))
+            self.conn.execute("DELETE FROM spooled_files WHERE id = ?", (file_id,))
+            self.conn.commit()
+
+    def quarantine(self, file_id, error):
+        """Take a file the database rejected out of the replay order; its batches are kept for inspection"""
+        with self.lock:
+            try:
+                self.conn.execute(
+                    "INSERT INTO quarantined_files (id, file_hash, file_path, row_count, spooled_at, error, quarantined_at) "
+                    "SELECT id, file_hash, file_path, row_count, spooled_at, ?, ? FROM spooled_files WHERE id = ?",
+                    (str(error)[:500], time.time(), file_id)
+                )
+                self.conn.execute("DELETE FROM spooled_files WHERE id = ?", (file_id,))
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def evict_quarantined(self):
+        """Delete quarantined files older than quarantine_days with their batches; returns the number removed"""
+        cutoff = time.time() - self.quarantine_days * 86400
+        with self.lock:
+            try:
+                self.conn.execute(
+                    "DELETE FROM spooled_batches WHERE file_id IN "
+                    "(SELECT id FROM quarantined_files WHERE quarantined_at < ?)", (cutoff,)
+                )
+                cursor = self.conn.execute("DELETE FROM quarantined_files WHERE quarantined_at < ?", (cutoff,))
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+        return cursor.rowcount
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM spooled_files").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class SpoolReplayer:
+    """Background thread that drains an OfflineSpool into the database.
+
+    Every `interval` seconds while the spool is offline it checks the
+    database and, if reachable, replays spooled files oldest first, each in
+    one transaction. Replays are idempotent (earliest-in/latest-out merge),
+    so a file replayed twice after a crash leaves the same data.
+    A file the database rejects while it is reachable (bad data, not a lost
+    connection) is quarantined so the files behind it can still go through.
+    on_replayed(file_hash, file_path, row_count, summary) runs after each file,
+    on_failed(file_hash, file_path, error) after each quarantined file and
+    on_drained(file_count) once the spool is empty and back online.
+    """
+
+    def __init__(self, spool, db_manager, on_replayed=None, log=print, interval=30.0, on_drained=None,
+                 on_failed=None):
+        self.spool = spool
+        self.db_manager = db_manager
+        self.on_replayed = on_replayed
+        self.on_drained = on_drained
+        self.on_failed = on_failed
+        self.log = log
+        self.interval = interval
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="SpoolReplayer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._running = False
+        self._wake.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def wake(self):
+        """Try a replay now instead of at the next interval"""
+        self._wake.set()
+
+    def _run(self):
+        while self._running:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._running and self.spool.offline:
+                try:
+                    self.replay()
+                except Exception as e:
+                    self.log(f"Spool replay paused: {str(e)}")
+
+    def replay(self):
+        """Replay until the spool is empty or the database fails; returns files replayed"""
+        if not self.db_manager.is_reachable():
+            return 0
+        replayed = 0
+        while self._running:
+            entry = self.spool.oldest()
+            if entry is None:
+                if self.spool.go_online_if_empty():
+                    if replayed:
+                        self.log(f"Offline spool drained: {replayed} files replayed to the database")
+                        if self.on_drained:
+                            self.on_drained(replayed)
+                    return replayed
+                continue  # A file was spooled between the check and the switch
+            file_id, file_hash, file_path, row_count = entry
+            file_name = os.path.basename(file_path)
+            try:
+                summary = self.db_manager.insert_attendance_chunks(self.spool.frames(file_id), file_hash, file_name)
+            except Exception as e:
+                if not self.db_manager.is_reachable():
+                    raise  # Still offline; retry this file at the next interval
+                self.spool.quarantine(file_id, e)
+                self.log(f"Spooled file {file_name} was rejected by the database and set aside: {str(e)}")
+                if self.on_failed:
+                    self.on_failed(file_hash, file_path, e)
+                continue
+            self.spool.remove(file_id)
+            replayed += 1
+            self.log(f"Replayed spooled file {file_name} ({row_count} rows)")
+            if self.on_replayed:
+                self.on_replayed(file_hash, file_path, row_count, summary)
+        return replayed
@@ -0,0 +1,38 @@
+from PyQt6.QtCore import QThread, pyqtSignal
+from database_manager import QueryHandle, QueryCancelled
+
+
+class QueryThread(QThread):
+    """Runs one database query off the UI thread.
+
+    Whatever `run_query(handle)` returns is emitted with result_signal.
+    Results and errors are tagged with `query_id`, so the app can drop
+    replies to queries it has since replaced. Once cancelled, the thread
+    emits nothing.
+    """
+    result_signal = pyqtSignal(int, object)  # query_id, result of run_query
+    error_signal = pyqtSignal(int, str)  # query_id, message
+
+    def __init__(self, query_id, run_query, timeout=None):
+        super().__init__()
+        self.query_id = query_id
+        self.run_query = run_query
+        self.handle = QueryHandle(timeout)
+
+    def run(self):
+        try:
+            result = self.run_query(self.handle)
+        except QueryCancelled as e:
+            if self.handle.timed_out:
+                self.error_signal.emit(self.query_id, str(e))
+            return
+        except Exception as e:
+            if not self.handle.cancelled:
+                self.error_signal.emit(self.query_id, str(e))
+            return
+        if not self.handle.cancelled:
+            self.result_signal.emit(self.query_id, result)
+
+    def cancel(self):
+        """Interrupt the running statement; safe to call from the UI thread"""
+        self.handle.cancel()
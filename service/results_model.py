@@ -0,0 +1,196 @@
+from decimal import Decimal
+from PyQt6.QtCore import Qt, QAbstractTableModel, QAbstractProxyModel, QModelIndex, pyqtSignal
+
+
+class ResultsTableModel(QAbstractTableModel):
+    """Read-only model over the row tuples returned by a query.
+
+    Nothing is converted up front: cells are formatted when the view asks
+    for them in data(), so only the visible rows cost anything. Results
+    arrive a page at a time: when the view scrolls to the end and more
+    pages exist, fetchMore() emits fetch_more_requested and the owner
+    answers with append_rows() once the page has loaded.
+    """
+    fetch_more_requested = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+        self.columns = []
+        self.message = None  # Shown centred in a single cell instead of rows
+        self.has_more = False  # Another page can be fetched
+        self.fetching = False  # A page has been requested and not yet appended
+
+    def set_rows(self, rows, columns, has_more=False):
+        self.beginResetModel()
+        self.rows = list(rows)
+        self.columns = list(columns)
+        self.message = None
+        self.has_more = has_more
+        self.fetching = False
+        self.endResetModel()
+
+    def append_rows(self, rows, has_more):
+        if rows:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(rows) - 1)
+            self.rows.extend(rows)
+            self.endInsertRows()
+        self.has_more = has_more
+        self.fetching = False
+
+    def stop_fetching(self):
+        """Keep the loaded rows but fetch no further pages"""
+        self.has_more = False
+        self.fetching = False
+
+    def set_message(self, message):
+        self.beginResetModel()
+        self.rows = [(message,)]
+        self.columns = ["Message"]
+        self.message = message
+        self.has_more = False
+        self.fetching = False
+        self.endResetModel()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.has_more and not self.fetching
+
+    def fetchMore(self, parent=QModelIndex()):
+        if self.canFetchMore(parent):
+            self.fetching = True
+            self.fetch_more_requested.emit()
+
+    def record_count(self):
+        """Rows of data, not counting a message placeholder"""
+        return 0 if self.message is not None else len(self.rows)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return format_cell(self.rows[index.row()][index.column()])
+        if role == Qt.ItemDataRole.TextAlignmentRole and self.message is not None:
+            return Qt.AlignmentFlag.AlignCenter
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.columns[section] if section < len(self.columns) else None
+        return str(section + 1)
+
+    def sort_keys(self, column):
+        return [sort_key(row[column]) for row in self.rows]
+
+
+class RowSortProxyModel(QAbstractProxyModel):
+    """Sorting proxy for ResultsTableModel.
+
+    QSortFilterProxyModel calls data() twice per comparison, which for a
+    Python model means millions of calls on a large result. This proxy
+    computes one key per row and sorts a list of row numbers instead.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.sort_column = -1
+        self.sort_order = Qt.SortOrder.AscendingOrder
+        self._order = None  # Proxy row -> source row; None while unsorted
+        self._rank = None  # Source row -> proxy row
+
+    def setSourceModel(self, model):
+        self.beginResetModel()
+        super().setSourceModel(model)
+        model.modelAboutToBeReset.connect(self.beginResetModel)
+        model.modelReset.connect(self._source_reset)
+        model.rowsAboutToBeInserted.connect(self._source_rows_about_to_be_inserted)
+        model.rowsInserted.connect(self._source_rows_inserted)
+        self.endResetModel()
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        sources = [self.mapToSource(index) for index in persistent]
+        self.sort_column, self.sort_order = column, order
+        self._build_order()
+        self.changePersistentIndexList(persistent, [self.mapFromSource(index) for index in sources])
+        self.layoutChanged.emit()
+
+    def _build_order(self):
+        model = self.sourceModel()
+        if self.sort_column < 0 or model is None or self.sort_column >= model.columnCount():
+            self._order = self._rank = None
+            return
+        keys = model.sort_keys(self.sort_column)
+        self._order = sorted(range(len(keys)), key=keys.__getitem__,
+                             reverse=self.sort_order == Qt.SortOrder.DescendingOrder)
+        self._rank = [0] * len(self._order)
+        for proxy_row, source_row in enumerate(self._order):
+            self._rank[source_row] = proxy_row
+
+    def _source_reset(self):
+        self._build_order()
+        self.endResetModel()
+
+    def _source_rows_about_to_be_inserted(self, parent, first, last):
+        if self._order is None:
+            self.beginInsertRows(QModelIndex(), first, last)
+
+    def _source_rows_inserted(self, parent, first, last):
+        if self._order is None:
+            self.endInsertRows()
+        else:
+            self.sort(self.sort_column, self.sort_order)  # Merge the new rows into the current order
+
+    def rowCount(self, parent=QModelIndex()):
+        model = self.sourceModel()
+        return 0 if parent.isValid() or model is None else model.rowCount()
+
+    def columnCount(self, parent=QModelIndex()):
+        model = self.sourceModel()
+        return 0 if parent.isValid() or model is None else model.columnCount()
+
+    def index(self, row, column, parent=QModelIndex()):
+        if parent.isValid() or not (0 <= row < self.rowCount() and 0 <= column < self.columnCount()):
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=QModelIndex()):
+        return QModelIndex()
+
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid():
+            return QModelIndex()
+        row = proxy_index.row() if self._order is None else self._order[proxy_index.row()]
+        return self.sourceModel().index(row, proxy_index.column())
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QModelIndex()
+        row = source_index.row() if self._rank is None else self._rank[source_index.row()]
+        return self.index(row, source_index.column())
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Vertical:
+            return str(section + 1) if role == Qt.ItemDataRole.DisplayRole else None
+        return self.sourceModel().headerData(section, orientation, role)
+
+
+def format_cell(value):
+    return "" if value is None else str(value)
+
+
+def sort_key(value):
+    """Numbers before text, empty cells last; dates and times sort by their ISO text"""
+    if value is None:
+        return (2, "")
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return (0, value)
+    return (1, str(value))
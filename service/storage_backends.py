@@ -0,0 +1,583 @@
+import datetime as dt
+import sqlite3
+import pandas as pd
+from attendance_merge import merge_attendance, seconds_to_text, NO_CHANGE_REASON
+
+# SQLite stores dates and times as ISO text, which sorts and compares correctly
+sqlite3.register_adapter(dt.date, lambda value: value.isoformat())
+sqlite3.register_adapter(dt.time, lambda value: value.strftime('%H:%M:%S'))
+
+# Seeds employees with each ID's name on its most recent punch date
+EMPLOYEE_BACKFILL_SQL = """
+    INSERT INTO employees (Employee_ID, Employee_Name)
+    SELECT Employee_ID, Employee_Name FROM (
+        SELECT Employee_ID, Employee_Name,
+               ROW_NUMBER() OVER (PARTITION BY Employee_ID ORDER BY Punch_Date DESC) AS rn
+        FROM biometric_attendance
+        WHERE Employee_ID IS NOT NULL
+    ) latest
+    WHERE rn = 1 AND NOT EXISTS (SELECT 1 FROM employees e WHERE e.Employee_ID = latest.Employee_ID)
+"""
+
+# Dates each employee's stored name from their latest punch
+EMPLOYEE_LAST_SEEN_BACKFILL_SQL = """
+    UPDATE employees SET last_seen = (
+        SELECT MAX(b.Punch_Date) FROM biometric_attendance b WHERE b.Employee_ID = employees.Employee_ID
+    )
+"""
+
+
+class StorageBackend:
+    """Dialect-specific connection, schema and SQL used by DatabaseManager.
+
+    The base class implements a portable ingest path: prefetch the stored
+    rows for a chunk's keys, merge with attendance_merge.merge_attendance and
+    write the insert/update/audit sets with executemany. SQL is written with
+    '?' placeholders and translated by sql().
+    """
+
+    name = None
+    placeholder = '?'
+    max_params = 999  # Per statement; bounds multi-row INSERTs
+    required_params = ('host', 'port', 'database', 'username', 'password')
+    native_ingest = False  # True if DatabaseManager's own ingest modes target this dialect
+    ingest_modes = ('vectorized',)  # Modes this dialect can run; others are refused at connect
+    default_ingest_mode = 'vectorized'
+    migrations = ()  # (version, description, statements), in version order
+    schema_version_ddl = None
+    employee_upsert_sql = None  # (Employee_ID, Employee_Name, last_seen); a rename only wins from a date >= last_seen
+
+    def __init__(self, connection_params):
+        self.connection_params = connection_params
+
+    def connect(self):
+        """Open a new DB-API connection"""
+        raise NotImplementedError
+
+    def sql(self, text):
+        return text if self.placeholder == '?' else text.replace('?', self.placeholder)
+
+    def executemany(self, cursor, text, rows):
+        cursor.executemany(self.sql(text), rows)
+
+    def migrate(self, conn):
+        """Apply migrations newer than the stored schema version; returns the versions applied.
+
+        Each migration commits together with its schema_version row, so an
+        up-to-date database costs one SELECT per connect instead of the DDL.
+        """
+        cursor = conn.cursor()
+        try:
+            current = self.schema_version(conn, cursor)
+            applied = []
+            for version, description, statements in self.migrations:
+                if version <= current:
+                    continue
+                for statement in statements:
+                    cursor.execute(statement)
+                cursor.execute(self.sql("INSERT INTO schema_version (version, description) VALUES (?, ?)"),
+                               (version, description))
+                conn.commit()
+                applied.append(version)
+            return applied
+        finally:
+            cursor.close()
+
+    def schema_version(self, conn, cursor):
+        """Highest applied migration; creates the version table on first use"""
+        try:
+            cursor.execute("SELECT MAX(version) FROM schema_version")
+            return cursor.fetchone()[0] or 0
+        except Exception:
+            conn.rollback()  # PostgreSQL aborts the transaction after a failed statement
+        cursor.execute(self.schema_version_ddl)
+        conn.commit()
+        return 0
+
+    def cancel(self, conn, cursor):
+        """Interrupt the statement running on `cursor` from another thread"""
+        cursor.cancel()
+
+    def limit(self, query, count):
+        """Restrict an ORDER BY query to its first `count` rows"""
+        return f"{query} LIMIT {int(count)}"
+
+    def upsert_employees(self, cursor, employees):
+        """Write {Employee_ID: (Employee_Name, last_seen)} to the employees table"""
+        self.executemany(cursor, self.employee_upsert_sql, [
+            (employee_id, name, last_seen) for employee_id, (name, last_seen) in employees.items()
+        ])
+
+    def apply_chunk(self, cursor, df, file_hash, file_name, audit_mode):
+        """Merge one validated chunk without committing; returns (inserted, updated, unchanged)"""
+        existing = self.fetch_existing(cursor, df)
+        inserts, updates, unchanged = merge_attendance(df, existing)
+
+        if len(inserts):
+            self.executemany(cursor, PORTABLE_INSERT_SQL, [
+                values + (file_hash,) for values in inserts.itertuples(index=False, name=None)
+            ])
+        if len(updates):
+            self.executemany(cursor, PORTABLE_UPDATE_SQL, [
+                (row.Employee_Name, row.Shift_In, row.Punch_In_Time, row.Punch_Out_Time, row.Shift_Out,
+                 row.Hours_Worked, row.Status, row.Late_By, file_hash, row.Punch_Date, row.Employee_ID)
+                for row in updates.itertuples(index=False)
+            ])
+
+        if audit_mode == 'changes':
+            if len(updates):
+                self.executemany(cursor, PORTABLE_CHANGE_LOG_SQL, list(zip(
+                    updates['Punch_Date'], updates['Employee_ID'], [file_name] * len(updates),
+                    seconds_to_text(updates['old_in_sec']), seconds_to_text(updates['new_in_sec']),
+                    seconds_to_text(updates['old_out_sec']), seconds_to_text(updates['new_out_sec'])
+                )))
+        else:
+            audit_rows = [
+                (row.Punch_Date, row.Employee_ID, row.Employee_Name, file_name, row.reason)
+                for row in updates.itertuples(index=False)
+            ] + [
+                (row.Punch_Date, row.Employee_ID, row.Employee_Name, file_name, NO_CHANGE_REASON)
+                for row in unchanged.itertuples(index=False)
+            ]
+            if audit_rows:
+                self.executemany(cursor, PORTABLE_DUPLICATE_LOG_SQL, audit_rows)
+        return len(inserts), len(updates), len(unchanged)
+
+    def fetch_existing(self, cursor, df):
+        """Stored punch times for the chunk's (Punch_Date, Employee_ID) keys via a temp key table"""
+        keys = df[['Punch_Date', 'Employee_ID']].copy()
+        keys['Punch_Date'] = pd.to_datetime(keys['Punch_Date']).dt.date
+        keys['Employee_ID'] = keys['Employee_ID'].astype(str).str.strip()
+        keys = keys.drop_duplicates()
+
+        cursor.execute(self.temp_keys_ddl)
+        if len(keys):
+            self.executemany(cursor, "INSERT INTO incoming_keys (Punch_Date, Employee_ID) VALUES (?, ?)",
+                             list(keys.itertuples(index=False, name=None)))
+        cursor.execute(self.existing_for_keys_sql)
+        existing = pd.DataFrame.from_records(
+            [tuple(row) for row in cursor.fetchall()],
+            columns=['Punch_Date', 'Employee_ID', 'Punch_In_Time', 'Punch_Out_Time']
+        )
+        cursor.execute("DROP TABLE incoming_keys")
+        return existing
+
+    temp_keys_ddl = "CREATE TEMP TABLE incoming_keys (Punch_Date DATE NOT NULL, Employee_ID VARCHAR(50) NOT NULL)"
+    existing_for_keys_sql = """
+        SELECT b.Punch_Date, b.Employee_ID, b.Punch_In_Time, b.Punch_Out_Time
+        FROM biometric_attendance b
+        JOIN incoming_keys k ON k.Punch_Date = b.Punch_Date AND k.Employee_ID = b.Employee_ID
+    """
+
+
+class SqlServerBackend(StorageBackend):
+    """SQL Server over ODBC Driver 17; ingest uses DatabaseManager's bulk/vectorized modes"""
+
+    name = 'sqlserver'
+    max_params = 2100
+    native_ingest = True
+    ingest_modes = ('row', 'transactional', 'bulk', 'vectorized')
+    default_ingest_mode = 'bulk'
+
+    def limit(self, query, count):
+        return f"{query} OFFSET 0 ROWS FETCH NEXT {int(count)} ROWS ONLY"
+
+    def connect(self):
+        import pyodbc
+        params = self.connection_params
+        # Add connection timeout
+        conn = pyodbc.connect(
+            f"DRIVER={{ODBC Driver 17 for SQL Server}};"
+            f"SERVER={params['host']},{params['port']};"
+            f"DATABASE={params['database']};"
+            f"UID={params['username']};"
+            f"PWD={params['password']};"
+            f"Connection Timeout=30;"
+            f"TrustServerCertificate=yes;"
+        )
+        # Set better timeout for queries
+        conn.timeout = 60
+        return conn
+
+    schema_version_ddl = """
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='schema_version' AND xtype='U')
+        CREATE TABLE schema_version (
+            version INT PRIMARY KEY,
+            description VARCHAR(255),
+            applied_at DATETIME DEFAULT GETDATE()
+        );
+    """
+
+    migrations = ((1, "Attendance, audit and change log tables", ("""
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='biometric_attendance' AND xtype='U')
+        CREATE TABLE biometric_attendance (
+            id INT IDENTITY(1,1) PRIMARY KEY,
+            Punch_Date DATE,
+            Employee_ID VARCHAR(50),
+            Employee_Name VARCHAR(100),
+            Shift_In TIME,
+            Punch_In_Time TIME,
+            Punch_Out_Time TIME,
+            Shift_Out TIME,
+            Hours_Worked VARCHAR(8),
+            Status VARCHAR(50),
+            Late_By TIME,
+            file_hash VARCHAR(64),
+            processed_at DATETIME DEFAULT GETDATE(),
+            CONSTRAINT unique_employee_record UNIQUE (Punch_Date, Employee_ID)
+        );
+
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='duplicate_records_log' AND xtype='U')
+        CREATE TABLE duplicate_records_log (
+            id INT IDENTITY(1,1) PRIMARY KEY,
+            Punch_Date DATE,
+            Employee_ID VARCHAR(50),
+            Employee_Name VARCHAR(100),
+            file_name VARCHAR(255),
+            logged_at DATETIME DEFAULT GETDATE(),
+            reason TEXT
+        );
+
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='logs' AND xtype='U')
+        CREATE TABLE logs (
+            id INT IDENTITY(1,1) PRIMARY KEY,
+            event_type VARCHAR(50),
+            event_description TEXT,
+            file_name VARCHAR(255),
+            timestamp DATETIME DEFAULT GETDATE()
+        );
+
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='attendance_change_log' AND xtype='U')
+        CREATE TABLE attendance_change_log (
+            id BIGINT IDENTITY(1,1) PRIMARY KEY,
+            Punch_Date DATE NOT NULL,
+            Employee_ID VARCHAR(50) NOT NULL,
+            file_name VARCHAR(255),
+            old_in_time TIME,
+            new_in_time TIME,
+            old_out_time TIME,
+            new_out_time TIME,
+            logged_at DATETIME DEFAULT GETDATE()
+        );
+    """,)), (2, "Indexes for employee, file hash and log lookups", ("""
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='ix_attendance_employee_date')
+        CREATE NONCLUSTERED INDEX ix_attendance_employee_date
+        ON biometric_attendance (Employee_ID, Punch_Date DESC)
+        INCLUDE (Employee_Name, Shift_In, Punch_In_Time, Punch_Out_Time, Shift_Out,
+                 Hours_Worked, Status, Late_By, processed_at);
+
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='ix_attendance_file_hash')
+        CREATE NONCLUSTERED INDEX ix_attendance_file_hash ON biometric_attendance (file_hash);
+
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='ix_logs_timestamp')
+        CREATE NONCLUSTERED INDEX ix_logs_timestamp ON logs (timestamp);
+
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='ix_duplicate_log_logged_at')
+        CREATE NONCLUSTERED INDEX ix_duplicate_log_logged_at ON duplicate_records_log (logged_at);
+    """,)), (3, "Employee dimension table", ("""
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='employees' AND xtype='U')
+        CREATE TABLE employees (
+            Employee_ID VARCHAR(50) NOT NULL PRIMARY KEY,
+            Employee_Name VARCHAR(100),
+            updated_at DATETIME DEFAULT GETDATE()
+        );
+    """, EMPLOYEE_BACKFILL_SQL)), (4, "Date of each employee's stored name", (
+        "IF COL_LENGTH('employees', 'last_seen') IS NULL ALTER TABLE employees ADD last_seen DATE",
+        EMPLOYEE_LAST_SEEN_BACKFILL_SQL,
+    )))
+
+    employee_upsert_sql = """
+        MERGE employees WITH (HOLDLOCK) AS e
+        USING (SELECT ? AS Employee_ID, ? AS Employee_Name, CAST(? AS DATE) AS last_seen) AS s
+        ON e.Employee_ID = s.Employee_ID
+        WHEN MATCHED AND (e.last_seen IS NULL OR s.last_seen > e.last_seen
+                          OR (s.last_seen = e.last_seen
+                              AND (e.Employee_Name <> s.Employee_Name
+                                   OR (e.Employee_Name IS NULL AND s.Employee_Name IS NOT NULL)
+                                   OR (e.Employee_Name IS NOT NULL AND s.Employee_Name IS NULL)))) THEN
+            UPDATE SET Employee_Name = s.Employee_Name, last_seen = s.last_seen, updated_at = GETDATE()
+        WHEN NOT MATCHED THEN
+            INSERT (Employee_ID, Employee_Name, last_seen) VALUES (s.Employee_ID, s.Employee_Name, s.last_seen);
+    """
+
+
+class PostgresBackend(StorageBackend):
+    """PostgreSQL through psycopg2 (the schema used by main2.py, plus the change log)"""
+
+    name = 'postgresql'
+    placeholder = '%s'
+    max_params = 65535
+
+    def connect(self):
+        import psycopg2
+        params = self.connection_params
+        return psycopg2.connect(
+            host=params['host'],
+            port=params['port'],
+            dbname=params['database'],
+            user=params['username'],
+            password=params['password'],
+            sslmode=params.get('sslmode', 'prefer'),
+            connect_timeout=30
+        )
+
+    def cancel(self, conn, cursor):
+        conn.cancel()
+
+    def executemany(self, cursor, text, rows):
+        # psycopg2's executemany is one round trip per row; execute_batch pages them
+        from psycopg2.extras import execute_batch
+        execute_batch(cursor, self.sql(text), rows, page_size=1000)
+
+    existing_for_keys_sql = StorageBackend.existing_for_keys_sql + " FOR UPDATE OF b"
+
+    schema_version_ddl = """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description VARCHAR(255),
+            applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+
+    migrations = ((1, "Attendance, audit and change log tables", (
+        """
+        CREATE TABLE IF NOT EXISTS biometric_attendance (
+            id SERIAL PRIMARY KEY,
+            Punch_Date DATE,
+            Employee_ID VARCHAR(50),
+            Employee_Name VARCHAR(100),
+            Shift_In TIME,
+            Punch_In_Time TIME,
+            Punch_Out_Time TIME,
+            Shift_Out TIME,
+            Hours_Worked VARCHAR(8),
+            Status VARCHAR(50),
+            Late_By TIME,
+            file_hash VARCHAR(64),
+            processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            CONSTRAINT unique_employee_record UNIQUE (Punch_Date, Employee_ID)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS duplicate_records_log (
+            id SERIAL PRIMARY KEY,
+            Punch_Date DATE,
+            Employee_ID VARCHAR(50),
+            Employee_Name VARCHAR(100),
+            file_name VARCHAR(255),
+            logged_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            reason TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS logs (
+            id SERIAL PRIMARY KEY,
+            event_type VARCHAR(50),
+            event_description TEXT,
+            file_name VARCHAR(255),
+            timestamp TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS attendance_change_log (
+            id BIGSERIAL PRIMARY KEY,
+            Punch_Date DATE NOT NULL,
+            Employee_ID VARCHAR(50) NOT NULL,
+            file_name VARCHAR(255),
+            old_in_time TIME,
+            new_in_time TIME,
+            old_out_time TIME,
+            new_out_time TIME,
+            logged_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    )), (2, "Indexes for employee, file hash and log lookups", (
+        """
+        CREATE INDEX IF NOT EXISTS ix_attendance_employee_date
+        ON biometric_attendance (Employee_ID, Punch_Date DESC)
+        INCLUDE (Employee_Name, Shift_In, Punch_In_Time, Punch_Out_Time, Shift_Out,
+                 Hours_Worked, Status, Late_By, processed_at)
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_attendance_file_hash ON biometric_attendance (file_hash)",
+        "CREATE INDEX IF NOT EXISTS ix_logs_timestamp ON logs (timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_duplicate_log_logged_at ON duplicate_records_log (logged_at)",
+    )), (3, "Employee dimension table", (
+        """
+        CREATE TABLE IF NOT EXISTS employees (
+            Employee_ID VARCHAR(50) PRIMARY KEY,
+            Employee_Name VARCHAR(100),
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        EMPLOYEE_BACKFILL_SQL,
+    )), (4, "Date of each employee's stored name", (
+        "ALTER TABLE employees ADD COLUMN IF NOT EXISTS last_seen DATE",
+        EMPLOYEE_LAST_SEEN_BACKFILL_SQL,
+    )))
+
+    employee_upsert_sql = """
+        INSERT INTO employees (Employee_ID, Employee_Name, last_seen) VALUES (?, ?, ?)
+        ON CONFLICT (Employee_ID) DO UPDATE
+        SET Employee_Name = EXCLUDED.Employee_Name, last_seen = EXCLUDED.last_seen, updated_at = CURRENT_TIMESTAMP
+        WHERE employees.last_seen IS NULL OR EXCLUDED.last_seen > employees.last_seen
+           OR (EXCLUDED.last_seen = employees.last_seen
+               AND employees.Employee_Name IS DISTINCT FROM EXCLUDED.Employee_Name)
+    """
+
+
+class SqliteBackend(StorageBackend):
+    """Embedded SQLite file for single-site installs, benchmarks and tests.
+
+    `database` is the path of the database file. Dates and times are stored
+    as ISO text, so comparisons and ORDER BY behave like the server types.
+    """
+
+    name = 'sqlite'
+    max_params = 999
+    required_params = ('database',)
+
+    def connect(self):
+        # Pooled connections move between threads, but only one thread uses each at a time
+        conn = sqlite3.connect(self.connection_params['database'], timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def cancel(self, conn, cursor):
+        conn.interrupt()
+
+    schema_version_ddl = """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+
+    migrations = ((1, "Attendance, audit and change log tables", (
+        """
+        CREATE TABLE IF NOT EXISTS biometric_attendance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            Punch_Date TEXT,
+            Employee_ID TEXT,
+            Employee_Name TEXT,
+            Shift_In TEXT,
+            Punch_In_Time TEXT,
+            Punch_Out_Time TEXT,
+            Shift_Out TEXT,
+            Hours_Worked TEXT,
+            Status TEXT,
+            Late_By TEXT,
+            file_hash TEXT,
+            processed_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            CONSTRAINT unique_employee_record UNIQUE (Punch_Date, Employee_ID)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS duplicate_records_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            Punch_Date TEXT,
+            Employee_ID TEXT,
+            Employee_Name TEXT,
+            file_name TEXT,
+            logged_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            reason TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_type TEXT,
+            event_description TEXT,
+            file_name TEXT,
+            timestamp TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS attendance_change_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            Punch_Date TEXT NOT NULL,
+            Employee_ID TEXT NOT NULL,
+            file_name TEXT,
+            old_in_time TEXT,
+            new_in_time TEXT,
+            old_out_time TEXT,
+            new_out_time TEXT,
+            logged_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    )), (2, "Indexes for employee, file hash and log lookups", (
+        # No INCLUDE in SQLite; Employee_Name as a trailing key column still covers the suggestions query
+        """
+        CREATE INDEX IF NOT EXISTS ix_attendance_employee_date
+        ON biometric_attendance (Employee_ID, Punch_Date DESC, Employee_Name)
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_attendance_file_hash ON biometric_attendance (file_hash)",
+        "CREATE INDEX IF NOT EXISTS ix_logs_timestamp ON logs (timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_duplicate_log_logged_at ON duplicate_records_log (logged_at)",
+    )), (3, "Employee dimension table", (
+        """
+        CREATE TABLE IF NOT EXISTS employees (
+            Employee_ID TEXT PRIMARY KEY,
+            Employee_Name TEXT,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        EMPLOYEE_BACKFILL_SQL,
+    )), (4, "Date of each employee's stored name", (
+        "ALTER TABLE employees ADD COLUMN last_seen TEXT",
+        EMPLOYEE_LAST_SEEN_BACKFILL_SQL,
+    )))
+
+    employee_upsert_sql = """
+        INSERT INTO employees (Employee_ID, Employee_Name, last_seen) VALUES (?, ?, ?)
+        ON CONFLICT (Employee_ID) DO UPDATE
+        SET Employee_Name = excluded.Employee_Name, last_seen = excluded.last_seen, updated_at = CURRENT_TIMESTAMP
+        WHERE employees.last_seen IS NULL OR excluded.last_seen > employees.last_seen
+           OR (excluded.last_seen = employees.last_seen
+               AND employees.Employee_Name IS NOT excluded.Employee_Name)
+    """
+
+
+BACKENDS = {
+    SqlServerBackend.name: SqlServerBackend,
+    PostgresBackend.name: PostgresBackend,
+    SqliteBackend.name: SqliteBackend,
+}
+
+
+def get_backend(name, connection_params):
+    """Instantiate the backend registered as `name` (SQL Server if unknown)"""
+    return BACKENDS.get(name, SqlServerBackend)(connection_params)
+
+
+PORTABLE_INSERT_SQL = """
+INSERT INTO biometric_attendance (Punch_Date, Employee_ID, Employee_Name, Shift_In, Punch_In_Time, Punch_Out_Time,
+                                  Shift_Out, Hours_Worked, Status, Late_By, file_hash)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+PORTABLE_UPDATE_SQL = """
+UPDATE biometric_attendance
+SET Employee_Name = ?,
+    Shift_In = ?,
+    Punch_In_Time = ?,
+    Punch_Out_Time = ?,
+    Shift_Out = ?,
+    Hours_Worked = ?,
+    Status = ?,
+    Late_By = ?,
+    file_hash = ?,
+    processed_at = CURRENT_TIMESTAMP
+WHERE Punch_Date = ? AND Employee_ID = ?
+"""
+
+PORTABLE_CHANGE_LOG_SQL = """
+INSERT INTO attendance_change_log (Punch_Date, Employee_ID, file_name, old_in_time, new_in_time, old_out_time, new_out_time)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+PORTABLE_DUPLICATE_LOG_SQL = """
+INSERT INTO duplicate_records_log (Punch_Date, Employee_ID, Employee_Name, file_name, reason, logged_at)
+VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+"""
@@ -1,9 +1,9 @@
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
-    QLabel, QTextEdit, QLineEdit, QSystemTrayIcon, QMenu,
-    QTabWidget, QTableWidget, QTableWidgetItem, QDateEdit,
+    QLabel, QPlainTextEdit, QLineEdit, QSystemTrayIcon, QMenu,
+    QTabWidget, QTableView, QAbstractItemView, QDateEdit,
     QComboBox, QGridLayout, QStackedWidget, QGroupBox, QMessageBox,
-    QFileDialog, QFrame, QSizePolicy, QToolButton, QSpacerItem
+    QFileDialog, QFrame, QSizePolicy, QToolButton, QSpacerItem, QProgressBar, QProgressDialog
 )
 from PyQt6.QtCore import Qt, QSettings, QStandardPaths, QTimer, QDate, QSize
 from PyQt6.QtGui import QIcon, QAction, QFont, QPixmap
@@ -11,6 +11,11 @@ import os
 import sys
 import time
 from datetime import datetime
+from results_model import ResultsTableModel, RowSortProxyModel
+from log_channel import DEFAULT_MAX_LINES
+
+# Rows sampled when sizing result columns to their contents
+COLUMN_SIZE_SAMPLE_ROWS = 200
 
 class StyledButton(QPushButton):
     """Custom button with minimal styling for modern appearance"""
@@ -38,6 +43,7 @@ class AttendanceMonitorUI:
 
         # Initialize UI components
         self.log_display = None
+        self.log_channel = None  # Set by the app once the log file location is known
         self.tab_widget = None
         self.connection_fields = {}
         self.folder_path_label = None
@@ -245,8 +251,9 @@ class AttendanceMonitorUI:
         log_layout.addLayout(header_layout)
 
         # Log display
-        self.log_display = QTextEdit()
+        self.log_display = QPlainTextEdit()
         self.log_display.setReadOnly(True)
+        self.log_display.setMaximumBlockCount(DEFAULT_MAX_LINES)  # Oldest lines drop off the top
         self.log_display.setFont(QFont("Courier New", 9))
         log_layout.addWidget(self.log_display)
         return log_tab
@@ -326,12 +333,18 @@ class AttendanceMonitorUI:
         self.run_query_btn.setMinimumWidth(100)
         self.run_query_btn.setToolTip("Execute the query with selected filters")
 
+        self.cancel_query_btn = StyledButton("Cancel")
+        self.cancel_query_btn.setVisible(False)
+        self.cancel_query_btn.setMinimumWidth(80)
+        self.cancel_query_btn.setToolTip("Cancel the running query")
+
         self.export_btn = StyledButton("Export Results")
         self.export_btn.setEnabled(False)
         self.export_btn.setMinimumWidth(100)
         self.export_btn.setToolTip("Export query results to a file")
 
         buttons_row.addWidget(self.run_query_btn)
+        buttons_row.addWidget(self.cancel_query_btn)
         buttons_row.addWidget(self.export_btn)
         button_layout.addLayout(buttons_row)
 
@@ -356,14 +369,29 @@ class AttendanceMonitorUI:
         self.results_count_label = QLabel("No results")
         results_header.addWidget(self.results_count_label)
         results_header.addStretch()
+
+        # Busy indicator while a query runs in the background
+        self.query_progress = QProgressBar()
+        self.query_progress.setRange(0, 0)
+        self.query_progress.setMaximumWidth(150)
+        self.query_progress.setMaximumHeight(14)
+        self.query_progress.setTextVisible(False)
+        self.query_progress.setVisible(False)
+        results_header.addWidget(self.query_progress)
         results_layout.addLayout(results_header)
 
-        # Results table
-        self.results_table = QTableWidget()
+        # Results table: a lazy model over the query's rows, sorted through a proxy
+        self.results_model = ResultsTableModel()
+        self.results_proxy = RowSortProxyModel()
+        self.results_proxy.setSourceModel(self.results_model)
+        self.results_table = QTableView()
+        self.results_table.setModel(self.results_proxy)
         self.results_table.setAlternatingRowColors(True)
         self.results_table.setSortingEnabled(True)
         self.results_table.horizontalHeader().setStretchLastSection(True)
-        self.results_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.results_table.horizontalHeader().setResizeContentsPrecision(COLUMN_SIZE_SAMPLE_ROWS)
+        self.results_table.verticalHeader().setDefaultSectionSize(22)  # Uniform rows; no per-row measuring
+        self.results_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
         self.results_table.setMinimumHeight(400)  # Increased height for more space
 
         results_layout.addWidget(self.results_table)
@@ -420,6 +448,22 @@ class AttendanceMonitorUI:
         """Show a warning dialog"""
         return QMessageBox.warning(self.window, title, message)
 
+    def create_progress_dialog(self, title, label):
+        """Non-modal progress dialog with a Cancel button; busy until the first update"""
+        dialog = QProgressDialog(label, "Cancel", 0, 0, self.window)
+        dialog.setWindowTitle(title)
+        dialog.setMinimumDuration(0)
+        dialog.setAutoClose(False)
+        dialog.setAutoReset(False)
+        dialog.show()
+        return dialog
+
+    def update_progress_dialog(self, dialog, done, total):
+        if total:
+            dialog.setMaximum(total)
+            dialog.setValue(min(done, total))
+            dialog.setLabelText(f"Exported {done:,} of {total:,} records")
+
     def get_folder_dialog(self, title="Select Folder"):
         """Show folder selection dialog"""
         return QFileDialog.getExistingDirectory(self.window, title)
@@ -432,60 +476,57 @@ class AttendanceMonitorUI:
 
     def log_message(self, message):
         """Add a message to the log display"""
-        if self.log_display:
+        if self.log_channel:
+            self.log_channel.post(message)
+        elif self.log_display:
             current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            self.log_display.append(f"[{current_time}] {message}")
-            self.log_display.verticalScrollBar().setValue(
-                self.log_display.verticalScrollBar().maximum()
-            )
+            self.log_display.appendPlainText(f"[{current_time}] {message}")
 
-    def set_results_table_data(self, data, columns):
-        """Set data for the results table"""
-        self.results_table.clear()
-        self.results_table.setRowCount(0)
+    def set_query_running(self, running):
+        """Show the busy indicator and Cancel button while a query runs"""
+        self.query_progress.setVisible(running)
+        self.cancel_query_btn.setVisible(running)
+        if running:
+            self.results_count_label.setText("Running query...")
+
+    def set_results_table_data(self, data, columns, has_more=False):
+        """Set data for the results table; has_more lets it fetch further pages on scroll"""
+        # Show new results in query order until a header is clicked
+        self.results_proxy.sort(-1)
+        self.results_table.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
 
         if not data or len(data) == 0:
             self.results_count_label.setText("No data found")
             self.export_btn.setEnabled(False)
-            self.results_table.setColumnCount(1)
-            self.results_table.setHorizontalHeaderLabels(["Message"])
-            self.results_table.insertRow(0)
-            no_data_item = QTableWidgetItem("No records found matching your criteria")
-            no_data_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.results_table.setItem(0, 0, no_data_item)
+            self.results_model.set_message("No records found matching your criteria")
             self.results_table.resizeColumnsToContents()
             return
 
-        self.results_table.setColumnCount(len(columns))
-        self.results_table.setHorizontalHeaderLabels(columns)
-
-        for row_idx, row_data in enumerate(data):
-            self.results_table.insertRow(row_idx)
-            for col_idx, col_data in enumerate(row_data):
-                item = QTableWidgetItem(str(col_data) if col_data is not None else "")
-                self.results_table.setItem(row_idx, col_idx, item)
+        self.results_model.set_rows(data, columns, has_more)
 
+        # Sized from the first COLUMN_SIZE_SAMPLE_ROWS rows only
         self.results_table.resizeColumnsToContents()
-        result_count = len(data)
-        self.results_count_label.setText(f"{result_count} record{'s' if result_count != 1 else ''} found")
-        self.export_btn.setEnabled(result_count > 0)
-
-    def get_table_data(self):
-        """Get data from the results table for export"""
-        headers = []
-        for col in range(self.results_table.columnCount()):
-            header_item = self.results_table.horizontalHeaderItem(col)
-            headers.append(header_item.text() if header_item else f"Column {col+1}")
-
-        data = []
-        for row in range(self.results_table.rowCount()):
-            row_data = []
-            for col in range(self.results_table.columnCount()):
-                item = self.results_table.item(row, col)
-                row_data.append(item.text() if item else "")
-            data.append(row_data)
-
-        return headers, data
+        self.show_results_count()
+        self.export_btn.setEnabled(True)
+
+    def append_results_table_data(self, data, has_more):
+        """Add the next page of results below the rows already shown"""
+        self.results_model.append_rows(data, has_more)
+        self.show_results_count()
+
+    def show_results_count(self, suffix=None):
+        result_count = self.results_model.record_count()
+        text = f"{result_count} record{'s' if result_count != 1 else ''} "
+        if self.results_model.has_more:
+            text += "loaded, scroll for more"
+        else:
+            text += "loaded" if suffix else "found"
+        if suffix:
+            text = f"{text} ({suffix})" if result_count else suffix.capitalize()
+        self.results_count_label.setText(text)
+
+    def results_count(self):
+        return self.results_model.record_count()
 
     def show(self):
         """Show the main window"""
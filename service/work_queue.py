@@ -0,0 +1,61 @@
+import threading
+from collections import OrderedDict
+
+
+class FileWorkQueue:
+    """Thread-safe FIFO of file paths with O(1) membership checks.
+
+    The watchdog observer thread puts paths, the monitor thread blocks in
+    get() and wakes as soon as one arrives. close() releases every waiter,
+    after which get() returns None.
+    """
+
+    def __init__(self):
+        self._items = OrderedDict()  # path -> None, keeps arrival order
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def put(self, file_path):
+        """Queue file_path; returns False if it is already queued or the queue is closed"""
+        with self._condition:
+            if self._closed or file_path in self._items:
+                return False
+            self._items[file_path] = None
+            self._condition.notify()
+            return True
+
+    def discard(self, file_path):
+        """Remove file_path if it is still waiting; returns True if it was queued"""
+        with self._condition:
+            return self._items.pop(file_path, False) is None
+
+    def get(self, timeout=None):
+        """Pop the oldest path, blocking up to `timeout` seconds (forever if None).
+
+        Returns None on timeout or once the queue is closed.
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._items or self._closed, timeout):
+                return None
+            if self._closed:
+                return None
+            file_path, _ = self._items.popitem(last=False)
+            return file_path
+
+    def close(self):
+        """Wake all waiters and refuse further puts"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def __contains__(self, file_path):
+        with self._condition:
+            return file_path in self._items
+
+    def __len__(self):
+        with self._condition:
+            return len(self._items)